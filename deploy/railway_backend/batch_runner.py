@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+batch_runner.py
+
+Portfolio-wide batch analysis: DeepStack plus MEARA for a list of companies.
+
+Companies flow through a two-stage pipeline with a shared worker pool per
+stage: a company's MEARA workflow starts as soon as its own DeepStack
+collection finishes, so results arrive per company instead of at the end.
+Stage pools cap global concurrency, and job starts are spaced by a global
+minimum interval. Each finished company is reported immediately (console
+line plus a JSON Lines record), and an aggregate portfolio summary is
+written at the end.
+
+The API (/api/batch in main.py) uses the same input validation and summary
+but runs companies through the server's job schedulers.
+
+Usage:
+    # companies.csv: company_name,company_url[,drb_file]
+    python3 batch_runner.py --input companies.csv --output output/batches
+    python3 batch_runner.py --input companies.json --deepstack-workers 2 --meara-workers 3
+    python3 batch_runner.py --input companies.csv --skip-meara
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from usage_ledger import summarize_usage
+
+BATCH_MAX_COMPANIES = int(os.getenv("BATCH_MAX_COMPANIES", "200"))
+BATCH_DEEPSTACK_WORKERS = int(os.getenv("BATCH_DEEPSTACK_WORKERS", "2"))
+BATCH_MEARA_WORKERS = int(os.getenv("BATCH_MEARA_WORKERS", "2"))
+# Minimum seconds between two job starts across the whole batch
+BATCH_START_INTERVAL_SECONDS = float(os.getenv("BATCH_START_INTERVAL_SECONDS", "2"))
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def validate_companies(companies: Iterable[Dict[str, Any]], max_companies: int = BATCH_MAX_COMPANIES) -> List[Dict[str, Any]]:
+    """
+    Normalized company list: name, url and optional drb_file per entry.
+
+    Duplicate URLs (after trimming and lowercasing) are dropped.
+
+    Raises:
+        ValueError: Empty list, too many companies, or an entry without a URL.
+    """
+    normalized, seen = [], set()
+    for index, company in enumerate(companies, 1):
+        url = (company.get("company_url") or company.get("url") or "").strip()
+        if not url:
+            raise ValueError(f"Company #{index} has no company_url")
+        if url.lower() in seen:
+            continue
+        seen.add(url.lower())
+        name = (company.get("company_name") or company.get("name") or "").strip() or url
+        normalized.append({"company_name": name, "company_url": url, "drb_file": company.get("drb_file") or None})
+    if not normalized:
+        raise ValueError("No companies given")
+    if len(normalized) > max_companies:
+        raise ValueError(f"Batch has {len(normalized)} companies; the limit is {max_companies}")
+    return normalized
+
+
+def load_companies(path: str) -> List[Dict[str, Any]]:
+    """Companies from a CSV (with a header row) or a JSON list."""
+    with open(path, newline="") as f:
+        if path.lower().endswith(".json"):
+            data = json.load(f)
+            return validate_companies(data["companies"] if isinstance(data, dict) else data)
+        return validate_companies(csv.DictReader(f))
+
+
+def new_item(company: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-company batch record."""
+    return {
+        **company,
+        "status": "pending",  # pending → deepstack → meara → completed / failed / cancelled
+        "deepstack_job_id": None,
+        "analysis_job_id": None,
+        "error": None,
+        "started_at": None,
+        "completed_at": None,
+    }
+
+
+def summarize_batch(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate portfolio summary of a batch's items."""
+    counts: Dict[str, int] = {}
+    durations = []
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+        if item["status"] == "completed" and item.get("started_at") and item.get("completed_at"):
+            durations.append(item["completed_at"] - item["started_at"])
+    return {
+        "total_companies": len(items),
+        "status_counts": counts,
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "cancelled": counts.get("cancelled", 0),
+        "finished": all(item["status"] in TERMINAL_STATUSES for item in items),
+        "avg_company_seconds": round(sum(durations) / len(durations), 1) if durations else None,
+        "max_company_seconds": round(max(durations), 1) if durations else None,
+        "usage": summarize_usage(item.get("usage") for item in items),
+        "failures": [
+            {"company_name": item["company_name"], "company_url": item["company_url"], "error": item["error"]}
+            for item in items if item["status"] == "failed"
+        ],
+        "companies": [
+            {
+                "company_name": item["company_name"],
+                "company_url": item["company_url"],
+                "status": item["status"],
+                "deepstack_job_id": item.get("deepstack_job_id"),
+                "analysis_job_id": item.get("analysis_job_id"),
+                "report_file": item.get("report_file"),
+            }
+            for item in items
+        ],
+    }
+
+
+class StartLimiter:
+    """Spaces job starts at least min_interval seconds apart, across threads."""
+
+    def __init__(self, min_interval: float = BATCH_START_INTERVAL_SECONDS):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _run_deepstack(company: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path.insert(0, str(Path(__file__).parent / "src"))
+    from deepstack_collector import collect
+    data = collect([company["company_url"]], {"workers": 1})
+    results = data["url_analysis_results"]
+    if not results or results[0]["fetch_status"] != "success":
+        raise RuntimeError(results[0]["error_details"] if results else "DeepStack returned no results")
+    return data
+
+
+def _run_meara(company: Dict[str, Any]) -> Dict[str, Any]:
+    from document_ingestion import extract_text
+    from meara_orchestrator import run_meara_workflow
+    from openai_scheduler import LANE_BATCH
+    drb = extract_text(company["drb_file"]) if company.get("drb_file") else None
+    state, report_file = run_meara_workflow(company["company_name"], company["company_url"], drb, lane=LANE_BATCH)
+    return {"report_file": str(report_file), "api_stats": state.api_stats, "usage": state.usage.to_dict()}
+
+
+class BatchRunner:
+    """Two-stage DeepStack → MEARA pipeline over shared worker pools."""
+
+    def __init__(self, companies: List[Dict[str, Any]], deepstack_workers: int = BATCH_DEEPSTACK_WORKERS,
+                 meara_workers: int = BATCH_MEARA_WORKERS, run_meara: bool = True,
+                 on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 limiter: Optional[StartLimiter] = None,
+                 deepstack_fn: Callable = _run_deepstack, meara_fn: Callable = _run_meara):
+        self.items = [new_item(company) for company in companies]
+        self.run_meara = run_meara
+        self.on_complete = on_complete
+        self.limiter = limiter or StartLimiter()
+        self.deepstack_fn = deepstack_fn
+        self.meara_fn = meara_fn
+        self._deepstack_pool = ThreadPoolExecutor(max_workers=deepstack_workers, thread_name_prefix="batch-deepstack")
+        self._meara_pool = ThreadPoolExecutor(max_workers=meara_workers, thread_name_prefix="batch-meara")
+        self._lock = threading.Lock()
+        self._remaining = len(self.items)
+        self._done = threading.Event()
+
+    def _finish(self, item: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        item["status"] = status
+        item["error"] = error
+        item["completed_at"] = time.time()
+        try:
+            if self.on_complete:
+                self.on_complete(item)
+        finally:
+            # A failing callback must not leave run() waiting forever
+            with self._lock:
+                self._remaining -= 1
+                if not self._remaining:
+                    self._done.set()
+
+    def _deepstack_stage(self, item: Dict[str, Any]) -> None:
+        self.limiter.wait()
+        item["status"] = "deepstack"
+        item["started_at"] = time.time()
+        try:
+            data = self.deepstack_fn(item)
+            item["deepstack_summary"] = data.get("collection_metadata")
+        except Exception as e:
+            self._finish(item, "failed", f"DeepStack: {e}")
+            return
+        if not self.run_meara:
+            self._finish(item, "completed")
+            return
+        item["status"] = "meara"
+        self._meara_pool.submit(self._meara_stage, item)
+
+    def _meara_stage(self, item: Dict[str, Any]) -> None:
+        self.limiter.wait()
+        try:
+            item.update(self.meara_fn(item))
+        except Exception as e:
+            self._finish(item, "failed", f"MEARA: {e}")
+            return
+        self._finish(item, "completed")
+
+    def run(self) -> Dict[str, Any]:
+        """Run all companies; returns the portfolio summary."""
+        for item in self.items:
+            self._deepstack_pool.submit(self._deepstack_stage, item)
+        self._done.wait()
+        self._deepstack_pool.shutdown()
+        self._meara_pool.shutdown()
+        return summarize_batch(self.items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run DeepStack and MEARA for a list of companies.")
+    parser.add_argument("--input", required=True, help="CSV (company_name,company_url[,drb_file]) or JSON list")
+    parser.add_argument("--output", default="output/batches", help="Directory for results and summary")
+    parser.add_argument("--deepstack-workers", type=int, default=BATCH_DEEPSTACK_WORKERS)
+    parser.add_argument("--meara-workers", type=int, default=BATCH_MEARA_WORKERS)
+    parser.add_argument("--start-interval", type=float, default=BATCH_START_INTERVAL_SECONDS,
+                        help="Minimum seconds between job starts")
+    parser.add_argument("--skip-meara", action="store_true", help="Only run DeepStack")
+    args = parser.parse_args()
+
+    companies = load_companies(args.input)
+    batch_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:6]}"
+    output_dir = Path(args.output) / batch_id
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_file = output_dir / "results.jsonl"
+    write_lock = threading.Lock()
+    finished = [0]
+
+    def report(item):
+        with write_lock:
+            finished[0] += 1
+            mark = "✓" if item["status"] == "completed" else "✗"
+            print(f"[{finished[0]}/{len(companies)}] {mark} {item['company_name']} ({item['company_url']})"
+                  + (f": {item['error']}" if item["error"] else ""), flush=True)
+            with open(results_file, "a") as f:
+                f.write(json.dumps(item, default=str) + "\n")
+
+    print(f"Batch {batch_id}: {len(companies)} companies")
+    runner = BatchRunner(
+        companies,
+        deepstack_workers=args.deepstack_workers,
+        meara_workers=args.meara_workers,
+        run_meara=not args.skip_meara,
+        on_complete=report,
+        limiter=StartLimiter(args.start_interval),
+    )
+    summary = runner.run()
+    with open(output_dir / "summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\nCompleted: {summary['completed']}  Failed: {summary['failed']}")
+    if summary["avg_company_seconds"] is not None:
+        print(f"Average per company: {summary['avg_company_seconds']}s")
+    if summary["usage"]["analyses"]:
+        print(f"OpenAI usage: {summary['usage']['total_tokens']} tokens (${summary['usage']['cost_usd']:.2f})")
+    print(f"Results: {results_file}")
+    print(f"Summary: {output_dir / 'summary.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+company_registry.py
+
+Index of the MEA_CONFIG files in a data directory.
+
+Every *.json file with a companyId is indexed by companyId, company name and
+analysis date. A company can have several configs (one per analysis date);
+lookups return the most recent one. The index is refreshed incrementally:
+at most once per REGISTRY_REFRESH_SECONDS the directory is listed and only
+files whose mtime or size changed are re-read, so requests never scan the
+directory themselves.
+
+Usage:
+    from company_registry import company_registry
+    record = company_registry.get("comp_ai_solutions_inc")   # or None
+    page = company_registry.list(query="solutions", limit=20, offset=0)
+
+    # CLI: list the companies in a directory
+    python3 company_registry.py --data-dir sample_data
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+GTM_DATA_DIR = os.getenv("GTM_DATA_DIR", "sample_data")
+REGISTRY_REFRESH_SECONDS = float(os.getenv("REGISTRY_REFRESH_SECONDS", "30"))
+
+
+def read_header(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Index fields of an MEA_CONFIG, or None if the file is not one."""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(config, dict) or not config.get("companyId"):
+        return None
+    return {
+        "company_id": str(config["companyId"]),
+        "company_name": str(config.get("companyName") or ""),
+        "analysis_date": str(config.get("analysisDate") or ""),
+        "file": str(path),
+    }
+
+
+class CompanyRegistry:
+    """In-memory index of MEA_CONFIG files, refreshed incrementally."""
+
+    def __init__(self, data_dir: Union[str, Path] = GTM_DATA_DIR, refresh_seconds: float = REGISTRY_REFRESH_SECONDS):
+        self.data_dir = Path(data_dir)
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        # file path -> (version, header or None for non-config files)
+        self._files: Dict[str, Tuple[Tuple[int, int], Optional[Dict[str, Any]]]] = {}
+        # company_id -> records, newest analysis first
+        self._by_id: Dict[str, List[Dict[str, Any]]] = {}
+        # latest record per company, sorted by name
+        self._sorted: List[Dict[str, Any]] = []
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-read changed files if the refresh interval has passed.
+
+        Returns:
+            True if the index changed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh and now - self._last_refresh < self.refresh_seconds:
+                return False
+            self._last_refresh = now
+
+            seen = set()
+            changed = False
+            if self.data_dir.is_dir():
+                for entry in os.scandir(self.data_dir):
+                    if not entry.name.endswith(".json") or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    version = (stat.st_mtime_ns, stat.st_size)
+                    seen.add(entry.path)
+                    cached = self._files.get(entry.path)
+                    if cached is not None and cached[0] == version:
+                        continue
+                    self._files[entry.path] = (version, read_header(entry.path))
+                    changed = True
+            for path in set(self._files) - seen:
+                del self._files[path]
+                changed = True
+
+            if changed:
+                self._rebuild()
+            return changed
+
+    def _rebuild(self) -> None:
+        by_id: Dict[str, List[Dict[str, Any]]] = {}
+        for _, header in self._files.values():
+            if header is not None:
+                by_id.setdefault(header["company_id"], []).append(header)
+        for records in by_id.values():
+            records.sort(key=lambda r: (r["analysis_date"], r["file"]), reverse=True)
+        self._by_id = by_id
+        self._sorted = sorted((records[0] for records in by_id.values()),
+                              key=lambda r: (r["company_name"].lower(), r["company_id"]))
+
+    def get(self, company_id: str, analysis_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Latest record for a company, or the one for a given analysis date."""
+        self.refresh()
+        records = self._by_id.get(company_id, [])
+        if analysis_date is None:
+            return records[0] if records else None
+        return next((r for r in records if r["analysis_date"] == analysis_date), None)
+
+    def analyses(self, company_id: str) -> List[Dict[str, Any]]:
+        """All records for a company, newest first."""
+        self.refresh()
+        return list(self._by_id.get(company_id, []))
+
+    def list(self, query: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """
+        Page of companies (latest analysis each), sorted by name.
+
+        Args:
+            query: Case-insensitive substring of the company name or id
+        """
+        self.refresh()
+        items = self._sorted
+        if query:
+            q = query.lower()
+            items = [r for r in items if q in r["company_name"].lower() or q in r["company_id"].lower()]
+        return {
+            "total": len(items),
+            "offset": offset,
+            "limit": limit,
+            "companies": [dict(r, analysis_count=len(self._by_id[r["company_id"]]))
+                          for r in items[offset:offset + limit]],
+        }
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._by_id)
+
+
+company_registry = CompanyRegistry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the companies indexed from MEA_CONFIG files.")
+    parser.add_argument("--data-dir", default=GTM_DATA_DIR, help="Directory of MEA_CONFIG JSON files")
+    parser.add_argument("--query", help="Filter by company name or id")
+    args = parser.parse_args()
+    registry = CompanyRegistry(args.data_dir)
+    page = registry.list(query=args.query, limit=1000)
+    print(f"{page['total']} companies in {args.data_dir}")
+    for record in page["companies"]:
+        print(f"  {record['company_id']:<32} {record['company_name']:<32} {record['analysis_date']}  ({record['analysis_count']} analyses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+config_repository.py
+
+In-memory cache of MEA_CONFIG files and their transformed GTM dashboards.
+
+A config only changes when its file does, so the parsed config and the
+serialized output of transform_mea_config are cached per file and reused
+until the file's mtime or size changes. Entries are evicted least recently
+used once the cache is full. Each entry carries a strong ETag for
+conditional GETs (see http_cache.py).
+
+Usage:
+    from config_repository import config_repository
+    entry = config_repository.get("sample_data/ai-solutions_inc_mea_config.json")
+    return cached_json_response(request, entry["dashboard_body"], entry["etag"])
+
+    # CLI: load a config twice and show cache statistics
+    python3 config_repository.py --config sample_data/ai-solutions_inc_mea_config.json
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+from http_cache import prepare_json
+
+
+CONFIG_CACHE_SIZE = int(os.getenv("CONFIG_CACHE_SIZE", "256"))
+
+
+class ConfigLoadError(Exception):
+    """A config file could not be parsed or transformed."""
+
+
+def file_version(path: Union[str, Path]) -> Tuple[int, int]:
+    """(mtime_ns, size) of a file; changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ConfigRepository:
+    """LRU cache of parsed and transformed MEA_CONFIG files."""
+
+    def __init__(self, max_entries: int = CONFIG_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Union[str, Path]) -> Dict[str, Any]:
+        """
+        Cached entry for a config file, reloading it if the file changed.
+
+        Returns:
+            {"path", "version", "config", "dashboard_body", "etag"}
+
+        Raises:
+            FileNotFoundError: The file does not exist.
+            ConfigLoadError: The file is not valid JSON or fails to transform.
+        """
+        key = str(Path(path).resolve())
+        version = file_version(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        # Parse and transform outside the lock; a concurrent miss on the same
+        # file only does the work twice.
+        entry = self._load(key, version)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, path: str, version: Tuple[int, int]) -> Dict[str, Any]:
+        from gtm_dashboard_transformer import transform_mea_config
+
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ConfigLoadError(f"Invalid JSON in config file: {e}") from e
+        try:
+            dashboard = transform_mea_config(config)
+        except Exception as e:
+            raise ConfigLoadError(f"Transformation failed: {e}") from e
+        body, etag = prepare_json(dashboard)
+        return {"path": path, "version": version, "config": config, "dashboard_body": body, "etag": etag}
+
+    def invalidate(self, path: Union[str, Path]) -> None:
+        with self._lock:
+            self._entries.pop(str(Path(path).resolve()), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+config_repository = ConfigRepository()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load an MEA_CONFIG through the config cache.")
+    parser.add_argument("--config", required=True, help="Path to an MEA_CONFIG JSON file")
+    args = parser.parse_args()
+    first = config_repository.get(args.config)
+    second = config_repository.get(args.config)
+    print(f"ETag: {first['etag']}")
+    print(f"Dashboard bytes: {len(first['dashboard_body'])}")
+    print(f"Same entry on reload: {first is second}")
+    print(f"Stats: {config_repository.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,9 @@ Usage:
         python3 deepstack.py -u https://subdomain.example.com:8080
         # Output: output/deepstack_output-subdomain.example.com_8080.json
 
+        python3 deepstack.py -u https://example.com --job-id 42
+        # Output: output/42/deepstack_output-example.com.json
+
     Batch Mode:
         python3 deepstack.py
         # Output: output/deepstack_output.json (reads from urls_to_analyze.txt)
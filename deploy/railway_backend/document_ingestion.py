@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+document_ingestion.py
+
+Text extraction for uploaded Deep Research Briefs and context documents.
+
+Supported formats: plain text (.txt, .md, .json, .csv), Word (.docx) and
+PowerPoint (.pptx) via their XML parts, and PDF via pypdf (optional; PDFs
+are reported as unsupported when it is not installed). Extraction runs in a
+thread pool, and extracted text is cached on disk by the file's SHA-256, so
+the same deck uploaded for another company or run is never re-extracted.
+
+Extracted text is split into paragraph-aligned chunks; build_context picks
+the chunks most relevant to a set of query terms that fit a character
+budget, for feeding context documents to the MEARA orchestrator.
+
+Usage:
+    from document_ingestion import extract_text, extract_documents, build_context
+    text = extract_text("context_inputs/blobs/ab/ab12...pdf")
+    documents = extract_documents(paths, names)
+    context = build_context(documents, ["pricing", "pipeline"], budget_chars=20000)
+
+    # CLI: extract files and print the context that would be sent
+    python3 document_ingestion.py deck.pptx memo.docx --query pricing --budget 8000
+"""
+
+import argparse
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from xml.etree import ElementTree
+
+from single_flight import file_digest
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional: PDFs are unsupported without it
+    PdfReader = None
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+DOCUMENT_CACHE_DIR = Path(os.getenv("DOCUMENT_CACHE_DIR", "context_inputs/text"))
+CHUNK_CHARS = int(os.getenv("CONTEXT_CHUNK_CHARS", "2000"))
+CONTEXT_BUDGET_CHARS = int(os.getenv("CONTEXT_BUDGET_CHARS", "24000"))
+
+TEXT_SUFFIXES = (".txt", ".md", ".markdown", ".json", ".csv")
+SUPPORTED_SUFFIXES = TEXT_SUFFIXES + (".docx", ".pptx", ".pdf")
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+class UnsupportedDocument(Exception):
+    """The file's format cannot be extracted."""
+
+
+def _xml_paragraphs(xml: bytes, paragraph_tag: str, text_tag: str) -> List[str]:
+    root = ElementTree.fromstring(xml)
+    paragraphs = []
+    for paragraph in root.iter(paragraph_tag):
+        text = "".join(node.text or "" for node in paragraph.iter(text_tag)).strip()
+        if text:
+            paragraphs.append(text)
+    return paragraphs
+
+
+def _extract_docx(path: Path) -> str:
+    with zipfile.ZipFile(path) as archive:
+        xml = archive.read("word/document.xml")
+    return "\n\n".join(_xml_paragraphs(xml, f"{_WORD_NS}p", f"{_WORD_NS}t"))
+
+
+def _extract_pptx(path: Path) -> str:
+    with zipfile.ZipFile(path) as archive:
+        slides = [name for name in archive.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", name)]
+        slides.sort(key=lambda name: int(re.search(r"(\d+)\.xml$", name).group(1)))
+        sections = []
+        for number, name in enumerate(slides, 1):
+            paragraphs = _xml_paragraphs(archive.read(name), f"{_DRAWING_NS}p", f"{_DRAWING_NS}t")
+            if paragraphs:
+                sections.append(f"[Slide {number}]\n" + "\n".join(paragraphs))
+    return "\n\n".join(sections)
+
+
+def _extract_pdf(path: Path) -> str:
+    if PdfReader is None:
+        raise UnsupportedDocument(f"{path.name}: PDF extraction requires pypdf")
+    reader = PdfReader(str(path))
+    return "\n\n".join((page.extract_text() or "").strip() for page in reader.pages).strip()
+
+
+def _extract_uncached(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in TEXT_SUFFIXES:
+        return path.read_text(encoding="utf-8", errors="replace")
+    if suffix == ".docx":
+        return _extract_docx(path)
+    if suffix == ".pptx":
+        return _extract_pptx(path)
+    if suffix == ".pdf":
+        return _extract_pdf(path)
+    raise UnsupportedDocument(f"{path.name}: unsupported format {suffix or '(none)'}")
+
+
+def extract_text(path: Union[str, Path], cache_dir: Path = DOCUMENT_CACHE_DIR) -> str:
+    """
+    Text of a document, from the content-hash cache when available.
+
+    Raises:
+        UnsupportedDocument: Unknown format, or a PDF without pypdf.
+        zipfile.BadZipFile / ElementTree.ParseError: Corrupt docx/pptx.
+    """
+    path = Path(path)
+    cached = cache_dir / f"{file_digest(path)}{path.suffix.lower()}.txt"
+    if cached.exists():
+        return cached.read_text(encoding="utf-8")
+
+    text = _extract_uncached(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Per-thread temp name: pool threads may extract the same content at once
+    tmp = cached.with_name(f"{cached.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, cached)
+    return text
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of about chunk_chars, on paragraph boundaries where possible."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _extract_document(path: str, name: str, cache_dir: Path) -> Dict[str, Any]:
+    try:
+        text = extract_text(path, cache_dir)
+        return {"path": path, "name": name, "text": text, "chunks": chunk_text(text), "error": None}
+    except Exception as e:
+        print(f"  ⚠️  Could not extract {name}: {e}")
+        return {"path": path, "name": name, "text": "", "chunks": [], "error": str(e)}
+
+
+def extract_documents(paths: Sequence[str], names: Optional[Sequence[str]] = None,
+                      cache_dir: Path = DOCUMENT_CACHE_DIR) -> List[Dict[str, Any]]:
+    """
+    Extract several documents in the worker pool.
+
+    Failures do not raise; the document comes back with "error" set and no text.
+
+    Returns:
+        [{"path", "name", "text", "chunks", "error"}, ...] in input order
+    """
+    names = list(names) if names else [Path(path).name for path in paths]
+    return list(_executor.map(_extract_document, paths, names, [cache_dir] * len(paths)))
+
+
+def _terms(text: str) -> List[str]:
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if len(term) > 2]
+
+
+def build_context(documents: Iterable[Dict[str, Any]], query_terms: Iterable[str] = (),
+                  budget_chars: int = CONTEXT_BUDGET_CHARS) -> str:
+    """
+    The most relevant chunks of the documents that fit in budget_chars.
+
+    Chunks are ranked by how often they mention the query terms (earlier
+    chunks win ties) and emitted in document order, each under a
+    "[Source: name]" heading.
+    """
+    terms = set(_terms(" ".join(query_terms)))
+    candidates = []
+    for doc_index, document in enumerate(documents):
+        for chunk_index, chunk in enumerate(document["chunks"]):
+            score = sum(1 for term in _terms(chunk) if term in terms)
+            candidates.append((-score, chunk_index, doc_index, document["name"], chunk))
+
+    selected, used = [], 0
+    for candidate in sorted(candidates):
+        cost = len(candidate[4]) + len(candidate[3]) + 16
+        if used + cost > budget_chars:
+            continue
+        selected.append(candidate)
+        used += cost
+
+    selected.sort(key=lambda candidate: (candidate[2], candidate[1]))
+    return "\n\n".join(f"[Source: {name}]\n{chunk}" for _, _, _, name, chunk in selected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract documents and print the context built from them.")
+    parser.add_argument("files", nargs="+", help="Documents to extract")
+    parser.add_argument("--query", action="append", default=[], help="Relevance term (repeatable)")
+    parser.add_argument("--budget", type=int, default=CONTEXT_BUDGET_CHARS, help="Context size in characters")
+    args = parser.parse_args()
+
+    documents = extract_documents(args.files)
+    for document in documents:
+        status = document["error"] or f"{len(document['text'])} chars, {len(document['chunks'])} chunks"
+        print(f"{document['name']}: {status}")
+    print()
+    print(build_context(documents, args.query, args.budget))
+
+
+if __name__ == "__main__":
+    main()
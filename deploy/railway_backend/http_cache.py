@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+http_cache.py
+
+Response helpers for JSON payloads that are built once and served many
+times (dashboards, reports and results of completed jobs).
+
+A payload is serialized to JSON bytes once (with orjson when installed) and
+tagged with a strong ETag derived from its content. Requests whose
+If-None-Match matches the tag get an empty 304; everything else gets the
+stored bytes without re-encoding, compressed with brotli (when installed) or
+gzip if the client accepts it. Compressed variants are cached per ETag and
+carry their own ETag ("<tag>-br" / "<tag>-gzip") so the tag stays strong.
+
+Usage:
+    from http_cache import prepare_json, cached_json_response, IMMUTABLE
+    body, etag = prepare_json(dashboard_data)
+    return cached_json_response(request, body, etag, cache_control=IMMUTABLE)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+else:
+    FastJSONResponse = JSONResponse
+
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSED_CACHE_SIZE = int(os.getenv("COMPRESSED_CACHE_SIZE", "128"))
+
+# Cache-Control for resources that never change once the job completed
+IMMUTABLE = "private, max-age=31536000, immutable"
+# Cache-Control for resources that may change: always revalidate via ETag
+REVALIDATE = "no-cache"
+
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+_compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def dumps_json(payload: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib encoder handles them
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def prepare_json(payload: Any) -> Tuple[bytes, str]:
+    """Serialize a payload once; returns (body, etag)."""
+    body = dumps_json(payload)
+    return body, content_etag(body)
+
+
+def _base_tag(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match comparison (weak comparison, as RFC 9110 requires for GET).
+
+    A tag of any encoded variant matches the identity tag it was derived from.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [_base_tag(tag) for tag in if_none_match.split(",")]
+    return _base_tag(etag) in candidates
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred content coding the client accepts: "br", "gzip" or None."""
+    accepted = set()
+    for item in (accept_encoding or "").lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compressed_body(body: bytes, etag: str, encoding: str) -> bytes:
+    """Compressed copy of a stored body, computed once per (etag, encoding)."""
+    key = (etag, encoding)
+    with _compressed_lock:
+        cached = _compressed.get(key)
+        if cached is not None:
+            _compressed.move_to_end(key)
+            return cached
+    if encoding == "br":
+        data = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    with _compressed_lock:
+        _compressed[key] = data
+        while len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return data
+
+
+def cached_json_response(request: Request, body: bytes, etag: str, headers: Optional[Dict[str, str]] = None,
+                         cache_control: str = REVALIDATE) -> Response:
+    """304 when the client already has this ETag, otherwise the stored JSON bytes."""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding", **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        body = compressed_body(body, etag, encoding)
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag[:-1] + f'-{encoding}"'
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def json_response(request: Request, payload: Any, cache_control: str = REVALIDATE) -> Response:
+    """Serialize, tag and (if large) compress a payload in one step."""
+    body, etag = prepare_json(payload)
+    return cached_json_response(request, body, etag, cache_control=cache_control)
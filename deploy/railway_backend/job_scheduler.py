@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+job_scheduler.py
+
+Admission control and bounded job queues for the API's background jobs.
+
+Each job type (DeepStack collection, MEARA full analysis) gets its own
+JobScheduler with a fixed number of concurrent workers and a bounded queue.
+Jobs wait in priority order (FIFO within the same priority) until a worker
+slot is free; when the queue is full, submit() raises QueueFullError so the
+endpoint can answer 429 instead of starting yet another browser or workflow.
+
+Usage:
+    from job_scheduler import JobScheduler, QueueFullError
+    scheduler = JobScheduler("deepstack", max_workers=2, max_queue=20)
+
+    # Inside a running event loop (e.g. a FastAPI endpoint)
+    try:
+        position = scheduler.submit(job_id, lambda: run_job(job_id), priority=0)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, headers={"Retry-After": str(e.retry_after)})
+
+    scheduler.position(job_id)    # 1-based queue position, None once running
+    scheduler.cancel(job_id)      # drop a queued job or cancel a running one
+    scheduler.stats()
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+# Defaults per job type (override with environment variables)
+DEEPSTACK_MAX_CONCURRENT_JOBS = int(os.getenv("DEEPSTACK_MAX_CONCURRENT_JOBS", "2"))
+DEEPSTACK_MAX_QUEUED_JOBS = int(os.getenv("DEEPSTACK_MAX_QUEUED_JOBS", "20"))
+MEARA_MAX_CONCURRENT_JOBS = int(os.getenv("MEARA_MAX_CONCURRENT_JOBS", "2"))
+MEARA_MAX_QUEUED_JOBS = int(os.getenv("MEARA_MAX_QUEUED_JOBS", "10"))
+
+# Assumed job duration until real runs have been measured
+DEFAULT_JOB_SECONDS = {"deepstack": 120.0, "meara": 600.0}
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the job type's queue is at capacity."""
+
+    def __init__(self, name: str, max_queue: int, retry_after: int):
+        super().__init__(f"{name} queue is full ({max_queue} jobs waiting)")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Bounded priority queue feeding a fixed number of asyncio worker slots."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, default_job_seconds: Optional[float] = None):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._queue: List = []         # heap of (-priority, sequence, job_id)
+        self._factories: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._sequence = itertools.count()
+
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._total_run_seconds = 0.0
+        self._default_job_seconds = default_job_seconds or DEFAULT_JOB_SECONDS.get(name, 300.0)
+
+    # --- Submission ----------------------------------------------------------
+
+    def full(self, reserve: int = 0) -> bool:
+        """
+        True when no worker is free and the queue cannot take another job.
+
+        With reserve, the last `reserve` queue slots count as taken, so
+        background submitters (batches) leave room for interactive requests.
+        """
+        return len(self._running) >= self.max_workers and len(self._queue) >= self.max_queue - reserve
+
+    def submit(self, job_id: str, factory: Callable[[], Awaitable[Any]], priority: int = 0) -> int:
+        """
+        Queue a job; it starts as soon as a worker slot is free.
+
+        Args:
+            job_id: Unique job identifier
+            factory: Zero-argument callable returning the job coroutine
+            priority: Higher runs first; equal priorities run in FIFO order
+
+        Returns:
+            Queue position (0 when the job started immediately)
+
+        Raises:
+            QueueFullError: the queue is at capacity
+        """
+        if self.full():
+            self._rejected += 1
+            raise QueueFullError(self.name, self.max_queue, self.estimated_wait_seconds(len(self._queue) + 1))
+        heapq.heappush(self._queue, (-priority, next(self._sequence), job_id))
+        self._factories[job_id] = factory
+        self._dispatch()
+        return self.position(job_id) or 0
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job and free its slot.
+
+        A queued job is removed from the queue ("dequeued"). A running job's
+        task is cancelled ("cancelled"); its slot is released as soon as the
+        task unwinds and the next queued job starts. Work the job delegated
+        to threads must watch its own cancel event. Returns None for unknown
+        or finished jobs.
+        """
+        if job_id in self._factories:
+            self._queue = [entry for entry in self._queue if entry[2] != job_id]
+            heapq.heapify(self._queue)
+            del self._factories[job_id]
+            self._cancelled += 1
+            return "dequeued"
+        task = self._running.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+            return "cancelled"
+        return None
+
+    # --- Introspection -------------------------------------------------------
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None if it is not queued."""
+        for index, (_, _, queued_id) in enumerate(sorted(self._queue)):
+            if queued_id == job_id:
+                return index + 1
+        return None
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._running
+
+    def average_job_seconds(self) -> float:
+        finished = self._completed + self._failed
+        return self._total_run_seconds / finished if finished else self._default_job_seconds
+
+    def estimated_wait_seconds(self, position: Optional[int]) -> int:
+        """Rough wait before a job at this queue position starts."""
+        if not position:
+            return 0
+        rounds = (position - 1) // self.max_workers + 1
+        return int(rounds * self.average_job_seconds())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "completed": self._completed,
+            "failed": self._failed,
+            "cancelled": self._cancelled,
+            "rejected": self._rejected,
+            "avg_job_seconds": round(self.average_job_seconds(), 1),
+        }
+
+    # --- Internals -------------------------------------------------------------
+
+    def _dispatch(self) -> None:
+        """Start queued jobs while worker slots are free."""
+        loop = asyncio.get_running_loop()
+        while self._queue and len(self._running) < self.max_workers:
+            _, _, job_id = heapq.heappop(self._queue)
+            factory = self._factories.pop(job_id)
+            self._running[job_id] = loop.create_task(self._run(job_id, factory), name=f"{self.name}-{job_id}")
+
+    async def _run(self, job_id: str, factory: Callable[[], Awaitable[Any]]) -> None:
+        started = time.monotonic()
+        try:
+            await factory()
+            self._completed += 1
+            self._total_run_seconds += time.monotonic() - started
+        except asyncio.CancelledError:
+            # Cancelled runs are left out of the average job duration
+            self._cancelled += 1
+        except Exception as e:
+            # Job functions record their own failures; this only guards the slot
+            self._failed += 1
+            self._total_run_seconds += time.monotonic() - started
+            print(f"[{self.name}] Job {job_id} raised: {type(e).__name__} - {e}")
+        finally:
+            self._running.pop(job_id, None)
+            self._dispatch()
+
+
+deepstack_scheduler = JobScheduler("deepstack", DEEPSTACK_MAX_CONCURRENT_JOBS, DEEPSTACK_MAX_QUEUED_JOBS)
+meara_scheduler = JobScheduler("meara", MEARA_MAX_CONCURRENT_JOBS, MEARA_MAX_QUEUED_JOBS)
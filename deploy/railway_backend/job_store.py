@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+job_store.py
+
+In-memory job store with maintained status counters and indexes.
+
+JobStore behaves like the plain dict it replaces (jobs[job_id] = {...},
+jobs[job_id]["status"] = "running", ...). Job records are dicts that report
+status changes back to the store, so per-status counts are kept current
+instead of being recounted. Jobs are numbered in creation order, which gives
+cursor pagination and binary search on creation time; company and status
+indexes keep filtered listings proportional to the page, not the history.
+
+Usage:
+    from job_store import JobStore
+    jobs = JobStore()
+    jobs[job_id] = {"status": "queued", "company_name": "Acme", ...}
+    jobs.counts()                       # {"queued": 1}
+    page = jobs.list(status="completed", company="Acme", limit=20)
+    jobs.list(cursor=page["next_cursor"], limit=20)
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Fields returned by list() unless others are requested
+SUMMARY_FIELDS = ("status", "company_name", "company_url", "progress", "created_at", "completed_at")
+# Fields a listing may project (large payloads such as results are excluded)
+LISTABLE_FIELDS = SUMMARY_FIELDS + (
+    "error", "uploaded", "deepstack_job_id", "current_step", "current_stage", "stage_name", "subscribers",
+    "usage", "lane",
+)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def company_key(name: Optional[str]) -> str:
+    return (name or "").strip().lower()
+
+
+class JobRecord(dict):
+    """A job's fields; tells its store when "status" changes."""
+
+    def __init__(self, store: "JobStore", job_id: str, fields: Dict[str, Any]):
+        super().__init__(fields)
+        self._store = store
+        self._job_id = job_id
+
+    def __setitem__(self, key, value):
+        if key == "status":
+            self._store._status_changed(self._job_id, self.get("status"), value)
+        super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+class JobStore(MutableMapping):
+    """job_id -> JobRecord, with status counts and listing indexes."""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobRecord] = {}
+        self._lock = threading.RLock()
+        self._seq: Dict[str, int] = {}
+        self._order: List[Optional[str]] = []        # seq -> job_id (None once deleted)
+        self._created: List[float] = []               # seq -> created_at, non-decreasing
+        self._counts: Counter = Counter()
+        self._by_status: Dict[str, List[int]] = {}     # status -> sorted seqs
+        self._by_company: Dict[str, List[int]] = {}
+
+    # Mapping interface
+
+    def __getitem__(self, job_id: str) -> JobRecord:
+        return self._jobs[job_id]
+
+    def __setitem__(self, job_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                del self[job_id]
+            record = JobRecord(self, job_id, fields)
+            created_at = record.setdefault("created_at", time.time())
+            seq = len(self._order)
+            self._seq[job_id] = seq
+            self._order.append(job_id)
+            self._created.append(max(created_at, self._created[-1]) if self._created else created_at)
+            self._by_company.setdefault(company_key(record.get("company_name")), []).append(seq)
+            self._jobs[job_id] = record
+            self._status_changed(job_id, None, record.get("status"))
+
+    def __delitem__(self, job_id: str) -> None:
+        with self._lock:
+            record = self._jobs.pop(job_id)
+            self._status_changed(job_id, record.get("status"), None)
+            self._order[self._seq.pop(job_id)] = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._jobs)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, job_id) -> bool:
+        return job_id in self._jobs
+
+    # Counters
+
+    def _status_changed(self, job_id: str, old: Optional[str], new: Optional[str]) -> None:
+        if old == new:
+            return
+        with self._lock:
+            if old is not None:
+                self._counts[old] -= 1
+                if not self._counts[old]:
+                    del self._counts[old]
+                seqs = self._by_status.get(old, [])
+                i = bisect_left(seqs, self._seq[job_id])
+                if i < len(seqs) and seqs[i] == self._seq[job_id]:
+                    del seqs[i]
+            if new is not None:
+                self._counts[new] += 1
+                insort(self._by_status.setdefault(new, []), self._seq[job_id])
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            return dict(self._counts)
+
+    def count(self, *statuses: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(status, 0) for status in statuses)
+
+    # Listing
+
+    def _candidates(self, status: Optional[str], company: Optional[str], lo: int, hi: int) -> Iterable[int]:
+        """Sequence numbers in [lo, hi), newest first, from the smallest index."""
+        options = [(hi - lo, None)]
+        if company is not None:
+            seqs = self._by_company.get(company_key(company), [])
+            options.append((len(seqs), seqs))
+        if status is not None:
+            seqs = self._by_status.get(status, [])
+            options.append((len(seqs), seqs))
+        _, index = min(options, key=lambda option: option[0])
+
+        if index is None:
+            return range(hi - 1, lo - 1, -1)
+        start, end = bisect_left(index, lo), bisect_left(index, hi)
+        return (index[i] for i in range(end - 1, start - 1, -1))
+
+    def list(self, status: Optional[str] = None, company: Optional[str] = None,
+             created_after: Optional[float] = None, created_before: Optional[float] = None,
+             cursor: Optional[str] = None, limit: int = 50,
+             fields: Iterable[str] = SUMMARY_FIELDS) -> Dict[str, Any]:
+        """
+        Page of jobs, newest first.
+
+        Args:
+            status: Only jobs with this status
+            company: Only jobs for this company name (case-insensitive)
+            created_after / created_before: Unix timestamps bounding created_at
+            cursor: next_cursor of the previous page
+            limit: Page size
+            fields: Fields to project onto each job (always includes job_id)
+
+        Returns:
+            {"jobs": [...], "next_cursor": str or None}
+
+        Raises:
+            ValueError: Malformed cursor
+        """
+        fields = [field for field in fields if field in LISTABLE_FIELDS]
+        with self._lock:
+            hi = len(self._order)
+            if cursor:
+                try:
+                    hi = min(hi, int(cursor))
+                except ValueError:
+                    raise ValueError(f"Invalid cursor: {cursor}")
+            if created_before is not None:
+                hi = min(hi, bisect_right(self._created, created_before))
+            lo = bisect_left(self._created, created_after) if created_after is not None else 0
+
+            page, next_cursor = [], None
+            for seq in self._candidates(status, company, lo, hi):
+                job_id = self._order[seq]
+                if job_id is None:
+                    continue
+                job = self._jobs[job_id]
+                if status is not None and job.get("status") != status:
+                    continue
+                if company is not None and company_key(job.get("company_name")) != company_key(company):
+                    continue
+                if len(page) == limit:
+                    next_cursor = str(seq + 1)
+                    break
+                page.append({"job_id": job_id, **{field: job.get(field) for field in fields}})
+            return {"jobs": page, "next_cursor": next_cursor}
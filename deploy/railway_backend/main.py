@@ -5,23 +5,42 @@ FastAPI service that runs DeepStack Collector and MEARA full analysis
 Update: Fixed Assistants API v2 compatibility
 """
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uuid
-import subprocess
+import asyncio
 import json
 from pathlib import Path
 from typing import Optional, List
 import os
 import sys
-import shutil
 import threading
+import time
+from job_scheduler import deepstack_scheduler, meara_scheduler, QueueFullError
+from http_cache import (prepare_json, cached_json_response, FastJSONResponse, IMMUTABLE, REVALIDATE,
+                        COMPRESS_MIN_BYTES, GZIP_LEVEL)
+from config_repository import config_repository, ConfigLoadError
+from company_registry import company_registry
+from job_store import JobStore, SUMMARY_FIELDS
+from upload_pipeline import save_upload, load_json_upload, RequestBudget, UploadTooLarge, MAX_REQUEST_BYTES
+from document_ingestion import extract_documents, build_context
+from single_flight import SingleFlight, request_key, DEEPSTACK_FRESHNESS_SECONDS, MEARA_FRESHNESS_SECONDS
+from openai_scheduler import openai_scheduler, LANE_INTERACTIVE, LANE_BATCH
+from usage_ledger import summarize_usage
+from batch_runner import (validate_companies, new_item, summarize_batch, TERMINAL_STATUSES,
+                          BATCH_START_INTERVAL_SECONDS)
+
+# DeepStack collector library lives in src/
+sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 app = FastAPI(
     title="DeepStack Analysis API",
     description="Backend service for running website analysis with DeepStack Collector",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Allow Vercel frontend to call this API
@@ -33,9 +52,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large dynamic responses; cached payloads arrive pre-compressed
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized uploads by Content-Length before the body is parsed."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return FastJSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the {MAX_REQUEST_BYTES // (1024 * 1024)} MB upload limit"}
+        )
+    return await call_next(request)
+
 # In-memory job stores (use Redis/Postgres for production)
-jobs = {}  # DeepStack jobs
-analysis_jobs = {}  # MEARA full analysis jobs
+jobs = JobStore()  # DeepStack jobs
+analysis_jobs = JobStore()  # MEARA full analysis jobs
+cancel_events = {}  # job_id -> threading.Event watched by the collector / workflow thread
+batches = {}  # batch_id -> portfolio batch (items, events, coordinator task)
+
+# Identical submissions (same URL and input files) share one job
+deepstack_flights = SingleFlight(jobs, DEEPSTACK_FRESHNESS_SECONDS)
+meara_flights = SingleFlight(analysis_jobs, MEARA_FRESHNESS_SECONDS)
+
+# Upper bound on a single DeepStack collection
+DEEPSTACK_TIMEOUT_SECONDS = 300
+# How often a batch coordinator checks its jobs and event streams check for news
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "2"))
+# Queue slots per scheduler that batches leave free for interactive requests
+BATCH_QUEUE_HEADROOM = int(os.getenv("BATCH_QUEUE_HEADROOM", "5"))
+# Each DeepStack job writes its files under output/jobs/{job_id}/
+JOB_OUTPUT_DIR = Path("output") / "jobs"
+# Terms that make a context-document chunk relevant to the GTM analysis
+CONTEXT_QUERY_TERMS = [
+    "revenue", "arr", "pricing", "customers", "pipeline", "sales", "marketing", "growth",
+    "competitors", "positioning", "acquisition", "retention", "churn", "funnel", "conversion", "segment"
+]
 
 # Progress stage mapping: 16 workflow steps → 5 user-facing stages
 STAGE_MAPPING = {
@@ -83,20 +137,106 @@ async def root():
 @app.get("/health")
 async def health():
     """Detailed health check"""
-    deepstack_path = Path("deepstack.py")
+    deepstack_path = Path(__file__).parent / "src" / "deepstack_collector.py"
     return {
         "status": "healthy",
         "deepstack_available": deepstack_path.exists(),
-        "active_jobs": len([j for j in jobs.values() if j["status"] in ["queued", "running"]]),
-        "completed_jobs": len([j for j in jobs.values() if j["status"] == "completed"])
+        "active_jobs": jobs.count("queued", "running"),
+        "completed_jobs": jobs.count("completed"),
+        "job_counts": {
+            "deepstack": jobs.counts(),
+            "meara": analysis_jobs.counts()
+        },
+        "job_queues": {
+            "deepstack": deepstack_scheduler.stats(),
+            "meara": meara_scheduler.stats()
+        },
+        "config_cache": config_repository.stats(),
+        "openai_rate_limits": openai_scheduler.stats()
     }
 
+def check_admission(scheduler):
+    """Reject with 429 before saving uploads when the job type's queue is full."""
+    if scheduler.full():
+        retry_after = scheduler.estimated_wait_seconds(scheduler.stats()["queued"] + 1)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many {scheduler.name} jobs in progress. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def submit_job(scheduler, store, job_id, priority, factory):
+    """Queue a job with its scheduler; 429 (and the job is dropped) when full."""
+    try:
+        return scheduler.submit(job_id, factory, priority=priority)
+    except QueueFullError as e:
+        store.pop(job_id, None)
+        cancel_events.pop(job_id, None)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many {scheduler.name} jobs in progress. Please retry later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def attach_to_job(flights, scheduler, job_id, reason, response):
+    """Response for a submission coalesced onto an existing job."""
+    job = flights.store[job_id]
+    if reason == "in_progress":
+        flights.attach(job_id)
+    print(f"[{scheduler.name}] Coalesced submission onto job {job_id} ({reason})")
+    return {
+        **response,
+        "status": job["status"],
+        "queue_position": scheduler.position(job_id),
+        "deduplicated": True,
+        "dedup_reason": reason
+    }
+
+def cancel_job(store, scheduler, job_id, label):
+    """Cancel a queued or running job and release its scheduler slot."""
+    if job_id not in store:
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    job = store[job_id]
+    if job["status"] not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"{label} already {job['status']}")
+
+    # Coalesced jobs keep running until every submitter has cancelled
+    if job.get("subscribers", 1) > 1:
+        job["subscribers"] -= 1
+        return {"status": job["status"], "was_running": False, "detached": True}
+
+    # Stop the worker thread (browser page or assistant run) first, then the task
+    event = cancel_events.get(job_id)
+    if event is not None:
+        event.set()
+    outcome = scheduler.cancel(job_id)
+    job["status"] = "cancelled"
+    job["error"] = "Cancelled by user"
+    print(f"[{scheduler.name}] Job {job_id} cancelled ({outcome or 'not scheduled'})")
+    return {"status": "cancelled", "was_running": outcome == "cancelled"}
+
+def queue_info(scheduler, job_id, job):
+    """Queue position and estimated wait for a queued job."""
+    position = scheduler.position(job_id) if job["status"] == "queued" else None
+    return {
+        "queue_position": position,
+        "estimated_wait_seconds": scheduler.estimated_wait_seconds(position) if position else None
+    }
+
+async def store_upload(upload, budget):
+    """Stream one uploaded file to the blob store (413 when over a size limit)."""
+    try:
+        return await save_upload(upload, budget=budget)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
 @app.post("/api/analyze")
 async def start_analysis(
-    background_tasks: BackgroundTasks,
     company_name: str = Form(...),
     company_url: str = Form(...),
-    drb_file: Optional[UploadFile] = File(None)
+    drb_file: Optional[UploadFile] = File(None),
+    priority: int = Form(0),
+    force: bool = Form(False)
 ):
     """
     Start DeepStack analysis for a URL with optional Deep Research Brief upload
@@ -105,23 +245,47 @@ async def start_analysis(
     - company_name: Company name
     - company_url: Company URL to analyze
     - drb_file: Optional Deep Research Brief file (PDF, TXT, MD)
+    - priority: Optional queue priority (higher runs first, default 0)
+    - force: Start a new job even if an identical one is running or recent
 
-    Returns job_id immediately, runs analysis in background
+    Returns job_id immediately and queues the analysis. An identical
+    submission (same normalized URL and DRB content) gets the job already
+    in progress or completed within the freshness window. Responds 429,
+    before storing the upload, when the DeepStack queue is full.
     """
     job_id = str(uuid.uuid4())
+    # Reject before any upload is written when the queue is full
+    check_admission(deepstack_scheduler)
 
-    # Create context directory for this company
-    context_dir = Path("context_inputs") / company_name.replace(" ", "_").lower()
-    context_dir.mkdir(parents=True, exist_ok=True)
-
-    # Save uploaded file if provided
+    # Stream uploaded file (if provided) into the content-addressed store
     drb_path = None
     if drb_file and drb_file.filename:
-        drb_path = context_dir / f"drb_{drb_file.filename}"
-        with open(drb_path, "wb") as f:
-            shutil.copyfileobj(drb_file.file, f)
+        stored = await store_upload(drb_file, RequestBudget())
+        drb_path = Path(stored["path"])
         print(f"Saved DRB file to: {drb_path}")
 
+    flight_key = request_key(company_url, [drb_path])
+    existing = None if force else deepstack_flights.find(flight_key)
+    if existing:
+        existing_id, reason = existing
+        return attach_to_job(deepstack_flights, deepstack_scheduler, existing_id, reason, {
+            "job_id": existing_id,
+            "estimated_time_minutes": 2,
+            "drb_uploaded": drb_path is not None
+        })
+
+    position = create_deepstack_job(job_id, flight_key, company_name, company_url, drb_path, priority)
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "estimated_time_minutes": 2,
+        "queue_position": position or None,
+        "drb_uploaded": drb_path is not None
+    }
+
+def create_deepstack_job(job_id, flight_key, company_name, company_url, drb_path, priority):
+    """Record and queue a DeepStack job; returns its queue position (429 when full)."""
     jobs[job_id] = {
         "status": "queued",
         "company_name": company_name,
@@ -129,16 +293,20 @@ async def start_analysis(
         "progress": 0,
         "drb_file_path": str(drb_path) if drb_path else None
     }
+    deepstack_flights.register(flight_key, job_id)
 
-    # Run DeepStack in background
-    background_tasks.add_task(run_deepstack_analysis, job_id, company_name, company_url)
+    # Queue DeepStack; it starts when a collector slot is free
+    cancel_events[job_id] = threading.Event()
+    return submit_job(
+        deepstack_scheduler, jobs, job_id, priority,
+        lambda: run_deepstack_analysis(job_id, company_name, company_url)
+    )
 
-    return {
-        "job_id": job_id,
-        "status": "queued",
-        "estimated_time_minutes": 2,
-        "drb_uploaded": drb_path is not None
-    }
+def stop_job_thread(job_id):
+    """Signal a job's worker thread to stop at its next checkpoint."""
+    event = cancel_events.get(job_id)
+    if event is not None:
+        event.set()
 
 async def run_deepstack_analysis(job_id: str, company_name: str, url: str):
     """Background task to run DeepStack"""
@@ -146,85 +314,56 @@ async def run_deepstack_analysis(job_id: str, company_name: str, url: str):
         jobs[job_id]["status"] = "running"
         jobs[job_id]["progress"] = 10
 
-        # Ensure output directory exists
-        output_dir = Path("output")
-        output_dir.mkdir(exist_ok=True)
-
-        jobs[job_id]["progress"] = 20
-
-        # Run DeepStack collector
-        # Assumes deepstack.py is in the Railway service directory
-        deepstack_script = Path("deepstack.py")
-
-        if not deepstack_script.exists():
-            # Try parent directory
-            deepstack_script = Path("../deepstack/deepstack.py")
-
-        if not deepstack_script.exists():
-            raise FileNotFoundError("deepstack.py not found")
+        # Import here so the API starts even if Playwright is unavailable
+        from deepstack_collector import collect_async, output_paths, write_json_atomic
 
         jobs[job_id]["progress"] = 30
 
         print(f"[DeepStack] Starting analysis for {url}")
-        print(f"[DeepStack] Python: {sys.executable}")
-        print(f"[DeepStack] Script: {deepstack_script}")
-
-        result = subprocess.run(
-            [sys.executable, str(deepstack_script), "-u", url],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
 
-        print(f"[DeepStack] Return code: {result.returncode}")
-        if result.stdout:
-            print(f"[DeepStack] STDOUT: {result.stdout[:500]}")  # First 500 chars
-        if result.stderr:
-            print(f"[DeepStack] STDERR: {result.stderr[:500]}")  # First 500 chars
+        data = await asyncio.wait_for(
+            collect_async([url], {"workers": 1, "cancel_event": cancel_events.get(job_id)}),
+            timeout=DEEPSTACK_TIMEOUT_SECONDS
+        )
 
         jobs[job_id]["progress"] = 90
 
-        if result.returncode == 0:
-            # Find output file
-            domain = extract_domain(url)
-            output_path = output_dir / f"deepstack_output-{domain}.json"
-
-            if output_path.exists():
-                with open(output_path) as f:
-                    data = json.load(f)
-
-                jobs[job_id]["status"] = "completed"
-                jobs[job_id]["progress"] = 100
-                jobs[job_id]["result"] = data
-                jobs[job_id]["output_file"] = str(output_path)
-            else:
-                # Check for any JSON files in output
-                json_files = list(output_dir.glob("deepstack_output-*.json"))
-                if json_files:
-                    latest_file = max(json_files, key=lambda p: p.stat().st_mtime)
-                    with open(latest_file) as f:
-                        data = json.load(f)
-
-                    jobs[job_id]["status"] = "completed"
-                    jobs[job_id]["progress"] = 100
-                    jobs[job_id]["result"] = data
-                    jobs[job_id]["output_file"] = str(latest_file)
-                else:
-                    jobs[job_id]["status"] = "failed"
-                    jobs[job_id]["error"] = f"Output file not found: {output_path}"
-                    jobs[job_id]["stderr"] = result.stderr
+        # Changed-section data stays with the job; the result keeps the
+        # deepstack_output.json structure the frontend already reads
+        jobs[job_id]["changes"] = data.pop("url_changes")
+        url_results = data["url_analysis_results"]
+
+        # Job-scoped files, written atomically: concurrent jobs for the same
+        # domain can never read or overwrite each other's output
+        output_file, changes_file = output_paths(str(JOB_OUTPUT_DIR), url, job_id)
+        await asyncio.to_thread(write_json_atomic, output_file, data)
+        await asyncio.to_thread(write_json_atomic, changes_file, {"url_changes": jobs[job_id]["changes"]})
+        jobs[job_id]["output_file"] = output_file
+
+        if url_results and url_results[0]["fetch_status"] == "success":
+            jobs[job_id]["status"] = "completed"
+            jobs[job_id]["progress"] = 100
+            jobs[job_id]["result"] = data
+            jobs[job_id]["completed_at"] = time.time()
         else:
             jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = "DeepStack execution failed"
-            jobs[job_id]["stderr"] = result.stderr
-            jobs[job_id]["stdout"] = result.stdout
-
-    except subprocess.TimeoutExpired:
+            jobs[job_id]["error"] = url_results[0]["error_details"] if url_results else "DeepStack returned no results"
+            jobs[job_id]["result"] = data
+
+    except asyncio.CancelledError:
+        # Cancelled via /api/cancel: make sure the collector thread stops too
+        stop_job_thread(job_id)
+        jobs[job_id]["status"] = "cancelled"
+        raise
+    except asyncio.TimeoutError:
+        stop_job_thread(job_id)
         jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = "Analysis timed out after 5 minutes"
+        jobs[job_id]["error"] = f"Analysis timed out after {DEEPSTACK_TIMEOUT_SECONDS // 60} minutes"
     except Exception as e:
         jobs[job_id]["status"] = "failed"
         jobs[job_id]["error"] = str(e)
+    finally:
+        cancel_events.pop(job_id, None)
 
 @app.get("/api/status/{job_id}")
 async def get_status(job_id: str):
@@ -240,12 +379,32 @@ async def get_status(job_id: str):
         "company_url": job["company_url"],
         "progress": job["progress"],
         "error": job.get("error"),
-        "has_drb": job.get("drb_file_path") is not None
+        "has_drb": job.get("drb_file_path") is not None,
+        **queue_info(deepstack_scheduler, job_id, job)
     }
 
+@app.post("/api/cancel/{job_id}")
+async def cancel_analysis(job_id: str):
+    """Cancel a queued or running DeepStack job and free its collector slot"""
+    return {"job_id": job_id, **cancel_job(jobs, deepstack_scheduler, job_id, "Job")}
+
+def job_json_response(request, job, name, build_payload):
+    """
+    Serve a JSON resource of a job, serialized once per completed job.
+
+    Completed jobs never change, so their serialized body and ETag are kept on
+    the job and served as immutable; anything else is built per request.
+    """
+    if job["status"] != "completed":
+        body, etag = prepare_json(build_payload())
+        return cached_json_response(request, body, etag, cache_control=REVALIDATE)
+    if job.get(f"{name}_json") is None:
+        job[f"{name}_json"], job[f"{name}_etag"] = prepare_json(build_payload())
+    return cached_json_response(request, job[f"{name}_json"], job[f"{name}_etag"], cache_control=IMMUTABLE)
+
 @app.get("/api/results/{job_id}")
-async def get_results(job_id: str):
-    """Get analysis results"""
+async def get_results(job_id: str, request: Request):
+    """Get analysis results (immutable once the job completed)"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -263,32 +422,55 @@ async def get_results(job_id: str):
             detail=f"Analysis failed: {job.get('error', 'Unknown error')}"
         )
 
-    return {
+    return job_json_response(request, job, "results", lambda: {
         "job_id": job_id,
         "company_name": job["company_name"],
         "company_url": job["company_url"],
         "result": job.get("result", {})
-    }
+    })
+
+def list_job_page(store, status, company, created_after, created_before, cursor, limit, fields):
+    """One page of a job store for the listing endpoints (400 on bad input)."""
+    try:
+        page = store.list(
+            status=status,
+            company=company,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=max(1, min(limit, 200)),
+            fields=fields.split(",") if fields else SUMMARY_FIELDS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"total_jobs": len(store), "counts": store.counts(), **page}
 
 @app.get("/api/jobs")
-async def list_jobs():
-    """List all jobs (for debugging)"""
-    return {
-        "total_jobs": len(jobs),
-        "jobs": [
-            {
-                "job_id": job_id,
-                "status": job["status"],
-                "company_name": job["company_name"],
-                "progress": job["progress"]
-            }
-            for job_id, job in jobs.items()
-        ]
-    }
+async def list_jobs(
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    created_after: Optional[float] = None,
+    created_before: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None
+):
+    """
+    List DeepStack jobs, newest first, one page at a time
+
+    Args:
+        status: Filter by status (queued, running, completed, failed, cancelled)
+        company: Filter by company name (case-insensitive)
+        created_after / created_before: Unix timestamps
+        cursor: next_cursor from the previous page
+        limit: Page size (1-200)
+        fields: Comma-separated fields to include (default: summary fields)
+    """
+    return list_job_page(jobs, status, company, created_after, created_before, cursor, limit, fields)
 
 @app.get("/api/debug/{job_id}")
 async def debug_job(job_id: str):
-    """Get full job details including stderr/stdout for debugging"""
+    """Get full job details for debugging"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
     return jobs[job_id]
@@ -310,9 +492,8 @@ async def upload_deepstack_json(
     Returns job_id that can be used with /api/analyze/full
     """
     try:
-        # Read and parse JSON file
-        content = await deepstack_json_file.read()
-        deepstack_data = json.loads(content)
+        # Stream to disk, then parse from the file off the event loop
+        deepstack_data, _ = await load_json_upload(deepstack_json_file)
 
         # Extract company info from JSON if not provided
         if not company_name:
@@ -343,6 +524,8 @@ async def upload_deepstack_json(
             "message": "DeepStack JSON uploaded successfully"
         }
 
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except json.JSONDecodeError as e:
         raise HTTPException(
             status_code=400,
@@ -360,10 +543,13 @@ async def upload_deepstack_json(
 
 @app.post("/api/analyze/full")
 async def start_full_analysis(
-    background_tasks: BackgroundTasks,
     deepstack_job_id: str = Form(...),
     deep_research_brief_file: Optional[UploadFile] = File(None),
-    additional_context_files: List[UploadFile] = File(default=[])
+    additional_context_files: List[UploadFile] = File(default=[]),
+    priority: int = Form(0),
+    force: bool = Form(False),
+    token_budget: Optional[int] = Form(None),
+    cost_budget_usd: Optional[float] = Form(None)
 ):
     """
     Start full MEARA analysis using completed DeepStack results
@@ -372,8 +558,16 @@ async def start_full_analysis(
     - deepstack_job_id: Job ID from completed DeepStack analysis
     - deep_research_brief_file: Optional Deep Research Brief file (PDF, TXT, MD, DOCX)
     - additional_context_files: Optional additional context docs (investor memo, pitch deck, etc.)
-
-    Returns analysis_job_id immediately, runs 15-step workflow in background
+    - priority: Optional queue priority (higher runs first, default 0)
+    - force: Start a new workflow even if an identical one is running or recent
+    - token_budget / cost_budget_usd: Optional per-analysis budget overriding
+      MEARA_TOKEN_BUDGET / MEARA_COST_BUDGET_USD (0 disables the limit)
+
+    Returns analysis_job_id immediately and queues the 15-step workflow. An
+    identical submission (same normalized URL, DRB and context file content,
+    and budget) gets the workflow already in progress or completed within the freshness
+    window. Responds 429, before storing any upload, when the MEARA queue is
+    full.
     """
     # Validate DeepStack job exists and is completed
     if deepstack_job_id not in jobs:
@@ -387,21 +581,21 @@ async def start_full_analysis(
         )
 
     analysis_job_id = str(uuid.uuid4())
+    # Reject before any upload is written when the queue is full
+    check_admission(meara_scheduler)
 
     # Get company info from DeepStack job
     company_name = deepstack_job["company_name"]
     company_url = deepstack_job["company_url"]
 
-    # Get context directory
-    context_dir = Path("context_inputs") / company_name.replace(" ", "_").lower()
-    context_dir.mkdir(parents=True, exist_ok=True)
+    # Uploads share one size budget for the whole request
+    budget = RequestBudget()
 
     # Save Deep Research Brief file if provided (overrides any DRB from Phase 1)
     drb_path = None
     if deep_research_brief_file and deep_research_brief_file.filename:
-        drb_path = context_dir / f"drb_{deep_research_brief_file.filename}"
-        with open(drb_path, "wb") as f:
-            shutil.copyfileobj(deep_research_brief_file.file, f)
+        stored = await store_upload(deep_research_brief_file, budget)
+        drb_path = Path(stored["path"])
         print(f"Saved DRB file to: {drb_path}")
     elif deepstack_job.get("drb_file_path"):
         # Use DRB from Phase 1 if no new DRB provided
@@ -410,16 +604,50 @@ async def start_full_analysis(
 
     # Save additional context files if provided
     additional_files = []
+    additional_names = []
     if additional_context_files:
         for file in additional_context_files:
             if file.filename:
-                file_path = context_dir / f"context_{file.filename}"
-                with open(file_path, "wb") as f:
-                    shutil.copyfileobj(file.file, f)
-                additional_files.append(str(file_path))
-                print(f"Saved context file: {file_path}")
+                stored = await store_upload(file, budget)
+                additional_files.append(stored["path"])
+                additional_names.append(stored["filename"])
+                print(f"Saved context file: {stored['path']} ({stored['filename']})")
+
+    # A budgeted request never attaches to a job running under another budget
+    run_budget = {"tokens": token_budget, "cost_usd": cost_budget_usd}
+    flight_key = request_key(company_url, [drb_path, *additional_files], run_budget)
+    existing = None if force else meara_flights.find(flight_key)
+    if existing:
+        existing_id, reason = existing
+        return attach_to_job(meara_flights, meara_scheduler, existing_id, reason, {
+            "analysis_job_id": existing_id,
+            "estimated_time_minutes": 10,
+            "deepstack_job_id": analysis_jobs[existing_id].get("deepstack_job_id")
+        })
+
+    position = create_meara_job(
+        analysis_job_id, flight_key, deepstack_job_id, company_name, company_url,
+        drb_path, additional_files, additional_names, priority,
+        budget=run_budget
+    )
 
-    # Initialize analysis job
+    return {
+        "analysis_job_id": analysis_job_id,
+        "status": "queued",
+        "estimated_time_minutes": 10,  # Updated from 8 to 10 (adds ~2 min for Ground Truth)
+        "queue_position": position or None,
+        "deepstack_job_id": deepstack_job_id
+    }
+
+def create_meara_job(analysis_job_id, flight_key, deepstack_job_id, company_name, company_url,
+                     drb_path, additional_files, additional_names, priority, lane=LANE_INTERACTIVE, budget=None):
+    """
+    Record and queue a MEARA workflow; returns its queue position (429 when full).
+
+    lane is the OpenAI rate-limit lane of the workflow's requests; batch
+    workflows yield API capacity to interactive ones. budget ({"tokens",
+    "cost_usd"}, None values use the defaults) caps the analysis' spend.
+    """
     analysis_jobs[analysis_job_id] = {
         "status": "queued",
         "company_name": company_name,
@@ -431,25 +659,20 @@ async def start_full_analysis(
         "stage_icon": "⏳",
         "progress": 0,
         "additional_context_files": additional_files,
-        "drb_file_path": str(drb_path) if drb_path else None
+        "additional_context_names": additional_names,
+        "drb_file_path": str(drb_path) if drb_path else None,
+        "lane": lane,
+        "budget": budget or {}
     }
+    meara_flights.register(flight_key, analysis_job_id)
 
-    # Run MEARA workflow in background
-    background_tasks.add_task(
-        run_meara_full_analysis,
-        analysis_job_id,
-        deepstack_job_id,
-        company_name,
-        company_url
+    # Queue MEARA workflow; it starts when a workflow slot is free
+    cancel_events[analysis_job_id] = threading.Event()
+    return submit_job(
+        meara_scheduler, analysis_jobs, analysis_job_id, priority,
+        lambda: run_meara_full_analysis(analysis_job_id, deepstack_job_id, company_name, company_url)
     )
 
-    return {
-        "analysis_job_id": analysis_job_id,
-        "status": "queued",
-        "estimated_time_minutes": 10,  # Updated from 8 to 10 (adds ~2 min for Ground Truth)
-        "deepstack_job_id": deepstack_job_id
-    }
-
 async def run_meara_full_analysis(
     analysis_job_id: str,
     deepstack_job_id: str,
@@ -460,11 +683,29 @@ async def run_meara_full_analysis(
     try:
         analysis_jobs[analysis_job_id]["status"] = "running"
 
-        # Get DRB file path if exists
-        drb_path = analysis_jobs[analysis_job_id].get("drb_file_path")
+        # Extract DRB and context documents (txt/md/docx/pptx/pdf) in the
+        # ingestion pool; text is cached by content hash across runs
+        job = analysis_jobs[analysis_job_id]
+        drb_path = job.get("drb_file_path")
+        context_paths = job.get("additional_context_files") or []
+        context_names = job.get("additional_context_names") or None
         drb_content = None
         if drb_path and Path(drb_path).exists():
-            drb_content = Path(drb_path).read_text()
+            drb_document, = await asyncio.to_thread(extract_documents, [drb_path])
+            drb_content = drb_document["text"] or None
+            job["drb_extraction"] = {
+                "name": drb_document["name"], "chars": len(drb_document["text"]), "error": drb_document["error"]
+            }
+            if drb_document["error"]:
+                print(f"DRB extraction failed for {analysis_job_id}: {drb_document['error']}; continuing without it")
+
+        additional_context = None
+        if context_paths:
+            documents = await asyncio.to_thread(extract_documents, context_paths, context_names)
+            additional_context = build_context(documents, [company_name, *CONTEXT_QUERY_TERMS]) or None
+            job["context_extraction"] = [
+                {"name": d["name"], "chars": len(d["text"]), "error": d["error"]} for d in documents
+            ]
 
         # Import and run orchestrator
         # We'll import here to avoid startup issues if OpenAI not configured
@@ -480,11 +721,18 @@ async def run_meara_full_analysis(
             analysis_jobs[analysis_job_id]["stage_icon"] = stage_info["icon"]
             analysis_jobs[analysis_job_id]["progress"] = int((step_num / 16) * 100)
 
-        # Run workflow
-        state, report_file = run_meara_workflow(
+        # Run workflow in a worker thread so the event loop keeps serving
+        # status requests and other jobs while it runs
+        state, report_file = await asyncio.to_thread(
+            run_meara_workflow,
             company_name=company_name,
             company_url=company_url,
-            deep_research_brief=drb_content
+            deep_research_brief=drb_content,
+            cancel_event=cancel_events.get(analysis_job_id),
+            additional_context=additional_context,
+            lane=job.get("lane", LANE_INTERACTIVE),
+            token_budget=job.get("budget", {}).get("tokens"),
+            cost_budget_usd=job.get("budget", {}).get("cost_usd")
         )
 
         # Mark as completed
@@ -492,17 +740,42 @@ async def run_meara_full_analysis(
         analysis_jobs[analysis_job_id]["current_step"] = 16
         analysis_jobs[analysis_job_id]["current_stage"] = 5
         analysis_jobs[analysis_job_id]["progress"] = 100
+        analysis_jobs[analysis_job_id]["completed_at"] = time.time()
         analysis_jobs[analysis_job_id]["report_file"] = str(report_file)
         analysis_jobs[analysis_job_id]["final_report"] = state.final_report
         # Store workflow state for dashboard endpoint
         analysis_jobs[analysis_job_id]["workflow_state"] = state.to_dict()
-
+        # Threads created / messages / bytes sent to the Assistants API
+        analysis_jobs[analysis_job_id]["api_stats"] = state.api_stats
+        # Tokens and cost per step and in total, with the budget outcome
+        analysis_jobs[analysis_job_id]["usage"] = state.usage.to_dict()
+
+        # Precompute the dashboard so views are served from the cache
+        try:
+            await asyncio.to_thread(build_dashboard, analysis_job_id)
+        except Exception as e:
+            print(f"Dashboard precompute failed for {analysis_job_id}: {e}")
+
+    except asyncio.CancelledError:
+        # Cancelled via /api/analysis/cancel: stop the workflow thread and its run
+        stop_job_thread(analysis_job_id)
+        analysis_jobs[analysis_job_id]["status"] = "cancelled"
+        raise
     except Exception as e:
+        if cancel_events.get(analysis_job_id) is not None and cancel_events[analysis_job_id].is_set():
+            # WorkflowCancelled (or a failure while shutting down) after a cancel
+            analysis_jobs[analysis_job_id]["status"] = "cancelled"
+            return
         analysis_jobs[analysis_job_id]["status"] = "failed"
         analysis_jobs[analysis_job_id]["error"] = str(e)
+        if getattr(e, "usage", None):
+            # BudgetExceeded: keep what the aborted run spent
+            analysis_jobs[analysis_job_id]["usage"] = e.usage
         print(f"MEARA analysis failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        cancel_events.pop(analysis_job_id, None)
 
 @app.get("/api/analysis/status/{analysis_job_id}")
 async def get_analysis_status(analysis_job_id: str):
@@ -522,12 +795,46 @@ async def get_analysis_status(analysis_job_id: str):
         "stage_icon": job.get("stage_icon", "⏳"),
         "progress": job["progress"],
         "error": job.get("error"),
-        "deepstack_job_id": job.get("deepstack_job_id")
+        "deepstack_job_id": job.get("deepstack_job_id"),
+        "usage": job.get("usage"),
+        **queue_info(meara_scheduler, analysis_job_id, job)
     }
 
+@app.get("/api/analysis/usage")
+async def get_analysis_usage(company: Optional[str] = None):
+    """
+    Token usage and cost across finished MEARA analyses
+
+    Totals, per-analysis averages and average tokens per step, for sizing
+    throughput against spend. Optionally limited to one company.
+    """
+    usages = [
+        job.get("usage") for job in analysis_jobs.values()
+        if company is None or job["company_name"].lower() == company.lower()
+    ]
+    return summarize_usage(usages)
+
+@app.get("/api/analysis/jobs")
+async def list_analysis_jobs(
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    created_after: Optional[float] = None,
+    created_before: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None
+):
+    """List MEARA analysis jobs, newest first (same parameters as /api/jobs)"""
+    return list_job_page(analysis_jobs, status, company, created_after, created_before, cursor, limit, fields)
+
+@app.post("/api/analysis/cancel/{analysis_job_id}")
+async def cancel_full_analysis(analysis_job_id: str):
+    """Cancel a queued or running MEARA analysis, including its active assistant run"""
+    return {"analysis_job_id": analysis_job_id, **cancel_job(analysis_jobs, meara_scheduler, analysis_job_id, "Analysis job")}
+
 @app.get("/api/analysis/report/{analysis_job_id}")
-async def get_analysis_report(analysis_job_id: str):
-    """Get final MEARA analysis report"""
+async def get_analysis_report(analysis_job_id: str, request: Request):
+    """Get final MEARA analysis report (immutable once completed)"""
     if analysis_job_id not in analysis_jobs:
         raise HTTPException(status_code=404, detail="Analysis job not found")
 
@@ -539,13 +846,228 @@ async def get_analysis_report(analysis_job_id: str):
             detail=f"Analysis not complete. Status: {job['status']}"
         )
 
-    return {
+    return job_json_response(request, job, "report", lambda: {
         "analysis_job_id": analysis_job_id,
         "company_name": job["company_name"],
         "company_url": job["company_url"],
         "report_markdown": job.get("final_report", ""),
         "report_file": job.get("report_file")
+    })
+
+# ============================================================================
+# PORTFOLIO BATCH ENDPOINTS
+# ============================================================================
+
+class BatchCompany(BaseModel):
+    company_name: Optional[str] = None
+    company_url: str
+
+class BatchRequest(BaseModel):
+    companies: List[BatchCompany]
+    priority: int = 0
+    run_meara: bool = True
+
+def batch_event(batch, item):
+    """Append a per-company completion event to the batch's event log."""
+    batch["events"].append({
+        "seq": len(batch["events"]) + 1,
+        "company_name": item["company_name"],
+        "company_url": item["company_url"],
+        "status": item["status"],
+        "error": item["error"],
+        "deepstack_job_id": item["deepstack_job_id"],
+        "analysis_job_id": item["analysis_job_id"]
+    })
+
+def finish_batch_item(batch, item, status, error=None):
+    item["status"] = status
+    item["error"] = error
+    item["completed_at"] = time.time()
+    batch_event(batch, item)
+
+def start_batch_deepstack(item, priority):
+    """DeepStack job for a batch company (coalesced onto an identical job); None when only headroom is left."""
+    flight_key = request_key(item["company_url"], [])
+    existing = deepstack_flights.find(flight_key)
+    if existing:
+        existing_id, reason = existing
+        if reason == "in_progress":
+            deepstack_flights.attach(existing_id)
+        return existing_id
+    if deepstack_scheduler.full(reserve=BATCH_QUEUE_HEADROOM):
+        return None
+    job_id = str(uuid.uuid4())
+    try:
+        create_deepstack_job(job_id, flight_key, item["company_name"], item["company_url"], None, priority)
+    except HTTPException:
+        return None
+    return job_id
+
+def start_batch_meara(item, priority):
+    """MEARA workflow for a batch company after its DeepStack job; None when only headroom is left."""
+    deepstack_job = jobs[item["deepstack_job_id"]]
+    drb_path = deepstack_job.get("drb_file_path")
+    flight_key = request_key(item["company_url"], [drb_path])
+    existing = meara_flights.find(flight_key)
+    if existing:
+        existing_id, reason = existing
+        if reason == "in_progress":
+            meara_flights.attach(existing_id)
+        return existing_id
+    if meara_scheduler.full(reserve=BATCH_QUEUE_HEADROOM):
+        return None
+    analysis_job_id = str(uuid.uuid4())
+    try:
+        create_meara_job(
+            analysis_job_id, flight_key, item["deepstack_job_id"], item["company_name"], item["company_url"],
+            drb_path, [], [], priority, lane=LANE_BATCH
+        )
+    except HTTPException:
+        return None
+    return analysis_job_id
+
+async def run_batch(batch_id, priority):
+    """
+    Feed a batch's companies through the DeepStack and MEARA schedulers.
+
+    Companies are submitted while the scheduler queues have room beyond
+    BATCH_QUEUE_HEADROOM, at most one start per BATCH_START_INTERVAL_SECONDS,
+    so a large batch shares the global worker slots with interactive jobs
+    and never pushes them into a 429.
+    Each company moves to MEARA as soon as its own DeepStack job completes.
+    """
+    batch = batches[batch_id]
+    next_start = 0.0
+    while batch["status"] == "running":
+        for item in batch["items"]:
+            status = item["status"]
+            if status == "pending" and time.monotonic() >= next_start:
+                job_id = start_batch_deepstack(item, priority)
+                if job_id:
+                    item.update(status="deepstack", deepstack_job_id=job_id, started_at=time.time())
+                    next_start = time.monotonic() + BATCH_START_INTERVAL_SECONDS
+            elif status == "deepstack":
+                job = jobs.get(item["deepstack_job_id"])
+                if job is None or job["status"] in ("failed", "cancelled"):
+                    finish_batch_item(batch, item, "failed", f"DeepStack: {job.get('error') if job else 'job lost'}")
+                elif job["status"] == "completed":
+                    if not batch["run_meara"]:
+                        finish_batch_item(batch, item, "completed")
+                    elif time.monotonic() >= next_start:
+                        analysis_job_id = start_batch_meara(item, priority)
+                        if analysis_job_id:
+                            item.update(status="meara", analysis_job_id=analysis_job_id)
+                            next_start = time.monotonic() + BATCH_START_INTERVAL_SECONDS
+            elif status == "meara":
+                job = analysis_jobs.get(item["analysis_job_id"])
+                if job is None or job["status"] in ("failed", "cancelled"):
+                    finish_batch_item(batch, item, "failed", f"MEARA: {job.get('error') if job else 'job lost'}")
+                elif job["status"] == "completed":
+                    item["report_file"] = job.get("report_file")
+                    item["usage"] = job.get("usage")
+                    finish_batch_item(batch, item, "completed")
+
+        if all(item["status"] in TERMINAL_STATUSES for item in batch["items"]):
+            batch["status"] = "completed"
+            batch["completed_at"] = time.time()
+            print(f"[Batch] {batch_id} finished: {summarize_batch(batch['items'])['status_counts']}")
+            break
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+
+@app.post("/api/batch")
+async def start_batch(request: BatchRequest):
+    """
+    Start a portfolio-wide batch: DeepStack, then MEARA, for each company
+
+    Accepts JSON: {"companies": [{"company_name", "company_url"}, ...],
+    "priority": 0, "run_meara": true}. Companies share the global DeepStack
+    and MEARA worker pools; identical URLs coalesce onto existing jobs.
+    Follow progress with GET /api/batch/{batch_id} or the event stream at
+    /api/batch/{batch_id}/events.
+    """
+    try:
+        companies = validate_companies([company.model_dump() for company in request.companies])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    batch_id = str(uuid.uuid4())
+    batches[batch_id] = {
+        "status": "running",
+        "created_at": time.time(),
+        "run_meara": request.run_meara,
+        "items": [new_item(company) for company in companies],
+        "events": []
     }
+    batches[batch_id]["task"] = asyncio.create_task(run_batch(batch_id, request.priority))
+    print(f"[Batch] {batch_id} started with {len(companies)} companies")
+    return {"batch_id": batch_id, "status": "running", "total_companies": len(companies)}
+
+def get_batch(batch_id):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batches[batch_id]
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Batch status with the aggregate portfolio summary and per-company rows"""
+    batch = get_batch(batch_id)
+    return {
+        "batch_id": batch_id,
+        "status": batch["status"],
+        "created_at": batch["created_at"],
+        "completed_at": batch.get("completed_at"),
+        "summary": summarize_batch(batch["items"])
+    }
+
+@app.get("/api/batch/{batch_id}/events")
+async def stream_batch_events(batch_id: str, after: int = 0):
+    """
+    Server-sent events: one "company" event per finished company, then a "summary" event
+
+    Pass after=<seq> to resume a dropped stream without replaying earlier events.
+    """
+    batch = get_batch(batch_id)
+
+    async def events():
+        sent = after
+        while True:
+            for event in batch["events"][sent:]:
+                yield f"id: {event['seq']}\nevent: company\ndata: {json.dumps(event)}\n\n"
+            sent = max(sent, len(batch["events"]))
+            if batch["status"] != "running":
+                summary = summarize_batch(batch["items"])
+                yield f"event: summary\ndata: {json.dumps({'status': batch['status'], **summary})}\n\n"
+                return
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+
+    # identity keeps GZipMiddleware from buffering events until the stream ends
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"})
+
+@app.post("/api/batch/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Cancel a batch: pending companies are skipped and their running jobs cancelled"""
+    batch = get_batch(batch_id)
+    if batch["status"] != "running":
+        raise HTTPException(status_code=409, detail=f"Batch already {batch['status']}")
+    batch["status"] = "cancelled"
+    for item in batch["items"]:
+        if item["status"] in TERMINAL_STATUSES:
+            continue
+        if item["status"] == "deepstack":
+            store, scheduler, job_id = jobs, deepstack_scheduler, item["deepstack_job_id"]
+        elif item["status"] == "meara":
+            store, scheduler, job_id = analysis_jobs, meara_scheduler, item["analysis_job_id"]
+        else:
+            store = None
+        if store is not None:
+            try:
+                cancel_job(store, scheduler, job_id, "Job")
+            except HTTPException:
+                pass  # finished in the meantime
+        finish_batch_item(batch, item, "cancelled", "Batch cancelled")
+    batch["completed_at"] = time.time()
+    return {"batch_id": batch_id, "status": "cancelled", "summary": summarize_batch(batch["items"])}
 
 @app.get("/api/analysis/dashboard/test-ggwp")
 async def get_test_dashboard():
@@ -572,13 +1094,33 @@ async def get_test_dashboard():
 # GTM INVESTMENT DASHBOARD ENDPOINTS (Sprint L2)
 # ============================================================================
 
+@app.get("/api/gtm/companies")
+async def list_gtm_companies(q: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """
+    List companies with a GTM dashboard (latest analysis each), sorted by name
+
+    Args:
+        q: Optional case-insensitive filter on company name or id
+        limit: Page size (1-200)
+        offset: Number of companies to skip
+
+    Example:
+        GET /api/gtm/companies?q=solutions&limit=20
+    """
+    limit = max(1, min(limit, 200))
+    offset = max(0, offset)
+    return company_registry.list(query=q, limit=limit, offset=offset)
+
+
 @app.get("/api/gtm/dashboard/{company_id}")
-async def get_gtm_dashboard(company_id: str):
+async def get_gtm_dashboard(company_id: str, request: Request):
     """
     Get GTM Investment Dashboard data for Scale VP investment partners
 
     Sprint L2 endpoint for pre-investment GTM scalability assessment.
-    Returns MEA_CONFIG data transformed for frontend rendering.
+    Returns MEA_CONFIG data transformed for frontend rendering. The parsed
+    config and transformed dashboard are cached until the file changes, and
+    responses carry an ETag for conditional GETs.
 
     Args:
         company_id: Company identifier (e.g., "comp_ai_solutions_inc")
@@ -595,54 +1137,81 @@ async def get_gtm_dashboard(company_id: str):
     Example:
         GET /api/gtm/dashboard/comp_ai_solutions_inc
     """
-    # Load MEA_CONFIG from sample data
-    # In production, this would query a database
-    sample_data_dir = Path("sample_data")
-
-    # Map company_id to filename
-    company_file_map = {
-        "comp_ai_solutions_inc": "ai-solutions_inc_mea_config.json"
-    }
-
-    if company_id not in company_file_map:
+    # Company -> latest MEA_CONFIG file, from the in-memory registry
+    record = company_registry.get(company_id)
+    if record is None:
         raise HTTPException(
             status_code=404,
-            detail=f"Company not found: {company_id}. Available: {list(company_file_map.keys())}"
+            detail=f"Company not found: {company_id}. See /api/gtm/companies for available companies"
         )
 
-    config_file = sample_data_dir / company_file_map[company_id]
+    config_file = Path(record["file"])
 
-    if not config_file.exists():
+    # Parsed and transformed once per file version
+    try:
+        entry = config_repository.get(config_file)
+    except FileNotFoundError:
         raise HTTPException(
-            status_code=500,
+            status_code=404,
             detail=f"Configuration file not found: {config_file}"
         )
+    except ConfigLoadError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    # Load MEA_CONFIG
-    try:
-        with open(config_file) as f:
-            mea_config = json.load(f)
-    except json.JSONDecodeError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Invalid JSON in config file: {e}"
-        )
+    return cached_json_response(request, entry["dashboard_body"], entry["etag"])
 
-    # Transform using library
-    from gtm_dashboard_transformer import transform_mea_config
 
-    try:
-        transformed_data = transform_mea_config(mea_config)
-        return transformed_data
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Transformation failed: {str(e)}"
-        )
+def load_workflow_state(job):
+    """Workflow state from memory (preferred) or from the saved _state.json"""
+    workflow_state = job.get("workflow_state")
+    if workflow_state:
+        return workflow_state
+
+    report_file_path = job.get("report_file")
+    if not report_file_path:
+        raise ValueError("Analysis state not found")
+
+    # Find corresponding state file
+    report_path = Path(report_file_path)
+    state_file = report_path.parent / report_path.name.replace("_report.md", "_state.json")
+    if not state_file.exists():
+        raise ValueError("Analysis state file not found")
+
+    with open(state_file) as f:
+        return json.load(f)
+
+def build_dashboard(analysis_job_id):
+    """
+    Transform, validate and serialize the dashboard of a completed analysis.
+
+    Completed analyses never change, so the JSON body and its ETag are
+    stored on the job and every later request is served from them.
+    """
+    from dashboard_transformer import transform_workflow_state_to_dashboard, validate_dashboard_data
+    from datetime import datetime
+
+    job = analysis_jobs[analysis_job_id]
+    completed_at = job.get("completed_at")
+    analysis_date = datetime.fromtimestamp(completed_at) if completed_at else datetime.now()
+
+    dashboard_data = transform_workflow_state_to_dashboard(
+        company_name=job["company_name"],
+        company_url=job["company_url"],
+        analysis_date=analysis_date.isoformat()[:10],
+        analysis_job_id=analysis_job_id,
+        workflow_state_dict=load_workflow_state(job)
+    )
 
+    # Validate before caching
+    validate_dashboard_data(dashboard_data)
+
+    body, etag = prepare_json(dashboard_data)
+    job["dashboard_json"] = body
+    job["dashboard_etag"] = etag
+    return body, etag
 
 @app.get("/api/analysis/dashboard/{analysis_job_id}")
-async def get_analysis_dashboard(analysis_job_id: str):
+async def get_analysis_dashboard(analysis_job_id: str, request: Request):
     """
     Get structured dashboard data for interactive visualization (Sprint L1)
 
@@ -652,8 +1221,9 @@ async def get_analysis_dashboard(analysis_job_id: str):
     - 9 dimension scores and analysis
     - Root causes and implementation roadmap
 
-    This endpoint transforms the workflow state into dashboard-compatible JSON
-    matching the dashboard_schema.json contract.
+    The dashboard (matching the dashboard_schema.json contract) is built once
+    when the analysis completes and served from the job afterwards, with an
+    ETag; If-None-Match requests for an unchanged dashboard get 304.
     """
     if analysis_job_id not in analysis_jobs:
         raise HTTPException(status_code=404, detail="Analysis job not found")
@@ -666,55 +1236,17 @@ async def get_analysis_dashboard(analysis_job_id: str):
             detail=f"Analysis not complete. Status: {job['status']}"
         )
 
-    # Get workflow state from in-memory storage (preferred)
-    workflow_state = job.get("workflow_state")
-
-    # Fallback: Load from file if not in memory
-    if not workflow_state:
-        report_file_path = job.get("report_file")
-        if not report_file_path:
+    if job.get("dashboard_json") is None:
+        # Not precomputed (e.g. precompute failed); build once and keep it
+        try:
+            await asyncio.to_thread(build_dashboard, analysis_job_id)
+        except Exception as e:
             raise HTTPException(
                 status_code=500,
-                detail="Analysis state not found"
+                detail=f"Failed to generate dashboard data: {str(e)}"
             )
 
-        # Find corresponding state file
-        report_path = Path(report_file_path)
-        state_file = report_path.parent / report_path.name.replace("_report.md", "_state.json")
-
-        if not state_file.exists():
-            raise HTTPException(
-                status_code=500,
-                detail="Analysis state file not found"
-            )
-
-        # Load workflow state from file
-        with open(state_file) as f:
-            workflow_state = json.load(f)
-
-    # Transform to dashboard format using the transformer library
-    from dashboard_transformer import transform_workflow_state_to_dashboard, validate_dashboard_data
-    from datetime import datetime
-
-    try:
-        dashboard_data = transform_workflow_state_to_dashboard(
-            company_name=job["company_name"],
-            company_url=job["company_url"],
-            analysis_date=datetime.now().isoformat()[:10],
-            analysis_job_id=analysis_job_id,
-            workflow_state_dict=workflow_state
-        )
-
-        # Validate before returning
-        validate_dashboard_data(dashboard_data)
-
-        return dashboard_data
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate dashboard data: {str(e)}"
-        )
+    return cached_json_response(request, job["dashboard_json"], job["dashboard_etag"], cache_control=IMMUTABLE)
 
 # ============================================================================
 # GTM SCALABILITY BRIEFING ENDPOINTS (Dashboard Overhaul)
@@ -903,13 +1435,6 @@ async def get_gtm_briefing(company_id: str):
             ]
         }
 
-def extract_domain(url: str) -> str:
-    """Extract domain from URL for filename"""
-    from urllib.parse import urlparse
-    parsed = urlparse(url)
-    domain = parsed.netloc.replace('www.', '').replace(':', '_')
-    return domain
-
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -6,12 +6,18 @@ Executes the complete 15-node MEARA workflow using Assistants API
 
 import os
 import json
+import hashlib
 import time
 import re
+import threading
 from datetime import datetime
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 from pathlib import Path
 from dotenv import load_dotenv
+from structured_output import extract_json, StructuredOutputError, REPAIR_PROMPT
+from step_contracts import validate_step_output, StepContractError
+from usage_ledger import UsageLedger, BudgetExceeded, MEARA_TOKEN_BUDGET, MEARA_COST_BUDGET_USD
+from openai_scheduler import openai_scheduler, estimate_tokens, run_retry_after, RequestCancelled, LANE_INTERACTIVE
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / ".env")
@@ -19,9 +25,11 @@ load_dotenv(Path(__file__).parent.parent / ".env")
 # Initialize OpenAI client with Assistants API v2
 # VERSION: 2.0 - Fixed v1 deprecation (2025-10-16)
 print("[MEARA] Initializing OpenAI client with Assistants API v2 header")
+# Retries are left to openai_scheduler, which shares 429 backoff across workflows
 client = OpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
-    default_headers={"OpenAI-Beta": "assistants=v2"}
+    default_headers={"OpenAI-Beta": "assistants=v2"},
+    max_retries=0
 )
 print("[MEARA] OpenAI client initialized successfully with v2 API")
 
@@ -43,13 +51,80 @@ def load_assistant_config():
 CONFIG = load_assistant_config()
 ASSISTANTS = {a["key"]: a["assistant_id"] for a in CONFIG["assistants"]}
 
+# Input condensing: DRB / evidence longer than the threshold get one bounded
+# digest that later steps can use instead of the full text
+DIGEST_ENABLED = os.getenv("MEARA_DIGEST_ENABLED", "true").lower() in ("1", "true", "yes")
+DIGEST_MODEL = os.getenv("MEARA_DIGEST_MODEL", "gpt-4o-mini")
+DIGEST_THRESHOLD_CHARS = int(os.getenv("MEARA_DIGEST_THRESHOLD_CHARS", "12000"))
+DIGEST_MAX_CHARS = int(os.getenv("MEARA_DIGEST_MAX_CHARS", "6000"))
+DIGEST_CACHE_DIR = Path(os.getenv("MEARA_DIGEST_CACHE_DIR", str(Path(__file__).parent / "output" / "digests")))
+
+# Shared thread: dependent steps run on one thread and refer to artifacts
+# already in it instead of re-sending them (fewer threads, fewer bytes sent;
+# each run still reads the whole thread)
+SHARED_THREAD = os.getenv("MEARA_SHARED_THREAD", "false").lower() in ("1", "true", "yes")
+SHARED_THREAD_STEPS = (
+    "evidence_collector", "dimension_evaluator", "strategic_verifier", "bottleneck_analyst",
+    "recommendation_builder", "report_assembler", "table_generator",
+)
+# Artifact each shared step leaves in the thread (its response)
+STEP_ARTIFACTS = {
+    "evidence_collector": "evidence",
+    "dimension_evaluator": "dimension_evaluations",
+    "strategic_verifier": "strategic_verification",
+    "bottleneck_analyst": "scalability_bottlenecks",
+    "recommendation_builder": "recommendations",
+}
+
+# JSON mode (response_format json_object) for steps that must return JSON;
+# assistants that reject it (e.g. because of their tools) fall back to text
+JSON_MODE = os.getenv("MEARA_JSON_MODE", "true").lower() in ("1", "true", "yes")
+_json_mode_unsupported = set()  # assistant ids that rejected response_format
+
+# Re-runs of a step whose output violates its contract (step_contracts.py)
+STEP_RETRIES = int(os.getenv("MEARA_STEP_RETRIES", "1"))
+
+# Output tokens assumed for a run until its usage is reported (rate limiting)
+RUN_OUTPUT_TOKENS = int(os.getenv("MEARA_RUN_OUTPUT_TOKENS", "2000"))
+
+# What happens once an analysis has spent its budget (usage_ledger.py):
+# "downgrade" keeps going with digest inputs and without optional steps,
+# "abort" stops the workflow with BudgetExceeded. Both downgrade early, at
+# MEARA_BUDGET_DOWNGRADE_AT of the budget, to stay within it.
+BUDGET_ACTION = os.getenv("MEARA_BUDGET_ACTION", "downgrade").lower()
+BUDGET_DOWNGRADE_AT = float(os.getenv("MEARA_BUDGET_DOWNGRADE_AT", "0.8"))
+# Steps left out of a downgraded analysis
+OPTIONAL_STEPS = ("table_generator",)
+
+# Which version of each large input a step receives ("full" or "digest")
+STEP_INPUTS = {
+    "evidence_collector": {"drb": "full"},
+    "dimension_evaluator": {"drb": "digest", "evidence": "full"},
+    "strategic_verifier": {"drb": "digest"},
+    "bottleneck_analyst": {"drb": "digest"},
+    "report_assembler": {"evidence": "digest"},
+    "table_generator": {"evidence": "full"},
+}
+
+class WorkflowCancelled(Exception):
+    """Raised when the workflow's cancel event is set"""
+
 class WorkflowState:
     """Manages state between workflow steps"""
 
-    def __init__(self, company_name, company_url, deep_research_brief=None):
+    def __init__(self, company_name, company_url, deep_research_brief=None, cancel_event=None, additional_context=None,
+                 lane=LANE_INTERACTIVE, usage=None):
         self.company_name = company_name
         self.company_url = company_url
         self.deep_research_brief = deep_research_brief
+        self.additional_context = additional_context  # selected chunks of uploaded context documents
+        self.digests = {}  # "drb" / "evidence" -> condensed text (only for long inputs)
+        self.thread_id = None  # shared thread (MEARA_SHARED_THREAD)
+        self.thread_artifacts = set()  # artifacts already present in the shared thread
+        self.api_stats = {"threads_created": 0, "messages_sent": 0, "bytes_sent": 0, "repairs": 0, "step_retries": 0}
+        self.cancel_event = cancel_event  # threading.Event set by the API to cancel
+        self.lane = lane  # openai_scheduler priority lane
+        self.usage = usage or UsageLedger()  # tokens / cost per step and the analysis budget
         self.evidence_collection = None
         self.dimension_evaluations = None
         self.strategic_verification = None
@@ -72,56 +147,166 @@ class WorkflowState:
             "strategic_verification": self.strategic_verification,
             "scalability_bottlenecks": self.scalability_bottlenecks,
             "recommendations": self.recommendations,
-            "final_report": self.final_report
+            "final_report": self.final_report,
+            "digests": self.digests,
+            "api_stats": self.api_stats,
+            "usage": self.usage.to_dict()
         }
 
-def call_assistant(assistant_id, message_content, thread_id=None):
-    """Call an assistant and wait for response with progress indicator"""
-
-    # Create or use existing thread
-    if thread_id is None:
-        thread = client.beta.threads.create(
-            extra_headers={"OpenAI-Beta": "assistants=v2"}
-        )
-        thread_id = thread.id
+def check_cancelled(cancel_event):
+    """Raise WorkflowCancelled if the cancel event is set"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise WorkflowCancelled("Workflow cancelled")
 
-    # Add message to thread
-    client.beta.threads.messages.create(
-        thread_id=thread_id,
-        role="user",
-        content=message_content,
-        extra_headers={"OpenAI-Beta": "assistants=v2"}
-    )
+def api_call(fn, *args, lane=LANE_INTERACTIVE, cancel_event=None, tokens=0, requests=0, **kwargs):
+    """Call the OpenAI API through the shared rate-limit scheduler
 
-    # Run assistant
-    print("  🤖 Assistant working", end="", flush=True)
-    run = client.beta.threads.runs.create(
+    Model requests pass requests=1 and their estimated tokens; other calls
+    only get the scheduler's 429 and transient-error retries.
+    """
+    try:
+        return openai_scheduler.call(fn, *args, tokens=tokens, requests=requests, lane=lane,
+                                     cancel_event=cancel_event, **kwargs)
+    except RequestCancelled:
+        raise WorkflowCancelled("Workflow cancelled")
+
+def create_run(thread_id, assistant_id, json_mode=False, lane=LANE_INTERACTIVE, cancel_event=None, tokens=0):
+    """Start a run, in JSON mode when requested and supported by the assistant"""
+    if json_mode and assistant_id not in _json_mode_unsupported:
+        try:
+            return api_call(
+                client.beta.threads.runs.create,
+                lane=lane, cancel_event=cancel_event, tokens=tokens, requests=1,
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                extra_body={"response_format": {"type": "json_object"}},
+                extra_headers={"OpenAI-Beta": "assistants=v2"}
+            )
+        except BadRequestError as e:
+            print(f"\n  ⚠ JSON mode not available for {assistant_id}, using text: {e}")
+            _json_mode_unsupported.add(assistant_id)
+    return api_call(
+        client.beta.threads.runs.create,
+        lane=lane, cancel_event=cancel_event, tokens=tokens, requests=1,
         thread_id=thread_id,
         assistant_id=assistant_id,
         extra_headers={"OpenAI-Beta": "assistants=v2"}
     )
 
-    # Wait for completion with progress dots
+def wait_for_run(thread_id, run, cancel_event=None, lane=LANE_INTERACTIVE):
+    """Poll a run until it leaves the queued / in_progress states
+
+    If cancel_event is set meanwhile, the run is cancelled through the API
+    and WorkflowCancelled is raised.
+    """
     elapsed = 0
     while run.status in ["queued", "in_progress", "cancelling"]:
-        time.sleep(1)
+        if cancel_event is not None:
+            # Wakes immediately when the job is cancelled
+            cancel_event.wait(1)
+        else:
+            time.sleep(1)
         elapsed += 1
 
+        if cancel_event is not None and cancel_event.is_set():
+            print()
+            try:
+                client.beta.threads.runs.cancel(
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    extra_headers={"OpenAI-Beta": "assistants=v2"}
+                )
+                print(f"  ✗ Cancelled assistant run {run.id}")
+            except Exception as e:
+                # The run may have finished in the meantime
+                print(f"  ⚠ Could not cancel assistant run {run.id}: {e}")
+            raise WorkflowCancelled("Workflow cancelled")
+
         # Print progress dot every second
         if elapsed % 3 == 0:
             print(".", end="", flush=True)
 
-        run = client.beta.threads.runs.retrieve(
+        run = api_call(
+            client.beta.threads.runs.retrieve,
+            lane=lane, cancel_event=cancel_event,
             thread_id=thread_id,
             run_id=run.id,
             extra_headers={"OpenAI-Beta": "assistants=v2"}
         )
+    return run
+
+def call_assistant(assistant_id, message_content, thread_id=None, cancel_event=None, stats=None, json_mode=False,
+                   lane=LANE_INTERACTIVE, record_usage=None):
+    """Call an assistant and wait for response with progress indicator
+
+    Passing thread_id continues an existing thread. stats (a dict with
+    threads_created, messages_sent and bytes_sent) is updated in place.
+    json_mode requests response_format json_object for the run; if the
+    assistant rejects it, the run is created without it.
+
+    Requests go through the shared openai_scheduler in the given lane; a
+    run that fails with rate_limit_exceeded is re-created on the same
+    thread after the backoff. record_usage(model, usage) is called for
+    every run that reports token usage.
+
+    If cancel_event is set while the run is in progress, the run is cancelled
+    through the API (so it stops consuming tokens) and WorkflowCancelled is
+    raised.
+    """
+    check_cancelled(cancel_event)
+
+    # Create or use existing thread
+    if thread_id is None:
+        thread = api_call(
+            client.beta.threads.create,
+            lane=lane, cancel_event=cancel_event,
+            extra_headers={"OpenAI-Beta": "assistants=v2"}
+        )
+        thread_id = thread.id
+        if stats is not None:
+            stats["threads_created"] += 1
+
+    # Add message to thread
+    api_call(
+        client.beta.threads.messages.create,
+        lane=lane, cancel_event=cancel_event,
+        thread_id=thread_id,
+        role="user",
+        content=message_content,
+        extra_headers={"OpenAI-Beta": "assistants=v2"}
+    )
+    if stats is not None:
+        stats["messages_sent"] += 1
+        stats["bytes_sent"] += len(message_content.encode("utf-8"))
+
+    # Run assistant
+    print("  🤖 Assistant working", end="", flush=True)
+    estimated_tokens = estimate_tokens(message_content) + RUN_OUTPUT_TOKENS
+    for attempt in range(openai_scheduler.max_retries + 1):
+        run = create_run(thread_id, assistant_id, json_mode, lane, cancel_event, estimated_tokens)
+        run = wait_for_run(thread_id, run, cancel_event, lane)
+
+        usage = getattr(run, "usage", None)
+        if usage is not None:
+            openai_scheduler.settle(estimated_tokens, usage.total_tokens)
+            if record_usage is not None:
+                record_usage(getattr(run, "model", None), usage)
+        delay = run_retry_after(run)
+        if delay is not None and usage is None:
+            # The rate-limited run used none of its token reservation
+            openai_scheduler.refund(estimated_tokens, requests=0)
+        if delay is None or attempt == openai_scheduler.max_retries:
+            break
+        print(f"\n  ⏳ Run hit the rate limit; retrying in {delay:.1f}s", end="", flush=True)
+        openai_scheduler.backoff(delay)
 
     print()  # New line after progress dots
 
     if run.status == "completed":
         # Get messages
-        messages = client.beta.threads.messages.list(
+        messages = api_call(
+            client.beta.threads.messages.list,
+            lane=lane, cancel_event=cancel_event,
             thread_id=thread_id,
             order="desc",
             limit=1,
@@ -138,22 +323,196 @@ def call_assistant(assistant_id, message_content, thread_id=None):
         raise Exception(f"Assistant run failed with status: {run.status}")
 
 def parse_json_response(response):
-    """Parse JSON from assistant response"""
+    """Parse JSON from assistant response (see structured_output.extract_json)"""
+    return extract_json(response)
+
+def uses_shared_thread(step_key):
+    return SHARED_THREAD and step_key in SHARED_THREAD_STEPS
+
+def section(state, step_key, title, name, text):
+    """Prompt section for an artifact, or a reference if the shared thread has it"""
+    if uses_shared_thread(step_key):
+        if name in state.thread_artifacts:
+            return f"{title}: (provided earlier in this conversation)"
+        state.thread_artifacts.add(name)
+    return f"{title}:\n{text}"
+
+def call_step(state, step_key, assistant_key, prompt, json_mode=False):
+    """Run a step's assistant call on the shared thread or a new one
+
+    The step checks the budget with enforce_budget before building its
+    prompt; a step the budget skipped sends nothing.
+
+    Returns:
+        (response, thread_id), or (None, None) for a skipped step
+    """
+    if step_key in state.usage.skipped_steps:
+        return None, None
+    shared = uses_shared_thread(step_key)
+    response, thread_id = call_assistant(
+        ASSISTANTS[assistant_key],
+        prompt,
+        thread_id=state.thread_id if shared else None,
+        cancel_event=state.cancel_event,
+        stats=state.api_stats,
+        json_mode=json_mode,
+        lane=state.lane,
+        record_usage=step_usage(state, step_key)
+    )
+    if shared:
+        state.thread_id = thread_id
+        if step_key in STEP_ARTIFACTS:
+            state.thread_artifacts.add(STEP_ARTIFACTS[step_key])
+    return response, thread_id
+
+def step_usage(state, step_key):
+    """record_usage callback charging a step in the analysis' usage ledger"""
+    return lambda model, usage: state.usage.record(step_key, model, usage)
+
+def enforce_budget(state, step_key):
+    """Apply the analysis budget at the start of a step, before its prompt is built
+
+    Past BUDGET_DOWNGRADE_AT of the budget the rest of the workflow is
+    downgraded: inputs above DIGEST_MAX_CHARS are condensed and steps
+    receive digests wherever one exists, and OPTIONAL_STEPS are skipped.
+    Past the full budget, BUDGET_ACTION "abort" raises BudgetExceeded.
+
+    Returns:
+        False if the step should be skipped
+    """
+    fraction = state.usage.fraction_used()
+    if fraction is None:
+        return True
+    if fraction >= 1.0 and BUDGET_ACTION == "abort":
+        raise BudgetExceeded(step_key, state.usage.to_dict())
+    if fraction >= BUDGET_DOWNGRADE_AT and not state.usage.downgraded:
+        state.usage.downgraded = True
+        print(f"  ⚠ {fraction:.0%} of the analysis budget spent; downgrading the remaining steps")
+        if DIGEST_ENABLED:
+            condense_inputs(state, DIGEST_MAX_CHARS)
+    if state.usage.downgraded and step_key in OPTIONAL_STEPS:
+        state.usage.skipped_steps.append(step_key)
+        return False
+    return True
+
+def call_step_json(state, step_key, assistant_key, prompt):
+    """Run a step that returns JSON and check it against the step's contract
+
+    An output that violates the contract re-runs the step right away (up to
+    STEP_RETRIES times) with the violations appended to the prompt, so later
+    steps never start on malformed input.
+
+    Raises:
+        StepContractError: Still invalid after the retries.
+    """
+    step_prompt = prompt
+    for attempt in range(STEP_RETRIES + 1):
+        data = parse_step_response(state, step_key, assistant_key, step_prompt)
+        errors = validate_step_output(step_key, data)
+        if not errors:
+            return data
+        print(f"  ⚠ Output violates the {step_key} contract: {'; '.join(errors)}")
+        if attempt < STEP_RETRIES:
+            state.api_stats["step_retries"] += 1
+            step_prompt = (
+                f"{prompt}\n\nA previous answer to this request did not match the required JSON format: "
+                f"{'; '.join(errors)}. Return JSON that fixes these problems."
+            )
+    raise StepContractError(step_key, errors)
+
+def parse_step_response(state, step_key, assistant_key, prompt):
+    """Run a JSON step and parse its output; on a parse failure, ask for a repair once
+
+    The repair request goes to the same thread, so the assistant corrects
+    its own response instead of redoing the step.
+    """
+    response, thread_id = call_step(state, step_key, assistant_key, prompt, json_mode=JSON_MODE)
     try:
-        # Try direct JSON parse
-        return json.loads(response)
-    except json.JSONDecodeError:
-        # Try to extract JSON from markdown code blocks
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(1))
-
-        # Try to extract any JSON object
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
-
-        raise ValueError("Could not parse JSON from response")
+        return parse_json_response(response)
+    except StructuredOutputError as e:
+        print(f"  ⚠ {e}; requesting repair")
+        repaired, _ = call_assistant(
+            ASSISTANTS[assistant_key],
+            REPAIR_PROMPT.format(error=e),
+            thread_id=thread_id,
+            cancel_event=state.cancel_event,
+            stats=state.api_stats,
+            json_mode=JSON_MODE,
+            lane=state.lane,
+            record_usage=step_usage(state, step_key)
+        )
+        state.api_stats["repairs"] += 1
+        return parse_json_response(repaired)
+
+def additional_context_section(state, step_key):
+    """Prompt section with excerpts of uploaded context documents (empty if none)"""
+    if not state.additional_context:
+        return ""
+    title = "Additional Context Documents (excerpts from investor memos, pitch decks, etc.)"
+    return "\n" + section(state, step_key, title, "additional_context", state.additional_context) + "\n"
+
+def format_drb(state):
+    """Deep Research Brief as prompt text"""
+    if isinstance(state.deep_research_brief, dict):
+        return json.dumps(state.deep_research_brief, indent=2)
+    return state.deep_research_brief
+
+def format_evidence(state):
+    """Evidence collection as prompt text"""
+    return json.dumps(state.evidence_collection, indent=2)
+
+def step_input(state, step_key, name):
+    """Full or digest text of a large input ("drb" / "evidence") for a step"""
+    wants_digest = STEP_INPUTS.get(step_key, {}).get(name) == "digest" or state.usage.downgraded
+    if wants_digest and state.digests.get(name):
+        return state.digests[name]
+    return format_drb(state) if name == "drb" else format_evidence(state)
+
+def digest_text(kind, text, cancel_event=None, lane=LANE_INTERACTIVE, record_usage=None):
+    """Condense text to at most DIGEST_MAX_CHARS, cached by content hash
+
+    The digest is cached on disk under a key made from the text, the kind,
+    the model and the size bound, so re-running an analysis with the same
+    DRB or evidence reuses it.
+    """
+    key = hashlib.sha256(f"{kind}\n{DIGEST_MODEL}\n{DIGEST_MAX_CHARS}\n{text}".encode("utf-8")).hexdigest()
+    cache_file = DIGEST_CACHE_DIR / f"{key}.txt"
+    if cache_file.exists():
+        print(f"  ✓ {kind} digest from cache")
+        return cache_file.read_text(encoding="utf-8")
+
+    check_cancelled(cancel_event)
+    estimated_tokens = estimate_tokens(text) + DIGEST_MAX_CHARS // 3
+    completion = api_call(
+        client.chat.completions.create,
+        lane=lane, cancel_event=cancel_event, tokens=estimated_tokens, requests=1,
+        model=DIGEST_MODEL,
+        temperature=0.1,
+        max_tokens=DIGEST_MAX_CHARS // 3,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    f"Condense the {kind} below for a GTM scalability analysis. Keep every concrete fact, "
+                    "metric, customer, competitor, channel and source citation ([Source: ...]); drop repetition "
+                    f"and narrative. Respond in plain text of at most {DIGEST_MAX_CHARS} characters."
+                )
+            },
+            {"role": "user", "content": text}
+        ]
+    )
+    if getattr(completion, "usage", None) is not None:
+        openai_scheduler.settle(estimated_tokens, completion.usage.total_tokens)
+        if record_usage is not None:
+            record_usage(getattr(completion, "model", DIGEST_MODEL), completion.usage)
+    digest = (completion.choices[0].message.content or "")[:DIGEST_MAX_CHARS]
+
+    DIGEST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Per-thread temp name: concurrent workflows may digest the same text
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_file.write_text(digest, encoding="utf-8")
+    os.replace(tmp_file, cache_file)
+    return digest
 
 def step_01_input_collection(state):
     """Node 1: START - Input Collection"""
@@ -161,6 +520,7 @@ def step_01_input_collection(state):
     print(f"  Company: {state.company_name}")
     print(f"  URL: {state.company_url}")
     print(f"  DRB Provided: {'Yes' if state.deep_research_brief else 'No'}")
+    print(f"  Additional Context: {len(state.additional_context or '')} chars")
 
 def step_02_drb_check(state):
     """Node 2: LOGIC - DRB Check"""
@@ -179,6 +539,7 @@ def step_03_research_agent(state):
     print("\n[3/15] 🔬 Research Agent - Creating Deep Research Brief")
     print(f"  Agent: MEARA Research Agent ({ASSISTANTS['research_agent']})")
 
+    enforce_budget(state, "research_agent")
     start = time.time()
 
     prompt = f"""Create a Deep Research Brief for the following B2B SaaS company:
@@ -195,8 +556,7 @@ Execute the Deep Research Protocol to analyze:
 
 Return results as JSON with keys: deep_research_brief, breakthrough_sparks, strategic_imperatives"""
 
-    response, _ = call_assistant(ASSISTANTS["research_agent"], prompt)
-    result = parse_json_response(response)
+    result = call_step_json(state, "research_agent", "research_agent", prompt)
 
     state.deep_research_brief = result.get("deep_research_brief", result)
     state.step_timings["research_agent"] = time.time() - start
@@ -208,6 +568,7 @@ def step_04_evidence_collector(state):
     print("\n[4/15] 📊 Evidence Collector - Gathering evidence across 9 dimensions")
     print(f"  Agent: MEARA Evidence Collector ({ASSISTANTS['evidence_collector']})")
 
+    enforce_budget(state, "evidence_collector")
     start = time.time()
 
     prompt = f"""Collect evidence for marketing analysis:
@@ -215,39 +576,71 @@ def step_04_evidence_collector(state):
 Company Name: {state.company_name}
 Company URL: {state.company_url}
 
-Deep Research Brief:
-{json.dumps(state.deep_research_brief, indent=2) if isinstance(state.deep_research_brief, dict) else state.deep_research_brief}
-
+{section(state, "evidence_collector", "Deep Research Brief", "drb", step_input(state, "evidence_collector", "drb"))}
+{additional_context_section(state, "evidence_collector")}
 Conduct web research to gather evidence for all 9 marketing dimensions.
 Return as JSON with evidence organized by dimension."""
 
-    response, _ = call_assistant(ASSISTANTS["evidence_collector"], prompt)
-    state.evidence_collection = parse_json_response(response)
+    state.evidence_collection = call_step_json(state, "evidence_collector", "evidence_collector", prompt)
 
     state.step_timings["evidence_collector"] = time.time() - start
     print(f"  ✓ Completed in {state.step_timings['evidence_collector']:.1f}s")
 
+def condense_inputs(state, threshold_chars=None):
+    """Digest the DRB and evidence where longer than threshold_chars and not digested yet
+
+    threshold_chars defaults to DIGEST_THRESHOLD_CHARS.
+    """
+    if threshold_chars is None:
+        threshold_chars = DIGEST_THRESHOLD_CHARS
+    for name, text in (("drb", format_drb(state)), ("evidence", format_evidence(state))):
+        if name in state.digests:
+            continue
+        if not text or len(text) <= threshold_chars:
+            print(f"  {name}: {len(text or '')} chars, full text used")
+            continue
+        label = "Deep Research Brief" if name == "drb" else "evidence collection"
+        try:
+            state.digests[name] = digest_text(label, text, state.cancel_event, state.lane,
+                                              step_usage(state, "input_condensing"))
+            print(f"  {name}: {len(text)} → {len(state.digests[name])} chars")
+        except WorkflowCancelled:
+            raise
+        except Exception as e:
+            # Digests are an optimization; steps fall back to the full text
+            print(f"  ⚠ {name} digest failed, using full text: {e}")
+
+def step_04b_condense_inputs(state):
+    """Node 4b: LOGIC - Condense long DRB / evidence into bounded digests"""
+    print("\n[4b/15] Input Condensing")
+
+    if not DIGEST_ENABLED:
+        print("  Disabled")
+        return
+
+    start = time.time()
+    condense_inputs(state)
+    state.step_timings["input_condensing"] = time.time() - start
+
 def step_05_dimension_evaluator(state):
     """Node 5: AGENT - Dimension Evaluator"""
     print("\n[5/15] 📈 Dimension Evaluator - Evaluating 9 dimensions")
     print(f"  Agent: MEARA Dimension Evaluator ({ASSISTANTS['dimension_evaluator']})")
 
+    enforce_budget(state, "dimension_evaluator")
     start = time.time()
 
     prompt = f"""Evaluate GTM scalability across 9 dimensions:
 
 Company: {state.company_name}
 
-Evidence Collection:
-{json.dumps(state.evidence_collection, indent=2)}
-
-Deep Research Brief:
-{json.dumps(state.deep_research_brief, indent=2) if isinstance(state.deep_research_brief, dict) else state.deep_research_brief}
+{section(state, "dimension_evaluator", "Evidence Collection", "evidence", step_input(state, "dimension_evaluator", "evidence"))}
 
+{section(state, "dimension_evaluator", "Deep Research Brief", "drb", step_input(state, "dimension_evaluator", "drb"))}
+{additional_context_section(state, "dimension_evaluator")}
 Evaluate each dimension and return ratings, strengths, and opportunities as JSON."""
 
-    response, _ = call_assistant(ASSISTANTS["dimension_evaluator"], prompt)
-    state.dimension_evaluations = parse_json_response(response)
+    state.dimension_evaluations = call_step_json(state, "dimension_evaluator", "dimension_evaluator", prompt)
 
     state.step_timings["dimension_evaluator"] = time.time() - start
     print(f"  ✓ Completed in {state.step_timings['dimension_evaluator']:.1f}s")
@@ -262,20 +655,18 @@ def step_07_strategic_verifier(state):
     print("\n[7/15] 🎯 Strategic Verifier - Checking 8 strategic elements")
     print(f"  Agent: MEARA Strategic Verifier ({ASSISTANTS['strategic_verifier']})")
 
+    enforce_budget(state, "strategic_verifier")
     start = time.time()
 
     prompt = f"""Verify strategic elements using the Strategic Elements Framework:
 
-Dimension Evaluations:
-{json.dumps(state.dimension_evaluations, indent=2)}
+{section(state, "strategic_verifier", "Dimension Evaluations", "dimension_evaluations", json.dumps(state.dimension_evaluations, indent=2))}
 
-Deep Research Brief:
-{json.dumps(state.deep_research_brief, indent=2) if isinstance(state.deep_research_brief, dict) else state.deep_research_brief}
+{section(state, "strategic_verifier", "Deep Research Brief", "drb", step_input(state, "strategic_verifier", "drb"))}
 
 Assess all 8 strategic elements and return verification table with priorities as JSON."""
 
-    response, _ = call_assistant(ASSISTANTS["strategic_verifier"], prompt)
-    state.strategic_verification = parse_json_response(response)
+    state.strategic_verification = call_step_json(state, "strategic_verifier", "strategic_verifier", prompt)
 
     state.step_timings["strategic_verifier"] = time.time() - start
     print(f"  ✓ Completed in {state.step_timings['strategic_verifier']:.1f}s")
@@ -297,27 +688,24 @@ def step_09_bottleneck_analyst(state, high_priority_flag):
     print("\n[9/15] 🔍 Scalability Bottleneck Analyst - Identifying 3-5 scalability bottlenecks")
     print(f"  Agent: MEARA Scalability Bottleneck Analyst ({ASSISTANTS['rootcause_analyst']})")
 
+    enforce_budget(state, "bottleneck_analyst")
     start = time.time()
 
     prompt = f"""Identify scalability bottlenecks in GTM execution:
 
 Company: {state.company_name}
 
-Dimension Evaluations:
-{json.dumps(state.dimension_evaluations, indent=2)}
+{section(state, "bottleneck_analyst", "Dimension Evaluations", "dimension_evaluations", json.dumps(state.dimension_evaluations, indent=2))}
 
-Strategic Verification:
-{json.dumps(state.strategic_verification, indent=2)}
+{section(state, "bottleneck_analyst", "Strategic Verification", "strategic_verification", json.dumps(state.strategic_verification, indent=2))}
 
-Deep Research Brief:
-{json.dumps(state.deep_research_brief, indent=2) if isinstance(state.deep_research_brief, dict) else state.deep_research_brief}
+{section(state, "bottleneck_analyst", "Deep Research Brief", "drb", step_input(state, "bottleneck_analyst", "drb"))}
 
 High Priority Strategic Elements Flag: {high_priority_flag}
 
 Identify 3-5 fundamental scalability bottlenecks and return as JSON."""
 
-    response, _ = call_assistant(ASSISTANTS["rootcause_analyst"], prompt)
-    state.scalability_bottlenecks = parse_json_response(response)
+    state.scalability_bottlenecks = call_step_json(state, "bottleneck_analyst", "rootcause_analyst", prompt)
 
     state.step_timings["bottleneck_analyst"] = time.time() - start
     print(f"  ✓ Completed in {state.step_timings['bottleneck_analyst']:.1f}s")
@@ -327,22 +715,20 @@ def step_10_recommendation_builder(state):
     print("\n[10/15] 💡 Recommendation Builder - Developing 5-7 recommendations")
     print(f"  Agent: MEARA Recommendation Builder ({ASSISTANTS['recommendation_builder']})")
 
+    enforce_budget(state, "recommendation_builder")
     start = time.time()
 
     prompt = f"""Develop strategic growth levers:
 
 Company: {state.company_name}
 
-Scalability Bottlenecks:
-{json.dumps(state.scalability_bottlenecks, indent=2)}
+{section(state, "recommendation_builder", "Scalability Bottlenecks", "scalability_bottlenecks", json.dumps(state.scalability_bottlenecks, indent=2))}
 
-Strategic Verification:
-{json.dumps(state.strategic_verification, indent=2)}
+{section(state, "recommendation_builder", "Strategic Verification", "strategic_verification", json.dumps(state.strategic_verification, indent=2))}
 
 Create 5-7 strategic growth levers with priority matrix. Return as JSON."""
 
-    response, _ = call_assistant(ASSISTANTS["recommendation_builder"], prompt)
-    state.recommendations = parse_json_response(response)
+    state.recommendations = call_step_json(state, "recommendation_builder", "recommendation_builder", prompt)
 
     state.step_timings["recommendation_builder"] = time.time() - start
     print(f"  ✓ Completed in {state.step_timings['recommendation_builder']:.1f}s")
@@ -352,6 +738,7 @@ def step_11_report_assembler(state):
     print("\n[11/15] 📝 Report Assembler - Assembling main report")
     print(f"  Agent: MEARA Report Assembler ({ASSISTANTS['report_assembler']})")
 
+    enforce_budget(state, "report_assembler")
     start = time.time()
 
     prompt = f"""Assemble the complete GTM Scalability Analysis report:
@@ -360,24 +747,19 @@ Company: {state.company_name}
 URL: {state.company_url}
 Analysis Date: {datetime.now().strftime('%Y-%m-%d')}
 
-Evidence Collection:
-{json.dumps(state.evidence_collection, indent=2)}
+{section(state, "report_assembler", "Evidence Collection", "evidence", step_input(state, "report_assembler", "evidence"))}
 
-Dimension Evaluations:
-{json.dumps(state.dimension_evaluations, indent=2)}
+{section(state, "report_assembler", "Dimension Evaluations", "dimension_evaluations", json.dumps(state.dimension_evaluations, indent=2))}
 
-Strategic Verification:
-{json.dumps(state.strategic_verification, indent=2)}
+{section(state, "report_assembler", "Strategic Verification", "strategic_verification", json.dumps(state.strategic_verification, indent=2))}
 
-Scalability Bottlenecks:
-{json.dumps(state.scalability_bottlenecks, indent=2)}
+{section(state, "report_assembler", "Scalability Bottlenecks", "scalability_bottlenecks", json.dumps(state.scalability_bottlenecks, indent=2))}
 
-Recommendations:
-{json.dumps(state.recommendations, indent=2)}
+{section(state, "report_assembler", "Recommendations", "recommendations", json.dumps(state.recommendations, indent=2))}
 
 Create the complete markdown report following the MEARA report structure."""
 
-    response, _ = call_assistant(ASSISTANTS["report_assembler"], prompt)
+    response, _ = call_step(state, "report_assembler", "report_assembler", prompt)
     state.final_report = response
 
     state.step_timings["report_assembler"] = time.time() - start
@@ -388,21 +770,23 @@ def step_12_table_generator(state):
     print("\n[12/15] 📊 Table Generator - Creating 9 detailed dimension tables")
     print(f"  Agent: MEARA Table Generator ({ASSISTANTS['table_generator']})")
 
+    if not enforce_budget(state, "table_generator"):
+        print("  ⏭ Skipped: analysis budget (tables are an optional appendix)")
+        return
+
     start = time.time()
 
     prompt = f"""Generate the 9 detailed dimension analysis tables as an appendix:
 
 Company: {state.company_name}
 
-Dimension Evaluations:
-{json.dumps(state.dimension_evaluations, indent=2)}
+{section(state, "table_generator", "Dimension Evaluations", "dimension_evaluations", json.dumps(state.dimension_evaluations, indent=2))}
 
-Evidence Collection:
-{json.dumps(state.evidence_collection, indent=2)}
+{section(state, "table_generator", "Evidence Collection", "evidence", step_input(state, "table_generator", "evidence"))}
 
 Create comprehensive tables for ALL 9 dimensions with sub-element ratings, qualitative assessments, and evidence citations."""
 
-    response, _ = call_assistant(ASSISTANTS["table_generator"], prompt)
+    response, _ = call_step(state, "table_generator", "table_generator", prompt)
 
     # Append tables to final report
     state.final_report = state.final_report + "\n\n" + response
@@ -450,6 +834,10 @@ def step_15_end(state):
     print("MEARA Analysis Complete!")
     print(f"{'=' * 60}")
     print(f"Total Time: {total_time:.1f}s ({total_time/60:.1f} minutes)")
+    usage = state.usage.to_dict()
+    print(f"Token Usage: {usage['total']['total_tokens']} tokens (${usage['cost_usd']:.2f})")
+    if usage["budget"]["downgraded"]:
+        print(f"  Budget downgrade; skipped: {', '.join(usage['budget']['skipped_steps']) or 'none'}")
     print(f"\nStep Timings:")
     for step, duration in state.step_timings.items():
         print(f"  {step}: {duration:.1f}s")
@@ -484,15 +872,37 @@ def save_results(state, output_dir=None):
 
     return report_file
 
-def run_meara_workflow(company_name, company_url, deep_research_brief=None):
-    """Execute the complete MEARA workflow"""
+def run_meara_workflow(company_name, company_url, deep_research_brief=None, cancel_event=None,
+                       additional_context=None, lane=LANE_INTERACTIVE, token_budget=None, cost_budget_usd=None):
+    """Execute the complete MEARA workflow
+
+    additional_context is text selected from uploaded context documents
+    (see document_ingestion.build_context); it is added to the evidence
+    collection and dimension evaluation prompts.
+
+    Setting cancel_event (a threading.Event) stops the workflow at the next
+    assistant call or poll, cancelling the active run; WorkflowCancelled is
+    raised and no results are saved.
+
+    lane is the openai_scheduler priority lane of the workflow's API
+    requests (LANE_INTERACTIVE or LANE_BATCH).
+
+    token_budget / cost_budget_usd override MEARA_TOKEN_BUDGET and
+    MEARA_COST_BUDGET_USD for this analysis (see enforce_budget). With
+    BUDGET_ACTION "abort", BudgetExceeded is raised once the budget is
+    spent; it carries the usage so far.
+    """
 
     print("=" * 60)
     print("MEARA GTM Scalability Analysis")
     print("=" * 60)
 
     # Initialize state
-    state = WorkflowState(company_name, company_url, deep_research_brief)
+    usage = UsageLedger(
+        MEARA_TOKEN_BUDGET if token_budget is None else token_budget,
+        MEARA_COST_BUDGET_USD if cost_budget_usd is None else cost_budget_usd
+    )
+    state = WorkflowState(company_name, company_url, deep_research_brief, cancel_event, additional_context, lane, usage)
 
     # Execute workflow nodes
     step_01_input_collection(state)
@@ -503,6 +913,7 @@ def run_meara_workflow(company_name, company_url, deep_research_brief=None):
         step_03_research_agent(state)
 
     step_04_evidence_collector(state)
+    step_04b_condense_inputs(state)
     step_05_dimension_evaluator(state)
     step_06_strategic_framework_search(state)
     step_07_strategic_verifier(state)
@@ -518,6 +929,7 @@ def run_meara_workflow(company_name, company_url, deep_research_brief=None):
     step_15_end(state)
 
     # Save results
+    check_cancelled(cancel_event)
     report_file = save_results(state)
 
     return state, report_file
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+openai_scheduler.py
+
+Process-wide, rate-limit aware scheduling of OpenAI API requests.
+
+Every MEARA workflow thread in the process shares one RateLimitScheduler.
+Model requests (assistant runs, chat completions) draw from two token
+buckets sized to the organisation's quota: requests per minute and tokens
+per minute. The bucket refills continuously, so throughput settles at the
+quota instead of bursting into 429s and then idling. Token costs are estimated
+up front and corrected with the run's reported usage once it finishes.
+
+Waiting requests are served by lane (interactive before batch) and FIFO
+within a lane. A 429 pauses all lanes for the server's Retry-After (or the
+rate-limit reset headers) before the request is retried; a run that fails
+with rate_limit_exceeded is retried the same way. Other API calls (thread
+and message creation, run polling) do not draw from the buckets but get the
+same 429 / transient-error retries.
+
+Usage:
+    from openai_scheduler import openai_scheduler, LANE_BATCH
+    run = openai_scheduler.call(client.beta.threads.runs.create, thread_id=..., assistant_id=...,
+                                tokens=3000, lane=LANE_BATCH)
+    openai_scheduler.settle(3000, run.usage.total_tokens)   # once usage is known
+    openai_scheduler.stats()
+
+    # CLI: show the effective limits
+    python3 openai_scheduler.py
+"""
+
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+
+# Organisation quota for the models the workflow uses (0 disables a bucket)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+# Retries after the first attempt for 429s, rate-limited runs and transient errors
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+# Backoff when the server gives no Retry-After (doubles per retry)
+OPENAI_BACKOFF_BASE_SECONDS = float(os.getenv("OPENAI_BACKOFF_BASE_SECONDS", "2"))
+MAX_BACKOFF_SECONDS = float(os.getenv("OPENAI_MAX_BACKOFF_SECONDS", "60"))
+
+# Priority lanes, served in this order
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+CHARS_PER_TOKEN = 4
+
+
+class RequestCancelled(Exception):
+    """The cancel event was set while the request waited for capacity."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of prompt text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _duration_seconds(value: str) -> Optional[float]:
+    """Seconds in an x-ratelimit-reset value such as "1s", "6m0s" or "250ms"."""
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Delay requested by a 429 response, from its headers.
+
+    Checks retry-after-ms, retry-after (seconds or HTTP date) and the
+    x-ratelimit-reset-* headers, in that order. None when absent.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        value = headers["retry-after"]
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [
+        _duration_seconds(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens") if headers.get(name)
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def run_retry_after(run: Any) -> Optional[float]:
+    """
+    Backoff for an assistant run that failed on a rate limit, else None.
+
+    Uses the "try again in 20s" hint of the run's last_error when present.
+    """
+    error = getattr(run, "last_error", None)
+    if getattr(run, "status", None) != "failed" or getattr(error, "code", None) != "rate_limit_exceeded":
+        return None
+    match = re.search(r"try again in ([\d.]+)\s*(ms|s)", getattr(error, "message", "") or "")
+    if not match:
+        return OPENAI_BACKOFF_BASE_SECONDS
+    return float(match.group(1)) / (1000 if match.group(2) == "ms" else 1)
+
+
+def backoff_delay(attempt: int, base: float = OPENAI_BACKOFF_BASE_SECONDS) -> float:
+    """Exponential backoff with jitter for retry number `attempt` (0-based)."""
+    delay = base * (2 ** attempt)
+    return min(MAX_BACKOFF_SECONDS, delay + random.uniform(0, delay / 4))
+
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units (unlimited when <= 0)."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` (capped at the capacity) is available."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        """Spend `amount`; a negative level is paid back by later refills."""
+        if self.capacity > 0:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return over-estimated units (or charge more with a negative amount)."""
+        if self.capacity > 0:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimitScheduler:
+    """Shared RPM/TPM buckets with priority lanes and Retry-After handling."""
+
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT,
+                 max_retries: int = OPENAI_MAX_RETRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_retries = max_retries
+        self._clock = clock
+        self._requests = TokenBucket(rpm, clock)
+        self._tokens = TokenBucket(tpm, clock)
+        self._condition = threading.Condition()
+        self._waiting = []  # heap of (lane rank, sequence)
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+        self._granted = {lane: 0 for lane in LANES}
+        self._wait_seconds = {lane: 0.0 for lane in LANES}
+        self._tokens_granted = 0
+        self._rate_limited = 0
+        self._retries = 0
+
+    def acquire(self, tokens: int = 0, requests: int = 1, lane: str = LANE_INTERACTIVE,
+                cancel_event: Optional[threading.Event] = None) -> float:
+        """
+        Block until the buckets can pay for a request; returns the seconds waited.
+
+        Free calls (no requests, no tokens) don't queue behind paid ones; they
+        only wait out a 429 pause.
+
+        Raises:
+            RequestCancelled: cancel_event was set while waiting.
+        """
+        started = self._clock()
+        if not requests and not tokens:
+            with self._condition:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise RequestCancelled("Request cancelled while waiting for rate-limit capacity")
+                    delay = self._paused_until - self._clock()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(min(delay, 1.0))
+            return self._clock() - started
+
+        ticket = (LANES.index(lane), next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise RequestCancelled("Request cancelled while waiting for rate-limit capacity")
+                    delay = 1.0
+                    if self._waiting[0] == ticket:
+                        delay = max(
+                            self._paused_until - self._clock(),
+                            self._requests.wait_time(requests) if requests else 0.0,
+                            self._tokens.wait_time(tokens) if tokens else 0.0,
+                        )
+                        if delay <= 0:
+                            self._requests.take(requests)
+                            self._tokens.take(tokens)
+                            break
+                    # Re-check at least every second so cancellation is noticed
+                    self._condition.wait(min(delay, 1.0))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+            waited = self._clock() - started
+            if requests:
+                self._granted[lane] += 1
+                self._wait_seconds[lane] += waited
+            self._tokens_granted += tokens
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once a request's real usage is known."""
+        with self._condition:
+            self._tokens.give_back(estimated_tokens - actual_tokens)
+            self._tokens_granted += actual_tokens - estimated_tokens
+            self._condition.notify_all()
+
+    def refund(self, tokens: int = 0, requests: int = 1) -> None:
+        """Return a failed attempt's reservation; the retry acquires it again."""
+        with self._condition:
+            self._requests.give_back(requests)
+            self._tokens.give_back(tokens)
+            self._tokens_granted -= tokens
+            self._condition.notify_all()
+
+    def backoff(self, seconds: float) -> None:
+        """Pause all lanes for `seconds` (a 429 means the shared quota is spent)."""
+        with self._condition:
+            self._rate_limited += 1
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._condition.notify_all()
+
+    def call(self, fn: Callable, *args, tokens: int = 0, requests: int = 1, lane: str = LANE_INTERACTIVE,
+             cancel_event: Optional[threading.Event] = None, **kwargs) -> Any:
+        """
+        Call an OpenAI client method once capacity allows, retrying 429s and transient errors.
+
+        A 429 pauses every lane for the Retry-After delay; connection errors
+        and 5xx responses back off only this request. A failed attempt's
+        reservation is refunded, so each request is charged to the buckets
+        once. Quota exhaustion (insufficient_quota) is raised immediately.
+
+        Raises:
+            RequestCancelled: cancel_event was set while waiting.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, requests, lane, cancel_event)
+            try:
+                return fn(*args, **kwargs)
+            except RateLimitError as e:
+                self.refund(tokens, requests)
+                if getattr(e, "code", None) == "insufficient_quota" or attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e) or backoff_delay(attempt)
+                print(f"  ⏳ OpenAI rate limit; pausing requests for {delay:.1f}s")
+                self.backoff(delay)
+            except (APIConnectionError, InternalServerError) as e:
+                self.refund(tokens, requests)
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"  ⚠ OpenAI request failed ({type(e).__name__}); retrying in {delay:.1f}s")
+                if cancel_event is not None:
+                    cancel_event.wait(delay)
+                else:
+                    time.sleep(delay)
+            with self._condition:
+                self._retries += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "rpm_limit": int(self._requests.capacity),
+                "tpm_limit": int(self._tokens.capacity),
+                "waiting": len(self._waiting),
+                "requests": dict(self._granted),
+                "tokens": self._tokens_granted,
+                "avg_wait_seconds": {
+                    lane: round(self._wait_seconds[lane] / self._granted[lane], 2) if self._granted[lane] else 0.0
+                    for lane in LANES
+                },
+                "rate_limited": self._rate_limited,
+                "retries": self._retries,
+                "paused_for_seconds": round(max(0.0, self._paused_until - self._clock()), 1),
+            }
+
+
+# Shared by every workflow thread in the process
+openai_scheduler = RateLimitScheduler()
+
+
+def main():
+    print(json.dumps(openai_scheduler.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
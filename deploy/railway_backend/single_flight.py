@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+single_flight.py
+
+Request coalescing for identical analyses.
+
+Submissions are keyed on the normalized company URL plus a hash of every
+input file (Deep Research Brief, additional context files) and any options
+that change the result, such as a per-analysis budget. A later
+submission with the same key attaches to the job already in progress, or
+reuses a completed job that is still inside the freshness window, instead of
+starting another browser collection or MEARA workflow.
+
+Usage:
+    from single_flight import SingleFlight, request_key
+    flights = SingleFlight(jobs, freshness_seconds=900)
+
+    key = request_key(company_url, [drb_path])
+    existing = flights.find(key)          # (job_id, "in_progress" | "recent") or None
+    if existing is None:
+        flights.register(key, job_id)
+
+    # CLI: print the key for a URL and its input files
+    python3 single_flight.py --url https://www.example.com/ --file drb.pdf
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+# How long a completed job is reused for identical submissions
+DEEPSTACK_FRESHNESS_SECONDS = int(os.getenv("DEEPSTACK_FRESHNESS_SECONDS", "900"))
+MEARA_FRESHNESS_SECONDS = int(os.getenv("MEARA_FRESHNESS_SECONDS", "3600"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Query parameters that never change what a page shows
+_TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_hsenc", "_hsmi")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a company URL for deduplication.
+
+    Defaults to https, lowercases the host, drops "www.", default ports,
+    fragments, trailing slashes and tracking parameters, and sorts the
+    remaining query parameters.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower().removeprefix("www.")
+    port = parsed.port
+    if port and not ((scheme == "https" and port == 443) or (scheme == "http" and port == 80)):
+        host = f"{host}:{port}"
+    path = parsed.path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def request_key(url: str, input_files: Iterable[Optional[Union[str, Path]]] = (),
+                options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Dedup key: normalized URL plus the content hashes of all input files.
+
+    File names and order do not matter; only content does. Missing files
+    are ignored. Options set to anything but None (e.g. a token budget) are
+    part of the key, so such requests only share jobs with the same options.
+    """
+    digests = sorted(file_digest(path) for path in input_files if path and os.path.exists(path))
+    settings = [f"{name}={value!r}" for name, value in sorted((options or {}).items()) if value is not None]
+    payload = "\n".join([normalize_url(url), *digests, *settings])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Maps request keys to the job serving them, within one job store."""
+
+    def __init__(self, store: Dict[str, Dict], freshness_seconds: int):
+        self.store = store
+        self.freshness_seconds = freshness_seconds
+        self._keys: Dict[str, str] = {}
+
+    def find(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Job that can serve this key.
+
+        Returns:
+            (job_id, "in_progress") for a queued or running job,
+            (job_id, "recent") for a job completed within the freshness
+            window, or None. Stale, failed or cancelled entries are dropped.
+        """
+        job_id = self._keys.get(key)
+        job = self.store.get(job_id) if job_id else None
+        if job is None:
+            self._keys.pop(key, None)
+            return None
+        if job["status"] in ACTIVE_STATUSES:
+            return job_id, "in_progress"
+        completed_at = job.get("completed_at")
+        if job["status"] == "completed" and completed_at and time.time() - completed_at <= self.freshness_seconds:
+            return job_id, "recent"
+        del self._keys[key]
+        return None
+
+    def register(self, key: str, job_id: str) -> None:
+        self._keys[key] = job_id
+
+    def attach(self, job_id: str) -> None:
+        """Count another submitter on an in-progress job (see cancellation)."""
+        job = self.store[job_id]
+        job["subscribers"] = job.get("subscribers", 1) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the single-flight dedup key for an analysis request.")
+    parser.add_argument("--url", required=True, help="Company URL")
+    parser.add_argument("--file", action="append", default=[], help="Input file (repeatable)")
+    args = parser.parse_args()
+    print(f"Normalized URL: {normalize_url(args.url)}")
+    print(f"Key: {request_key(args.url, args.file)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Browser Session - Browser/context lifecycle management for DeepStack Collector
+
+Each collector worker owns one BrowserSession: a Firefox browser plus the
+context its pages run in. The session recycles the context after a fixed
+number of pages (dropping accumulated cookies, cache and leaked pages) and
+relaunches the browser when the memory of its own Firefox processes crosses
+an RSS ceiling or after a crash. It records the memory high-water mark so long
+batch runs stay stable and predictable.
+
+Usage:
+    from browser_session import BrowserSession
+    with sync_playwright() as p:
+        session = BrowserSession(p, worker_id=1)
+        page = session.context.new_page()
+        ...
+        session.after_page()   # counts the page, recycles if limits are hit
+        session.close()
+        print(session.stats())
+"""
+
+import os
+import resource
+import sys
+import threading
+
+
+# -----------------------------------------------------------------------------
+# --- CONFIGURATION ---
+# -----------------------------------------------------------------------------
+
+# Browser context settings shared by every collector worker
+BROWSER_CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "viewport": {"width": 1920, "height": 1080},
+    "locale": "en-US",
+    "timezone_id": "America/New_York",
+    "permissions": ["geolocation"],
+    "java_script_enabled": True,
+    "accept_downloads": False,
+    "ignore_https_errors": True
+}
+
+# Recycle the browser context after this many pages (0 disables)
+MAX_PAGES_PER_CONTEXT = int(os.getenv("DEEPSTACK_CONTEXT_MAX_PAGES", "20"))
+# Relaunch a worker's browser once its Firefox processes exceed this RSS (0 disables).
+# Each worker's browser is measured separately, so the collector as a whole
+# can use up to workers x this limit.
+RSS_LIMIT_MB = int(os.getenv("DEEPSTACK_RSS_LIMIT_MB", "800"))
+
+
+# -----------------------------------------------------------------------------
+# --- MEMORY MEASUREMENT ---
+# -----------------------------------------------------------------------------
+
+def _read_proc_tree():
+    """Map pid -> (ppid, rss_kb) from /proc. Empty dict where /proc is unavailable."""
+    tree = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return tree
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                ppid, rss_kb = None, 0
+                for line in f:
+                    if line.startswith("PPid:"):
+                        ppid = int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss_kb = int(line.split()[1])
+            tree[int(entry)] = (ppid, rss_kb)
+        except (OSError, ValueError, IndexError):
+            continue  # Process exited while scanning
+    return tree
+
+
+def _descendants(tree, root_pids):
+    """Pids of the given processes and all their descendants present in tree."""
+    children = {}
+    for pid, (ppid, _) in tree.items():
+        children.setdefault(ppid, []).append(pid)
+    found, stack = set(), [pid for pid in root_pids if pid in tree]
+    while stack:
+        pid = stack.pop()
+        found.add(pid)
+        stack.extend(children.get(pid, []))
+    return found
+
+
+def subtree_rss_mb(root_pids, tree=None):
+    """Resident memory (MB) of the given processes and their descendants; None if none is running."""
+    tree = _read_proc_tree() if tree is None else tree
+    pids = _descendants(tree, root_pids)
+    if not pids:
+        return None
+    return round(sum(tree[pid][1] for pid in pids) / 1024, 1)
+
+
+def process_tree_rss_mb(root_pid=None):
+    """
+    Resident memory (MB) of this process and all its descendants.
+
+    On Linux this walks /proc, so it includes the Playwright driver and
+    every Firefox process. Elsewhere it falls back to the peak RSS reported
+    by getrusage, which is still useful as a high-water mark.
+    """
+    rss_mb = subtree_rss_mb([root_pid or os.getpid()])
+    if rss_mb is not None:
+        return rss_mb
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return round(usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024, 1)
+
+
+def close_browser_resources(browser, context):
+    """Close a browser context and its browser, reporting (not raising) errors."""
+    print("\nAttempting to close browser resources...")
+    try:
+        # Attempt to close context
+        if context:
+            print("Closing browser context...")
+            context.close()
+            print("Browser context successfully closed.")
+        else:
+            print("Browser context object not available or already handled.")
+
+        # Attempt to close browser
+        if browser:
+            if browser.is_connected(): # Correct check for browser
+                print("Closing browser...")
+                browser.close()
+                print("Browser successfully closed.")
+            else:
+                print("Browser was already disconnected or closed.")
+        else:
+            print("Browser object not available.")
+
+    except Exception as e_close:
+        print(f"Error during browser/context close: {type(e_close).__name__} - {e_close}")
+        # More specific checks for common Playwright closure issues
+        if "Target page, context or browser has been closed" in str(e_close):
+             print("Indicates that a resource was likely already closed when an operation was attempted on it.")
+        elif "Event loop is closed" in str(e_close) or "Browser has been closed" in str(e_close):
+            print("Playwright's communication channel was already terminated or browser was already closed.")
+        else:
+            print("The browser or context might have been in an unstable state during closure.")
+
+
+# Serializes launches so each session can tell which new processes are its browser
+_launch_lock = threading.Lock()
+
+
+class BrowserSession:
+    """One worker's browser and context, recycled by page count, memory ceiling or crash."""
+
+    def __init__(self, playwright, worker_id, max_pages_per_context=None, rss_limit_mb=None, measure_rss=None):
+        self.playwright = playwright
+        self.worker_id = worker_id
+        self.max_pages_per_context = MAX_PAGES_PER_CONTEXT if max_pages_per_context is None else max_pages_per_context
+        self.rss_limit_mb = RSS_LIMIT_MB if rss_limit_mb is None else rss_limit_mb
+        self.measure_rss = measure_rss or self.browser_rss_mb
+
+        self.browser = None
+        self.browser_pids = []  # root process(es) of this session's Firefox
+        self.context = None
+        self.pages_in_context = 0
+        self.pages_total = 0
+        self.browser_launches = 0
+        self.context_recycles = 0
+        self.recycle_reasons = {}
+        self.rss_high_water_mb = 0.0
+        self.launch()
+
+    def launch(self):
+        # The processes that appear under this one during the launch are
+        # this session's Firefox; other workers' browsers and the server are
+        # never counted against its memory ceiling
+        with _launch_lock:
+            before = _descendants(_read_proc_tree(), [os.getpid()])
+            self.browser = self.playwright.firefox.launch(
+                headless=True
+            )
+            tree = _read_proc_tree()
+            new = _descendants(tree, [os.getpid()]) - before
+            self.browser_pids = [pid for pid in new if tree[pid][0] not in new]
+        self.context = self.browser.new_context(**BROWSER_CONTEXT_OPTIONS)
+        self.pages_in_context = 0
+        self.browser_launches += 1
+        print(f"Browser launched (worker {self.worker_id}).")
+        self.sample_memory()
+
+    def browser_connected(self):
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+    def browser_rss_mb(self):
+        """RSS (MB) of this session's Firefox processes; None where they cannot be identified."""
+        return subtree_rss_mb(self.browser_pids) if self.browser_pids else None
+
+    def sample_memory(self):
+        """Measure this browser's RSS and update the high-water mark."""
+        try:
+            rss_mb = self.measure_rss()
+        except Exception:
+            return None
+        if rss_mb is not None:
+            self.rss_high_water_mb = max(self.rss_high_water_mb, rss_mb)
+        return rss_mb
+
+    def after_page(self):
+        """
+        Account for a finished page and enforce the lifecycle limits.
+
+        Relaunches the browser when the RSS ceiling is crossed (Firefox only
+        returns memory to the OS when its processes exit), otherwise recycles
+        the context once it has served max_pages_per_context pages.
+        """
+        self.pages_in_context += 1
+        self.pages_total += 1
+        rss_mb = self.sample_memory()
+        if self.rss_limit_mb and rss_mb is not None and rss_mb > self.rss_limit_mb:
+            print(f"    INFO: RSS {rss_mb} MB exceeds {self.rss_limit_mb} MB (worker {self.worker_id}).")
+            self.recycle_browser(reason="rss_limit")
+        elif self.max_pages_per_context and self.pages_in_context >= self.max_pages_per_context:
+            self.recycle_context(reason="page_limit")
+
+    def _count(self, reason):
+        self.recycle_reasons[reason] = self.recycle_reasons.get(reason, 0) + 1
+
+    def recycle_context(self, reason="error"):
+        """Replace the browser context (fresh cookies, cache and pages)."""
+        print(f"    INFO: Recycling browser context (worker {self.worker_id}, reason: {reason}).")
+        self._count(reason)
+        try:
+            self.context.close()
+        except Exception:
+            pass
+        try:
+            self.context = self.browser.new_context(**BROWSER_CONTEXT_OPTIONS)
+            self.pages_in_context = 0
+            self.context_recycles += 1
+        except Exception as e_context:
+            print(f"    WARNING: Could not create a new context ({e_context}). Relaunching browser.")
+            self.recycle_browser(reason="context_failure")
+
+    def recycle_browser(self, reason="crash"):
+        """Tear down and relaunch the whole browser."""
+        print(f"    INFO: Relaunching browser (worker {self.worker_id}, reason: {reason}).")
+        self._count(reason)
+        close_browser_resources(self.browser, self.context)
+        self.launch()
+
+    def close(self):
+        self.sample_memory()
+        close_browser_resources(self.browser, self.context)
+
+    def stats(self):
+        return {
+            "worker_id": self.worker_id,
+            "pages": self.pages_total,
+            "browser_launches": self.browser_launches,
+            "context_recycles": self.context_recycles,
+            "recycle_reasons": dict(self.recycle_reasons),
+            "rss_high_water_mb": self.rss_high_water_mb,
+        }
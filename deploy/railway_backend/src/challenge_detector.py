@@ -0,0 +1,306 @@
+"""
+Challenge Detector - Early bot-protection classification for DeepStack Collector
+
+Classifies a navigation response from its status code, headers and title
+before any DOM work is done, and keeps a per-domain memory of which sites
+challenge the collector. Known-blocked domains fail fast instead of holding a
+worker slot for a minute of stacked waits.
+
+Usage:
+    # As library
+    from challenge_detector import classify_response, ChallengeMemory
+    memory = ChallengeMemory("output/challenge_memory.json")
+    verdict = classify_response(response.status, response.headers, page.title())
+
+    # As CLI (inspect or reset the per-domain memory)
+    python3 challenge_detector.py --memory output/challenge_memory.json
+    python3 challenge_detector.py --memory output/challenge_memory.json --forget example.com
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# -----------------------------------------------------------------------------
+# --- CONFIGURATION ---
+# -----------------------------------------------------------------------------
+
+# Classification outcomes
+CLEAR = "clear"          # Normal page, continue with analysis
+CHALLENGE = "challenge"  # Interstitial JS challenge that may resolve on its own
+BLOCKED = "blocked"      # Hard block (WAF deny / rate limit), waiting will not help
+
+# Page titles used by common interstitial challenges (Cloudflare and friends)
+CHALLENGE_TITLE_INDICATORS = [
+    "Just a moment...",
+    "Checking your browser",
+    "Please wait",
+    "One more step",
+    "Verifying you are human",
+    "Attention Required!",
+]
+
+# DOM markers for challenge pages. Checked with a single selector query
+# instead of pulling the whole page source over the wire.
+CHALLENGE_DOM_SELECTOR = "#cf-browser-verification, #challenge-form, #challenge-running, #cf-challenge-running"
+
+# Header names whose presence identifies a bot-protection vendor
+PROTECTION_HEADERS = {
+    "cf-mitigated": "Cloudflare",
+    "cf-ray": "Cloudflare",
+    "x-datadome": "DataDome",
+    "x-sucuri-id": "Sucuri",
+    "x-px-block": "PerimeterX",
+}
+
+# Server header values that identify a bot-protection vendor
+PROTECTION_SERVERS = {
+    "cloudflare": "Cloudflare",
+    "akamaighost": "Akamai",
+    "ddos-guard": "DDoS-Guard",
+}
+
+# Time budgets (milliseconds) for waiting on a challenge to resolve
+DEFAULT_CHALLENGE_BUDGET_MS = int(os.getenv("DEEPSTACK_CHALLENGE_BUDGET_MS", "20000"))
+MIN_CHALLENGE_BUDGET_MS = 5000
+
+# A domain is skipped once it has this many consecutive unresolved challenges
+BLOCK_THRESHOLD = int(os.getenv("DEEPSTACK_CHALLENGE_BLOCK_THRESHOLD", "2"))
+
+# Cooldown before a skipped domain is tried again; doubles per failure, capped
+BASE_COOLDOWN_SECONDS = 15 * 60
+MAX_COOLDOWN_SECONDS = 24 * 60 * 60
+
+
+def domain_of(url):
+    """Return the bare host for a URL (lowercase, no www. prefix, no port)."""
+    host = urlparse(url).hostname or ""
+    return host.lower().removeprefix("www.")
+
+
+def _header(headers, name):
+    """Case-insensitive header lookup that tolerates None."""
+    if not headers:
+        return ""
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
+def detect_vendor(headers):
+    """Identify the bot-protection vendor fronting a response, if any."""
+    if not headers:
+        return None
+    lowered = {key.lower() for key in headers}
+    for header_name, vendor in PROTECTION_HEADERS.items():
+        if header_name in lowered:
+            return vendor
+    server = _header(headers, "server").lower()
+    for server_name, vendor in PROTECTION_SERVERS.items():
+        if server_name in server:
+            return vendor
+    return None
+
+
+def title_indicates_challenge(title):
+    """True if the document title matches a known challenge interstitial."""
+    return bool(title) and any(indicator in title for indicator in CHALLENGE_TITLE_INDICATORS)
+
+
+def classify_response(status, headers, title=None):
+    """
+    Classify a navigation response before doing any DOM work.
+
+    Args:
+        status: HTTP status code of the main document (None if unknown)
+        headers: Response headers (dict-like)
+        title: Optional document title, used as a cheap secondary signal
+
+    Returns:
+        Dict with "classification" (clear/challenge/blocked), "vendor" and "reason"
+    """
+    vendor = detect_vendor(headers)
+    mitigated = _header(headers, "cf-mitigated").lower()
+
+    if mitigated == "challenge":
+        return {"classification": CHALLENGE, "vendor": vendor, "reason": "cf-mitigated: challenge"}
+
+    if status == 429:
+        return {"classification": BLOCKED, "vendor": vendor, "reason": "HTTP 429 rate limited"}
+
+    if vendor and status in (403, 503):
+        # Protection vendors serve JS challenges with 403/503; the title tells
+        # an interstitial (may resolve) apart from a hard deny page. A 503
+        # without one is an origin outage behind the vendor, left to the
+        # HTTP 5xx retry policy.
+        if title_indicates_challenge(title):
+            return {"classification": CHALLENGE, "vendor": vendor, "reason": f"HTTP {status} from {vendor}"}
+        if status == 403:
+            return {"classification": BLOCKED, "vendor": vendor, "reason": f"HTTP {status} from {vendor}"}
+
+    if title_indicates_challenge(title):
+        return {"classification": CHALLENGE, "vendor": vendor, "reason": f"challenge title: '{title}'"}
+
+    return {"classification": CLEAR, "vendor": vendor, "reason": None}
+
+
+class ChallengeMemory:
+    """
+    Per-domain memory of challenge outcomes, persisted as JSON.
+
+    Each entry records how often a domain challenged us, how often the
+    challenge resolved, and the current run of unresolved challenges. That
+    run drives both the wait budget (halved per failure) and fail-fast
+    skipping (after BLOCK_THRESHOLD failures, with an exponential cooldown).
+    Safe to share between collector worker threads.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._domains = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._domains = json.load(f).get("domains", {})
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Could not read challenge memory '{path}': {e}. Starting fresh.")
+
+    def _entry(self, domain):
+        return self._domains.setdefault(domain, {
+            "challenges": 0,
+            "resolved": 0,
+            "blocked": 0,
+            "consecutive_failures": 0,
+            "last_outcome": None,
+            "last_seen": None,
+        })
+
+    def get(self, domain):
+        """Return a copy of the stored entry for a domain (or None)."""
+        with self._lock:
+            entry = self._domains.get(domain)
+            return dict(entry) if entry else None
+
+    def should_skip(self, domain, now=None):
+        """
+        Return a reason string if the domain should fail fast, else None.
+
+        Domains with a record of unresolved challenges are skipped until
+        their cooldown (which grows with each failure) has elapsed.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._domains.get(domain)
+            if not entry or entry["consecutive_failures"] < BLOCK_THRESHOLD:
+                return None
+            excess = entry["consecutive_failures"] - BLOCK_THRESHOLD
+            cooldown = min(BASE_COOLDOWN_SECONDS * (2 ** excess), MAX_COOLDOWN_SECONDS)
+            remaining = (entry["last_seen"] or 0) + cooldown - now
+            if remaining <= 0:
+                return None
+            return (f"{domain} challenged the last {entry['consecutive_failures']} attempt(s) "
+                    f"without resolving; retry in {int(remaining // 60) + 1} min")
+
+    def challenge_budget_ms(self, domain, default_ms=None):
+        """
+        Time budget for waiting on a challenge from this domain.
+
+        Domains that have resolved challenges before get the full budget;
+        each consecutive unresolved challenge halves it (bounded below).
+        """
+        budget = default_ms if default_ms is not None else DEFAULT_CHALLENGE_BUDGET_MS
+        with self._lock:
+            entry = self._domains.get(domain)
+            failures = entry["consecutive_failures"] if entry else 0
+        return max(MIN_CHALLENGE_BUDGET_MS, budget // (2 ** failures))
+
+    def record(self, domain, outcome, now=None):
+        """
+        Record the outcome of a navigation to a domain.
+
+        Args:
+            domain: Bare domain (see domain_of)
+            outcome: "clear", "resolved", "unresolved" or "blocked"
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if outcome == "clear" and domain not in self._domains:
+                # Domains that never challenged us are not worth remembering
+                return
+            entry = self._entry(domain)
+            if outcome == "clear":
+                entry["consecutive_failures"] = 0
+            elif outcome == "resolved":
+                entry["challenges"] += 1
+                entry["resolved"] += 1
+                entry["consecutive_failures"] = 0
+            elif outcome == "unresolved":
+                entry["challenges"] += 1
+                entry["consecutive_failures"] += 1
+            elif outcome == "blocked":
+                entry["blocked"] += 1
+                entry["consecutive_failures"] += 1
+            else:
+                raise ValueError(f"Unknown challenge outcome: {outcome}")
+            entry["last_outcome"] = outcome
+            entry["last_seen"] = now
+        self.save()
+
+    def forget(self, domain):
+        """Drop everything known about a domain."""
+        with self._lock:
+            removed = self._domains.pop(domain, None) is not None
+        self.save()
+        return removed
+
+    def to_dict(self):
+        with self._lock:
+            return {"domains": {d: dict(e) for d, e in self._domains.items()}}
+
+    def save(self):
+        """Persist the memory atomically (no-op for in-memory instances)."""
+        if not self.path:
+            return
+        data = self.to_dict()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"WARNING: Could not save challenge memory '{self.path}': {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reset the DeepStack per-domain challenge memory.")
+    parser.add_argument("--memory", default=os.path.join("output", "challenge_memory.json"),
+                        help="Path to the challenge memory JSON file")
+    parser.add_argument("--forget", metavar="DOMAIN", help="Remove a domain from the memory")
+    args = parser.parse_args()
+
+    memory = ChallengeMemory(args.memory)
+    if args.forget:
+        if not memory.forget(args.forget):
+            print(f"Domain not found: {args.forget}")
+            return 1
+        print(f"Forgot {args.forget}")
+        return 0
+
+    report = memory.to_dict()
+    for domain in report["domains"]:
+        report["domains"][domain]["skip_reason"] = memory.should_skip(domain)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
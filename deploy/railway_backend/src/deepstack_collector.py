@@ -7,6 +7,9 @@ Uses Playwright for web automation and BeautifulSoup for HTML parsing.
 Output Files:
     - Single URL mode (-u): output/deepstack_output-{domain}.json (e.g., output/deepstack_output-example.com.json)
     - Batch mode: output/deepstack_output.json (reads from urls_to_analyze.txt)
+    - Alongside each output file: deepstack_changes[-{domain}].json with only the
+      sections that changed since the previous scan of each domain
+    - With --job-id JOB: the same files under output/JOB/ (written atomically)
 
 Usage:
     Single URL Mode:
@@ -19,9 +22,17 @@ Usage:
         python3 deepstack_collector.py -u https://subdomain.example.com:8080
         # Output: output/deepstack_output-subdomain.example.com_8080.json
 
+        python3 deepstack_collector.py -u https://example.com --job-id 42
+        # Output: output/42/deepstack_output-example.com.json
+
     Batch Mode:
         python3 deepstack_collector.py
         # Output: output/deepstack_output.json (reads from urls_to_analyze.txt)
+
+    As library (no files written, no working-directory changes):
+        from deepstack_collector import collect, collect_async
+        results = collect(["https://example.com"], {"workers": 2})
+        results = await collect_async(["https://example.com"])
 """
 
 from playwright.sync_api import sync_playwright
@@ -30,11 +41,24 @@ from bs4 import BeautifulSoup
 import re
 import json  # Ensure this is present
 from datetime import datetime, timezone  # For timestamps
-import random  # For random delays between requests
 from playwright_stealth import stealth_sync  # For avoiding detection
 import argparse  # For command-line argument parsing
 from urllib.parse import urlparse  # For extracting domain names
 import os  # For directory operations
+import threading  # For parallel collector workers
+import asyncio  # For the async collect_async() wrapper
+from challenge_detector import (  # Early bot-protection classification
+    classify_response, ChallengeMemory, domain_of,
+    CLEAR, CHALLENGE, BLOCKED, CHALLENGE_TITLE_INDICATORS, CHALLENGE_DOM_SELECTOR
+)
+from form_analysis import analyze_page_forms  # Bounded main-frame + iframe form extraction
+from politeness import PolitenessScheduler  # Per-domain rate limiting
+from browser_session import BrowserSession  # Browser/context lifecycle and memory ceiling
+from retry_policy import (  # Error classification and retry decisions
+    ChallengeError, HttpStatusError, CollectionCancelled, classify_error, retry_decision,
+    BROWSER_CRASH, CANCELLED, RECYCLE_CONTEXT, RECYCLE_BROWSER
+)
+from scan_diff import detect_changes  # Section fingerprints between successive scans
 
 
 # -----------------------------------------------------------------------------
@@ -123,6 +147,20 @@ def load_urls_from_file(filename):
 
 # URLS_TO_ANALYZE = load_urls_from_file(URL_INPUT_FILE)
 
+# --- Challenge Handling ---
+# Per-domain memory of bot-protection challenges (see challenge_detector.py)
+CHALLENGE_MEMORY_FILE = os.getenv("DEEPSTACK_CHALLENGE_MEMORY", os.path.join("output", "challenge_memory.json"))
+# Upper bound on waiting for the network to go idle after navigation
+NETWORK_IDLE_TIMEOUT_MS = 30000
+
+# --- Browser Workers ---
+# Default number of parallel browser workers (each runs its own Firefox)
+DEFAULT_WORKERS = int(os.getenv("DEEPSTACK_WORKERS", "3"))
+
+# --- Change Detection ---
+# Per-domain section fingerprints from previous scans (see scan_diff.py)
+FINGERPRINT_DIR = os.getenv("DEEPSTACK_FINGERPRINT_DIR", os.path.join("output", "fingerprints"))
+
 # --- Cookie Consent Signatures Definition ---
 # Keywords or patterns to identify common Cookie Consent Management Platforms (CMPs)
 # These can be found in script URLs, global JS variables, or specific HTML element attributes/classes
@@ -260,810 +298,898 @@ CONVERSION_EVENT_SIGNATURES = {
         # Add specific Twitter event names if needed, e.g., 'twq(\'track\',\'Purchase\''
     ]
 }
-# --- Main Function ---
-def main():
-    # --- Argument Parsing for Command-Line URL ---
-    parser = argparse.ArgumentParser(description="DeepStack Collector: Analyze website(s) for MarTech and other signals.")
-    parser.add_argument("-u", "--url", help="A single URL to analyze. If provided, urls_to_analyze.txt will be ignored.")
-    args = parser.parse_args()
-
-    urls_to_process = [] # This will hold the URLs the script will iterate over
 
-    if args.url:
-        single_url = args.url
-        # Ensure the URL has a scheme
-        if not single_url.startswith(('http://', 'https://')):
-            single_url = 'https://' + single_url
-        urls_to_process = [single_url]
-        print(f"INFO: Analyzing single URL provided via command line: {single_url}")
-    else:
-        # URL_INPUT_FILE is still a global constant
-        urls_to_process = load_urls_from_file(URL_INPUT_FILE)
-        # load_urls_from_file already prints messages about loaded URLs or errors
+# -----------------------------------------------------------------------------
+# --- URL ANALYSIS & COLLECTOR WORKERS ---
+# -----------------------------------------------------------------------------
 
-    if not urls_to_process:
-        print("INFO: No URLs to analyze (neither from command line nor from file). Exiting.")
-        return # Exit if there are no URLs
+def _check_cancelled(cancel_event):
+    """Raise CollectionCancelled once the caller has set the cancel event."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise CollectionCancelled("Collection cancelled")
 
-    print("DeepStack Collector starting...") # Moved this message here
 
-    # The rest of your main() function (with sync_playwright() as p: ...) follows from here
-    # Ensure the main processing loop uses 'urls_to_process'
+def analyze_url(context, current_url, challenge_memory, cancel_event=None):
+    """
+    Navigate to one URL in the given browser context and extract all DeepStack signals.
 
-    with sync_playwright() as p:
-        browser = p.firefox.launch(
-            headless=True
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1920, "height": 1080},
-            locale="en-US",
-            timezone_id="America/New_York",
-            permissions=["geolocation"],
-            java_script_enabled=True,
-            accept_downloads=False,
-            ignore_https_errors=True
-        )
-        print("Browser launched.")
+    Returns the url_result_object for the "url_analysis_results" list; failures
+    are captured in the object (fetch_status "error") rather than raised.
+    cancel_event is checked before the page is opened and between the
+    navigation and analysis phases; a cancelled URL ends as an error with
+    category "cancelled" and its page is closed like any other.
+    """
+    print(f"\nAttempting to navigate to: {current_url}")
 
-        collection_start_time_utc = datetime.now(timezone.utc)
-        processed_urls_results_list = [] # This will store the structured data for each URL
-        successful_fetches = 0
-        failed_fetches = 0
+    requests_log = []
+    identified_martech_on_page = set()
+    data_layer_content_summary = None
+    data_layer_exists_on_page = False
 
-        for current_url in urls_to_process:
-            # Add random delay before processing the URL to appear more human-like
-            time.sleep(random.uniform(2, 5)) # Waits for a random duration between 2 and 5 seconds
-            print(f"\nAttempting to navigate to: {current_url}")
+    page = None  # Initialize page variable
+    current_domain = domain_of(current_url)
+    challenge_info = None
+    try:
+        skip_reason = challenge_memory.should_skip(current_domain)
+        if skip_reason:
+            challenge_info = {"classification": BLOCKED, "vendor": None, "reason": skip_reason, "skipped": True}
+            raise ChallengeError(f"Skipped known-challenging domain: {skip_reason}")
+
+        _check_cancelled(cancel_event)
+        print(f"  Creating new page...")
+        page = context.new_page()
+        # Note: stealth_sync only works with Chromium, skip for Firefox
+        print(f"  Setting up request logger...")
+        page.on("request", lambda request: requests_log.append(request.url))
+        print(f"  Navigating to {current_url}...")
+        # Stop at DOMContentLoaded so the response can be classified
+        # before committing to a long network-idle wait
+        response = page.goto(current_url, wait_until="domcontentloaded", timeout=90000)
+        print(f"  Page navigation completed.")
+        _check_cancelled(cancel_event)
+
+        # --- Early Challenge Classification (status, headers, title) ---
+        initial_title = page.title()
+        challenge_info = classify_response(
+            response.status if response else None,
+            response.headers if response else None,
+            initial_title
+        )
+        if challenge_info["classification"] == CLEAR and page.locator(CHALLENGE_DOM_SELECTOR).count() > 0:
+            challenge_info = {"classification": CHALLENGE, "vendor": challenge_info["vendor"], "reason": "challenge DOM marker"}
 
-            requests_log = []
-            identified_martech_on_page = set()
-            data_layer_content_summary = None
-            data_layer_exists_on_page = False
+        if challenge_info["classification"] == BLOCKED:
+            challenge_memory.record(current_domain, "blocked")
+            raise ChallengeError(f"Blocked by {challenge_info['vendor'] or 'site'}: {challenge_info['reason']}")
 
-            page = None  # Initialize page variable
+        if challenge_info["classification"] == CHALLENGE:
+            budget_ms = challenge_memory.challenge_budget_ms(current_domain)
+            print(f"    INFO: Detected {challenge_info['vendor'] or 'bot'} challenge for {current_url} ({challenge_info['reason']}). Waiting up to {budget_ms} ms...")
+            wait_started = time.monotonic()
             try:
-                print(f"  Creating new page...")
-                page = context.new_page()
-                # Note: stealth_sync only works with Chromium, skip for Firefox
-                print(f"  Setting up request logger...")
-                page.on("request", lambda request: requests_log.append(request.url))
-                # Modified wait strategy with better Cloudflare handling
-                print(f"  Navigating to {current_url}...")
-                page.goto(current_url, wait_until="networkidle", timeout=90000)  # Increased timeout, wait for network idle
-                print(f"  Page navigation completed.")
-                
-                # --- Enhanced Cloudflare Challenge Detection & Wait ---
-                initial_title = page.title()
-                
-                # Check for various Cloudflare challenge indicators
-                cloudflare_indicators = [
-                    "Just a moment...",
-                    "Checking your browser",
-                    "Please wait",
-                    "One more step",
-                    "Verifying you are human"
-                ]
-                
-                cloudflare_detected = any(indicator in initial_title for indicator in cloudflare_indicators)
-                
-                if cloudflare_detected or "cf-browser-verification" in page.content():
-                    print(f"    INFO: Detected Cloudflare challenge page for {current_url} (Title: '{initial_title}'). Waiting for it to resolve...")
-                    
-                    try:
-                        # Strategy 1: Wait for title change (works for most Cloudflare challenges)
-                        # Convert Python list to JavaScript array string
-                        js_indicators = str(cloudflare_indicators).replace("'", '"')
-                        page.wait_for_function(
-                            f"() => !{js_indicators}.some(indicator => document.title.includes(indicator))",
-                            timeout=45000
-                        )
-                        
-                        # Strategy 2: Wait for the actual content to load
-                        # After challenge, wait for typical page elements
+                # Single bounded wait: resolves as soon as the challenge
+                # title and markers are gone
+                page.wait_for_function(
+                    f"() => !{json.dumps(CHALLENGE_TITLE_INDICATORS)}.some(indicator => document.title.includes(indicator))"
+                    f" && !document.querySelector({json.dumps(CHALLENGE_DOM_SELECTOR)})",
+                    timeout=budget_ms
+                )
+            except Exception as e_cf:
+                challenge_info["waited_ms"] = int((time.monotonic() - wait_started) * 1000)
+                challenge_memory.record(current_domain, "unresolved")
+                raise ChallengeError(f"Challenge not resolved within {budget_ms} ms: {e_cf}") from e_cf
+
+            challenge_info["waited_ms"] = int((time.monotonic() - wait_started) * 1000)
+            challenge_info["resolved"] = True
+            challenge_memory.record(current_domain, "resolved")
+            print(f"    INFO: Challenge resolved for {current_url} after {challenge_info['waited_ms']} ms. Current title: '{page.title()}'")
+        else:
+            challenge_memory.record(current_domain, "clear")
+            if response and response.status >= 400:
+                raise HttpStatusError(response.status, current_url)
+
+        # Let the real page settle; long-polling pages may never go idle
+        _check_cancelled(cancel_event)
+        try:
+            page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_TIMEOUT_MS)
+        except Exception:
+            print(f"    INFO: Network did not go idle within {NETWORK_IDLE_TIMEOUT_MS} ms for {current_url}. Continuing.")
+        page.wait_for_selector("body", timeout=10000)
+        print(f"Successfully navigated to: {current_url}")
+
+        # --- End of Challenge Logic ---
+
+        html_content = page.content()
+        soup = BeautifulSoup(html_content, "html.parser")
+        script_tags = soup.find_all("script") # Define script_tags once here for reuse
+
+        # =====================================================================
+        # === CORE ANALYSIS AREA 1: Marketing Technology & Data Foundation ===
+        # =====================================================================
+        # This area focuses on identifying the tools forming a company's 
+        # marketing/sales engine and the infrastructure supporting their data strategy. [cite: 1, 5]
+
+        # -------------------------------------------------------------
+        # --- SECTION 1: MarTech Identification from <script> tags ---
+        # -------------------------------------------------------------
+        # print(f"Analyzing <script> tags for {current_url}...") # Optional debug
+        for script_tag in script_tags:
+            script_content_to_check = ""
+            if script_tag.get("src"):
+                script_content_to_check += script_tag.get("src") + " "
+            script_content_to_check += script_tag.string if script_tag.string else ""
+            if script_content_to_check.strip():
+                for tech_name, patterns in MARTECH_SIGNATURES.items():
+                    for pattern in patterns:
                         try:
-                            page.wait_for_selector("h1, h2, p, main, article, [role='main']", timeout=15000)
-                        except:
-                            # If no semantic elements, just wait for body to have content
-                            page.wait_for_function("() => document.body.textContent.trim().length > 100", timeout=15000)
-                        
-                        # Give the page a moment to fully settle
-                        page.wait_for_timeout(2000)
-                        
-                        print(f"    INFO: Cloudflare challenge resolved for {current_url}. Current title: '{page.title()}'")
-                        print(f"Successfully navigated to: {current_url} (after Cloudflare challenge)")
-                        
-                    except Exception as e_cf:
-                        print(f"    WARNING: Cloudflare challenge resolution failed for {current_url}: {e_cf}")
-                        
-                        # Last resort: Try to wait a bit more and check if content loaded anyway
-                        page.wait_for_timeout(5000)
-                        final_title = page.title()
-                        
-                        if final_title != initial_title and not any(indicator in final_title for indicator in cloudflare_indicators):
-                            print(f"    INFO: Page title changed, attempting to continue. New title: '{final_title}'")
-                        else:
-                            raise Exception(f"Cloudflare challenge not resolved: {e_cf}") from e_cf
-                else:
-                    # Standard page load without Cloudflare
-                    page.wait_for_selector("body", timeout=10000)
-                    print(f"Successfully navigated to: {current_url} (no Cloudflare challenge detected)")
-
-                # --- End of Cloudflare Challenge Logic ---
-
-                html_content = page.content()
-                soup = BeautifulSoup(html_content, "html.parser")
-                script_tags = soup.find_all("script") # Define script_tags once here for reuse
-
-                # =====================================================================
-                # === CORE ANALYSIS AREA 1: Marketing Technology & Data Foundation ===
-                # =====================================================================
-                # This area focuses on identifying the tools forming a company's 
-                # marketing/sales engine and the infrastructure supporting their data strategy. [cite: 1, 5]
-
-                # -------------------------------------------------------------
-                # --- SECTION 1: MarTech Identification from <script> tags ---
-                # -------------------------------------------------------------
-                # print(f"Analyzing <script> tags for {current_url}...") # Optional debug
-                for script_tag in script_tags:
-                    script_content_to_check = ""
-                    if script_tag.get("src"):
-                        script_content_to_check += script_tag.get("src") + " "
-                    script_content_to_check += script_tag.string if script_tag.string else ""
-                    if script_content_to_check.strip():
-                        for tech_name, patterns in MARTECH_SIGNATURES.items():
-                            for pattern in patterns:
-                                try:
-                                    if re.search(pattern, script_content_to_check, re.IGNORECASE):
-                                        identified_martech_on_page.add(tech_name)
-                                except re.error:
-                                    pass
-                # print(f"MarTech from scripts: {identified_martech_on_page}") # Optional debug
-
-                # -----------------------------------------------------------------
-                # --- SECTION 2: MarTech Identification from Network Requests ---
-                # -----------------------------------------------------------------
-                # print(f"Analyzing {len(requests_log)} network requests for {current_url}...") # Optional debug
-                for req_url in requests_log:
-                    for tech_name, patterns in MARTECH_SIGNATURES.items():
-                        for pattern in patterns:
-                            if r"\." in pattern or r"/" in pattern or "http" in pattern.lower():
-                                try:
-                                    if re.search(pattern, req_url, re.IGNORECASE):
-                                        identified_martech_on_page.add(tech_name)
-                                except re.error:
-                                    pass
-                # print(f"MarTech after network requests: {identified_martech_on_page}") # Optional debug
-                
-                # -----------------------------------------------------------------
-                # --- SECTION 3: Extract window.dataLayer content ---
-                # -----------------------------------------------------------------
-                # print(f"Attempting to extract dataLayer for {current_url}...") # Optional debug
-                try:
-                    data_layer_raw = page.evaluate("() => window.dataLayer")
-                    if data_layer_raw:
-                        data_layer_exists_on_page = True
-                        summary_items = []
-                        pushes_to_sample = min(len(data_layer_raw), 5)
-                        for i, item in enumerate(data_layer_raw[:pushes_to_sample]):
-                            if isinstance(item, dict):
-                                summary_items.append(f"Push {i+1} (keys): {sorted(list(item.keys()))}")
-                            else:
-                                summary_items.append(f"Push {i+1} (type): {type(item).__name__}")
-                        data_layer_content_summary = {
-                            "total_pushes": len(data_layer_raw),
-                            "sample_pushes_structure": summary_items
-                        }
-                    # else: # Optional debug
-                        # print("DataLayer not found or empty.")
-                except Exception as e:
-                    # print(f"Could not evaluate dataLayer for {current_url}: {e}") # Optional debug
-                    data_layer_content_summary = {"error": f"Could not evaluate dataLayer: {str(e)}"}
-
-                # -----------------------------------------------------------------
-                # --- SECTION 4: Identify Cookie Consent Mechanisms ---
-                # -----------------------------------------------------------------
-                # print(f"Identifying cookie consent mechanisms for {current_url}...") # Optional debug
-                identified_cookie_consent_tools = set()
-                for script_tag in script_tags:
-                    script_content_to_check = ""
-                    if script_tag.get("src"):
-                        script_content_to_check += script_tag.get("src") + " "
-                    script_content_to_check += script_tag.string if script_tag.string else ""
-                    if script_content_to_check.strip():
-                        for tool_name, patterns in COOKIE_CONSENT_SIGNATURES.items():
-                            for pattern in patterns:
-                                try:
-                                    if re.search(pattern, script_content_to_check, re.IGNORECASE):
-                                        identified_cookie_consent_tools.add(tool_name)
-                                except re.error:
-                                    pass
-                for req_url in requests_log:
-                    for tool_name, patterns in COOKIE_CONSENT_SIGNATURES.items():
-                        for pattern in patterns:
-                            if r"\." in pattern or r"/" in pattern or "http" in pattern.lower():
-                                try:
-                                    if re.search(pattern, req_url, re.IGNORECASE):
-                                        identified_cookie_consent_tools.add(tool_name)
-                                except re.error:
-                                    pass
+                            if re.search(pattern, script_content_to_check, re.IGNORECASE):
+                                identified_martech_on_page.add(tech_name)
+                        except re.error:
+                            pass
+        # print(f"MarTech from scripts: {identified_martech_on_page}") # Optional debug
+
+        # -----------------------------------------------------------------
+        # --- SECTION 2: MarTech Identification from Network Requests ---
+        # -----------------------------------------------------------------
+        # print(f"Analyzing {len(requests_log)} network requests for {current_url}...") # Optional debug
+        for req_url in requests_log:
+            for tech_name, patterns in MARTECH_SIGNATURES.items():
+                for pattern in patterns:
+                    if r"\." in pattern or r"/" in pattern or "http" in pattern.lower():
+                        try:
+                            if re.search(pattern, req_url, re.IGNORECASE):
+                                identified_martech_on_page.add(tech_name)
+                        except re.error:
+                            pass
+        # print(f"MarTech after network requests: {identified_martech_on_page}") # Optional debug
+        
+        # -----------------------------------------------------------------
+        # --- SECTION 3: Extract window.dataLayer content ---
+        # -----------------------------------------------------------------
+        # print(f"Attempting to extract dataLayer for {current_url}...") # Optional debug
+        try:
+            data_layer_raw = page.evaluate("() => window.dataLayer")
+            if data_layer_raw:
+                data_layer_exists_on_page = True
+                summary_items = []
+                pushes_to_sample = min(len(data_layer_raw), 5)
+                for i, item in enumerate(data_layer_raw[:pushes_to_sample]):
+                    if isinstance(item, dict):
+                        summary_items.append(f"Push {i+1} (keys): {sorted(list(item.keys()))}")
+                    else:
+                        summary_items.append(f"Push {i+1} (type): {type(item).__name__}")
+                data_layer_content_summary = {
+                    "total_pushes": len(data_layer_raw),
+                    "sample_pushes_structure": summary_items
+                }
+            # else: # Optional debug
+                # print("DataLayer not found or empty.")
+        except Exception as e:
+            # print(f"Could not evaluate dataLayer for {current_url}: {e}") # Optional debug
+            data_layer_content_summary = {"error": f"Could not evaluate dataLayer: {str(e)}"}
+
+        # -----------------------------------------------------------------
+        # --- SECTION 4: Identify Cookie Consent Mechanisms ---
+        # -----------------------------------------------------------------
+        # print(f"Identifying cookie consent mechanisms for {current_url}...") # Optional debug
+        identified_cookie_consent_tools = set()
+        for script_tag in script_tags:
+            script_content_to_check = ""
+            if script_tag.get("src"):
+                script_content_to_check += script_tag.get("src") + " "
+            script_content_to_check += script_tag.string if script_tag.string else ""
+            if script_content_to_check.strip():
                 for tool_name, patterns in COOKIE_CONSENT_SIGNATURES.items():
                     for pattern in patterns:
                         try:
-                            if re.search(pattern, html_content, re.IGNORECASE):
+                            if re.search(pattern, script_content_to_check, re.IGNORECASE):
                                 identified_cookie_consent_tools.add(tool_name)
                         except re.error:
                             pass
-                # print(f"Cookie consent tools found: {identified_cookie_consent_tools}") # Optional debug
-
-                # =====================================================================
-                # === CORE ANALYSIS AREA 2: Organic Presence & Content Signals ===
-                # =====================================================================
-                # This area evaluates efforts to attract organic traffic and how 
-                # content is structured for search engines. [cite: 1, 7]
-                
-                # -----------------------------------------------------------------
-                # --- SECTION 5: Organic Presence & Content Signals ---
-                # -----------------------------------------------------------------
-                # print(f"Extracting Organic Presence signals for {current_url}...") # Optional debug
-                organic_signals = {
-                    "meta_title": None, "meta_description": None, "meta_keywords": None,
-                    "canonical_url": None, "h1_tags": [], "h2_tags": [],
-                    "json_ld_scripts": [], "robots_meta": None, "hreflang_tags": []
-                }
-                title_tag = soup.find("title")
-                if title_tag and title_tag.string:
-                    organic_signals["meta_title"] = title_tag.string.strip()
-                meta_tags = soup.find_all("meta")
-                for tag in meta_tags:
-                    if tag.get("name", "").lower() == "description" and tag.get("content"):
-                        organic_signals["meta_description"] = tag.get("content").strip()
-                    elif tag.get("name", "").lower() == "keywords" and tag.get("content"):
-                        organic_signals["meta_keywords"] = tag.get("content").strip()
-                    elif tag.get("name", "").lower() == "robots" and tag.get("content"):
-                        organic_signals["robots_meta"] = tag.get("content").strip()
-                canonical_link = soup.find("link", rel=lambda x: x and x.lower() == "canonical")
-                if canonical_link and canonical_link.get("href"):
-                    organic_signals["canonical_url"] = canonical_link.get("href")
-                h1_tags_found = soup.find_all("h1")
-                for tag in h1_tags_found:
-                    text_content = tag.get_text(separator=' ', strip=True)
-                    if text_content: organic_signals["h1_tags"].append(text_content)
-                h2_tags_found = soup.find_all("h2")
-                for tag in h2_tags_found:
-                    text_content = tag.get_text(separator=' ', strip=True)
-                    if text_content: organic_signals["h2_tags"].append(text_content)
-                json_ld_scripts_found = soup.find_all("script", type="application/ld+json")
-                for script in json_ld_scripts_found:
-                    if script.string:
+        for req_url in requests_log:
+            for tool_name, patterns in COOKIE_CONSENT_SIGNATURES.items():
+                for pattern in patterns:
+                    if r"\." in pattern or r"/" in pattern or "http" in pattern.lower():
                         try:
-                            json_content = json.loads(script.string)
-                            organic_signals["json_ld_scripts"].append(json_content)
-                        except json.JSONDecodeError:
-                            organic_signals["json_ld_scripts"].append({"error": "Invalid JSON", "content": script.string.strip()})
-                hreflang_links = soup.find_all("link", rel="alternate", hreflang=True)
-                for link in hreflang_links:
-                    if link.get("href"):
-                        organic_signals["hreflang_tags"].append({"lang": link.get("hreflang"), "href": link.get("href")})
-                # print(f"Organic signals extracted: {organic_signals}") # Optional debug
-
-                # ============================================================================================
-                # === CORE ANALYSIS AREA 3: User Experience & Website Performance (Client-Side Clues) ===
-                # ============================================================================================
-                # This area identifies client-side factors impacting user perception and interaction. [cite: 1, 11]
-
-                # -----------------------------------------------------------------
-                # --- SECTION 6: User Experience & Website Performance Clues ---
-                # -----------------------------------------------------------------
-                # print(f"Extracting UX & Performance clues for {current_url}...") # Optional debug
-                ux_performance_clues = {
-                    "viewport_meta_content": None, "identified_cdn_domains": set(),
-                    "lazy_loading_images": {"sampled_images": 0, "with_lazy_loading": 0},
-                    "alt_text_images": {"sampled_images": 0, "with_alt_text": 0}
-                }
-                viewport_meta = soup.find("meta", attrs={"name": "viewport"})
-                if viewport_meta and viewport_meta.get("content"):
-                    ux_performance_clues["viewport_meta_content"] = viewport_meta.get("content").strip()
-                for script_tag in script_tags:
-                    src = script_tag.get("src")
-                    if src:
-                        for pattern in CDN_DOMAIN_PATTERNS:
-                            if re.search(pattern, src, re.IGNORECASE):
-                                match = re.search(r"://([^/]+)", src)
-                                if match: ux_performance_clues["identified_cdn_domains"].add(match.group(1))
-                                break
-                css_links = soup.find_all("link", rel="stylesheet", href=True)
-                for link_tag in css_links:
-                    href = link_tag.get("href")
-                    if href:
-                        for pattern in CDN_DOMAIN_PATTERNS:
-                            if re.search(pattern, href, re.IGNORECASE):
-                                match = re.search(r"://([^/]+)", href)
-                                if match: ux_performance_clues["identified_cdn_domains"].add(match.group(1))
-                                break
-                ux_performance_clues["identified_cdn_domains"] = sorted(list(ux_performance_clues["identified_cdn_domains"]))
-                img_tags = soup.find_all("img")
-                sample_size = min(len(img_tags), 20)
-                ux_performance_clues["lazy_loading_images"]["sampled_images"] = sample_size
-                ux_performance_clues["alt_text_images"]["sampled_images"] = sample_size
-                for i in range(sample_size):
-                    img = img_tags[i]
-                    if img.get("loading") == "lazy":
-                        ux_performance_clues["lazy_loading_images"]["with_lazy_loading"] += 1
-                    alt_attr = img.get("alt")
-                    if alt_attr is not None:
-                        ux_performance_clues["alt_text_images"]["with_alt_text"] += 1
-                # print(f"UX/Performance signals extracted: {ux_performance_clues}") # Optional debug
-
-                # =====================================================================
-                # === CORE ANALYSIS AREA 4: Conversion & Funnel Effectiveness (Planned) ===
-                # =====================================================================
-                # This area aims to understand how user progression towards goals is tracked 
-                # and how leads are captured. [cite: 1, 9]
-                # (Code for this section to be added here)
-                # E.g., identify conversion pixel calls, analyze form tags
-
-                conversion_funnel_effectiveness = {
-                    "identified_conversion_events": set(),
-                    "forms_analysis": []
-                }
+                            if re.search(pattern, req_url, re.IGNORECASE):
+                                identified_cookie_consent_tools.add(tool_name)
+                        except re.error:
+                            pass
+        for tool_name, patterns in COOKIE_CONSENT_SIGNATURES.items():
+            for pattern in patterns:
+                try:
+                    if re.search(pattern, html_content, re.IGNORECASE):
+                        identified_cookie_consent_tools.add(tool_name)
+                except re.error:
+                    pass
+        # print(f"Cookie consent tools found: {identified_cookie_consent_tools}") # Optional debug
 
-                # 1. Identify specific conversion pixel function calls
-                # Search inline script content primarily
-                for script_tag in script_tags: # script_tags is already defined
-                    if script_tag.string: # Only check inline scripts
-                        inline_script_content = script_tag.string
-                        for event_type, patterns in CONVERSION_EVENT_SIGNATURES.items():
-                            for pattern in patterns:
-                                try:
-                                    if re.search(pattern, inline_script_content, re.IGNORECASE):
-                                        # Extract the specific event name if possible (e.g., 'Lead' from fbq('track','Lead'))
-                                        match = re.search(pattern, inline_script_content, re.IGNORECASE)
-                                        if match and len(match.groups()) > 0 and match.group(1):
-                                            conversion_funnel_effectiveness["identified_conversion_events"].add(f"{event_type}: {match.group(1)}")
-                                        else:
-                                            conversion_funnel_effectiveness["identified_conversion_events"].add(event_type)
-                                except re.error:
-                                    pass
-                conversion_funnel_effectiveness["identified_conversion_events"] = sorted(list(conversion_funnel_effectiveness["identified_conversion_events"]))
-
-                # 2. Analyze <form> tags using page.evaluate() for better dynamic content handling
-                print(f"    Analyzing forms for {current_url} using page.evaluate()...") # Optional debug
-                js_get_forms_script = """
-                () => {
-                  const forms = Array.from(document.forms);
-                  return forms.map(form => {
-                    const formDetails = {
-                      form_id: form.id || null,
-                      form_name: form.name || null,
-                      form_classes: Array.from(form.classList),
-                      form_action: form.action || null, // This will be the fully resolved URL
-                      form_method: form.method ? form.method.toUpperCase() : 'GET',
-                      handler_attributes: {},
-                      input_fields_summary: []
-                    };
-
-                    // Check for common data-* attributes used by form handlers
-                    if (form.dataset.netlify === 'true') formDetails.handler_attributes.netlify_form = true;
-                    // Note: dataset access converts kebab-case (data-hs-cf-bound) to camelCase (hsCfBound)
-                    if (form.dataset.hsCfBound === 'true') formDetails.handler_attributes.hubspot_form_indicator = true;
-                    if (form.dataset.marketoFormId) formDetails.handler_attributes.marketo_form_id = form.dataset.marketoFormId;
-                    // Add other specific data-attribute checks if needed, e.g., data-pardot-form-id, etc.
-
-                    const inputs = Array.from(form.elements); // form.elements gets all form controls
-                    // Define key input types and names to look for - keep these consistent with previous logic or refine
-                    const keyInputTypes = ["email", "text", "tel", "submit", "hidden", "password", "search", "url", "number", "checkbox", "radio", "date", "select-one", "select-multiple", "textarea"];
-                    const keyInputNames = ["email", "name", "firstname", "first_name", "last_name", "lastname", "phone", "tel", "mobile", "company", "website", "job_title", "query", "q", "search", "address", "city", "state", "zip", "postal", "country", "utm_"];
-
-                    inputs.forEach(input => {
-                      const inputName = (input.name || '').toLowerCase();
-                      const inputType = (input.type || input.tagName.toLowerCase()).toLowerCase();
-                      const inputId = (input.id || '').toLowerCase();
-                      let isKeyField = false;
-
-                      if (keyInputTypes.includes(inputType)) {
-                        isKeyField = true;
-                      } else {
-                        for (const keyNamePart of keyInputNames) {
-                          if (inputName.includes(keyNamePart) || inputId.includes(keyNamePart)) {
-                            isKeyField = true;
-                            break;
-                          }
-                        }
-                      }
-                      
-                      // Always consider submit buttons as key fields
-                      if (inputType === 'submit' || (input.tagName.toLowerCase() === 'button' && input.type === 'submit')) {
-                        isKeyField = true;
-                      }
-
-                      if (isKeyField) {
-                        const fieldSummary = { 
-                            name: input.name || null, 
-                            type: inputType, 
-                            id: input.id || null,
-                            value: input.value || null, // Capture value for some input types
-                            placeholder: input.placeholder || null // Capture placeholder
-                        };
-                        if (input.tagName.toLowerCase() === 'button' || inputType === 'submit') {
-                          fieldSummary.text = input.textContent ? input.textContent.trim() : (input.value || '');
-                        }
-                        // For select, capture options if desired (can be verbose)
-                        // if (inputType === 'select-one' || inputType === 'select-multiple') {
-                        //   fieldSummary.options = Array.from(input.options).map(opt => ({value: opt.value, text: opt.text}));
-                        // }
-                        formDetails.input_fields_summary.push(fieldSummary);
-                      }
-                    });
-                    return formDetails;
-                  });
-                }
-                """
+        # =====================================================================
+        # === CORE ANALYSIS AREA 2: Organic Presence & Content Signals ===
+        # =====================================================================
+        # This area evaluates efforts to attract organic traffic and how 
+        # content is structured for search engines. [cite: 1, 7]
+        
+        # -----------------------------------------------------------------
+        # --- SECTION 5: Organic Presence & Content Signals ---
+        # -----------------------------------------------------------------
+        # print(f"Extracting Organic Presence signals for {current_url}...") # Optional debug
+        organic_signals = {
+            "meta_title": None, "meta_description": None, "meta_keywords": None,
+            "canonical_url": None, "h1_tags": [], "h2_tags": [],
+            "json_ld_scripts": [], "robots_meta": None, "hreflang_tags": []
+        }
+        title_tag = soup.find("title")
+        if title_tag and title_tag.string:
+            organic_signals["meta_title"] = title_tag.string.strip()
+        meta_tags = soup.find_all("meta")
+        for tag in meta_tags:
+            if tag.get("name", "").lower() == "description" and tag.get("content"):
+                organic_signals["meta_description"] = tag.get("content").strip()
+            elif tag.get("name", "").lower() == "keywords" and tag.get("content"):
+                organic_signals["meta_keywords"] = tag.get("content").strip()
+            elif tag.get("name", "").lower() == "robots" and tag.get("content"):
+                organic_signals["robots_meta"] = tag.get("content").strip()
+        canonical_link = soup.find("link", rel=lambda x: x and x.lower() == "canonical")
+        if canonical_link and canonical_link.get("href"):
+            organic_signals["canonical_url"] = canonical_link.get("href")
+        h1_tags_found = soup.find_all("h1")
+        for tag in h1_tags_found:
+            text_content = tag.get_text(separator=' ', strip=True)
+            if text_content: organic_signals["h1_tags"].append(text_content)
+        h2_tags_found = soup.find_all("h2")
+        for tag in h2_tags_found:
+            text_content = tag.get_text(separator=' ', strip=True)
+            if text_content: organic_signals["h2_tags"].append(text_content)
+        json_ld_scripts_found = soup.find_all("script", type="application/ld+json")
+        for script in json_ld_scripts_found:
+            if script.string:
                 try:
-                    forms_data = page.evaluate(js_get_forms_script)
-                    if forms_data:
-                        conversion_funnel_effectiveness["forms_analysis"] = forms_data
-                        # print(f"    Found {len(forms_data)} forms using page.evaluate().") # Optional debug
-                    # else: # Optional debug
-                        # print(f"    No forms found using page.evaluate().")
-                except Exception as e_form:
-                    print(f"    Error during form analysis with page.evaluate(): {e_form}")
-                    # conversion_funnel_effectiveness["forms_analysis"] will remain empty or you can add an error entry
-                    conversion_funnel_effectiveness["forms_analysis"].append({"error": f"Form analysis failed: {str(e_form)}"})
-                # --- Attempt to find forms within iframes ---
-                # print(f"    DEBUG: Starting iframe analysis for {current_url}...") # Keep this commented for now
-                iframes = page.frames[1:] 
-
-                if not iframes:
-                    # print(f"    DEBUG: No iframes found on {current_url}.") # Keep this commented
-                    pass 
-                else:
-                    print(f"    INFO: Found {len(iframes)} iframe(s) on {current_url}. Analyzing relevant ones...") # Changed to INFO and summarized
-                    processed_iframes_count = 0
-                    forms_found_in_iframes_count = 0
-
-                    for i, frame_handler in enumerate(iframes):
-                        iframe_name_str = f"'{frame_handler.name}'" if frame_handler.name else "N/A"
-                        iframe_url_str = f"'{frame_handler.url}'"
-                        
-                        # Optional: print only if processing an iframe, not for every single one
-                        # print(f"      DEBUG: Considering iframe {i+1} - Name: {iframe_name_str}, URL: {iframe_url_str}")
-                        
-                        if frame_handler.is_detached():
-                            # print(f"        DEBUG: Skipping detached iframe {i+1}.")
-                            continue 
-
-                        if not frame_handler.url or frame_handler.url == "about:blank":
-                            # print(f"        DEBUG: Skipping iframe {i+1} (Name: {iframe_name_str}) due to blank or no URL (URL: {iframe_url_str}).")
-                            continue
-                        
-                        processed_iframes_count +=1
+                    json_content = json.loads(script.string)
+                    organic_signals["json_ld_scripts"].append(json_content)
+                except json.JSONDecodeError:
+                    organic_signals["json_ld_scripts"].append({"error": "Invalid JSON", "content": script.string.strip()})
+        hreflang_links = soup.find_all("link", rel="alternate", hreflang=True)
+        for link in hreflang_links:
+            if link.get("href"):
+                organic_signals["hreflang_tags"].append({"lang": link.get("hreflang"), "href": link.get("href")})
+        # print(f"Organic signals extracted: {organic_signals}") # Optional debug
+
+        # ============================================================================================
+        # === CORE ANALYSIS AREA 3: User Experience & Website Performance (Client-Side Clues) ===
+        # ============================================================================================
+        # This area identifies client-side factors impacting user perception and interaction. [cite: 1, 11]
+
+        # -----------------------------------------------------------------
+        # --- SECTION 6: User Experience & Website Performance Clues ---
+        # -----------------------------------------------------------------
+        # print(f"Extracting UX & Performance clues for {current_url}...") # Optional debug
+        ux_performance_clues = {
+            "viewport_meta_content": None, "identified_cdn_domains": set(),
+            "lazy_loading_images": {"sampled_images": 0, "with_lazy_loading": 0},
+            "alt_text_images": {"sampled_images": 0, "with_alt_text": 0}
+        }
+        viewport_meta = soup.find("meta", attrs={"name": "viewport"})
+        if viewport_meta and viewport_meta.get("content"):
+            ux_performance_clues["viewport_meta_content"] = viewport_meta.get("content").strip()
+        for script_tag in script_tags:
+            src = script_tag.get("src")
+            if src:
+                for pattern in CDN_DOMAIN_PATTERNS:
+                    if re.search(pattern, src, re.IGNORECASE):
+                        match = re.search(r"://([^/]+)", src)
+                        if match: ux_performance_clues["identified_cdn_domains"].add(match.group(1))
+                        break
+        css_links = soup.find_all("link", rel="stylesheet", href=True)
+        for link_tag in css_links:
+            href = link_tag.get("href")
+            if href:
+                for pattern in CDN_DOMAIN_PATTERNS:
+                    if re.search(pattern, href, re.IGNORECASE):
+                        match = re.search(r"://([^/]+)", href)
+                        if match: ux_performance_clues["identified_cdn_domains"].add(match.group(1))
+                        break
+        ux_performance_clues["identified_cdn_domains"] = sorted(list(ux_performance_clues["identified_cdn_domains"]))
+        img_tags = soup.find_all("img")
+        sample_size = min(len(img_tags), 20)
+        ux_performance_clues["lazy_loading_images"]["sampled_images"] = sample_size
+        ux_performance_clues["alt_text_images"]["sampled_images"] = sample_size
+        for i in range(sample_size):
+            img = img_tags[i]
+            if img.get("loading") == "lazy":
+                ux_performance_clues["lazy_loading_images"]["with_lazy_loading"] += 1
+            alt_attr = img.get("alt")
+            if alt_attr is not None:
+                ux_performance_clues["alt_text_images"]["with_alt_text"] += 1
+        # print(f"UX/Performance signals extracted: {ux_performance_clues}") # Optional debug
+
+        # =====================================================================
+        # === CORE ANALYSIS AREA 4: Conversion & Funnel Effectiveness (Planned) ===
+        # =====================================================================
+        # This area aims to understand how user progression towards goals is tracked 
+        # and how leads are captured. [cite: 1, 9]
+        # (Code for this section to be added here)
+        # E.g., identify conversion pixel calls, analyze form tags
+
+        conversion_funnel_effectiveness = {
+            "identified_conversion_events": set(),
+            "forms_analysis": []
+        }
+
+        # 1. Identify specific conversion pixel function calls
+        # Search inline script content primarily
+        for script_tag in script_tags: # script_tags is already defined
+            if script_tag.string: # Only check inline scripts
+                inline_script_content = script_tag.string
+                for event_type, patterns in CONVERSION_EVENT_SIGNATURES.items():
+                    for pattern in patterns:
                         try:
-                            # print(f"        DEBUG: Attempting to evaluate js_get_forms_script in iframe {i+1} (URL: {iframe_url_str})")
-                            iframe_forms_data_raw = frame_handler.evaluate(js_get_forms_script) 
-                            # print(f"        DEBUG: Raw forms data from iframe {i+1} (URL: {iframe_url_str}): {iframe_forms_data_raw}")
-
-                            if iframe_forms_data_raw and isinstance(iframe_forms_data_raw, list):
-                                if len(iframe_forms_data_raw) > 0:
-                                    forms_found_in_iframes_count += len(iframe_forms_data_raw)
-                                    # print(f"          DEBUG: Found {len(iframe_forms_data_raw)} form object(s) in iframe {i+1} (URL: {iframe_url_str}).")
-                                    for form_item in iframe_forms_data_raw:
-                                        form_item["found_in_iframe"] = True
-                                        form_item["iframe_url"] = frame_handler.url 
-                                        form_item["iframe_name"] = frame_handler.name if frame_handler.name else None
-                                        conversion_funnel_effectiveness["forms_analysis"].append(form_item)
-                                # else:
-                                    # print(f"          DEBUG: Empty list returned (no forms found) from iframe {i+1} (URL: {iframe_url_str}).")
-                            # else:
-                                # print(f"          DEBUG: No form objects returned (or unexpected data type: {type(iframe_forms_data_raw).__name__}) from iframe {i+1} (URL: {iframe_url_str}).")
-                        
-                        except Exception as e_iframe:
-                            error_type_iframe = type(e_iframe).__name__
-                            current_iframe_url_for_error = "N/A"
-                            current_iframe_name_for_error = "N/A"
-                            try:
-                                current_iframe_url_for_error = frame_handler.url if not frame_handler.is_detached() else "detached"
-                                current_iframe_name_for_error = frame_handler.name if not frame_handler.is_detached() and frame_handler.name else "N/A"
-                            except: pass 
-                            error_message_iframe = f"Error evaluating forms in iframe {i+1} (URL: {current_iframe_url_for_error}, Name: {current_iframe_name_for_error}): {error_type_iframe} - {str(e_iframe)}"
-                            print(f"    WARNING: {error_message_iframe}") # Changed to WARNING, this is important to keep
-                    
-                    if processed_iframes_count > 0:
-                        print(f"    INFO: Attempted to analyze {processed_iframes_count} relevant iframe(s). Found {forms_found_in_iframes_count} forms within them.")
-                    elif len(iframes) > 0 : # All iframes were skipped
-                        print(f"    INFO: All {len(iframes)} found iframe(s) were skipped (e.g. detached or about:blank).")
-                # print(f"Conversion/Funnel clues: {conversion_funnel_effectiveness}") # Optional debug
-
-                # ===================================================================================
-                # === CORE ANALYSIS AREA 5: Competitive Posture & Strategic Tests (Planned) ===
-                # ===================================================================================
-                # This area uncovers client-side evidence of iteration, differentiation, or focus. [cite: 1, 13]
-                # (Code for this section to be added here)
-                # E.g., identify A/B testing clues, feature flags, unique MarTech usage
-
-                competitive_strategic_clues = {
-                    "ab_testing_tools_present": [],
-                    "feature_flags_systems_identified": set(),
-                    "advanced_martech_indicators": [] # e.g., CDPs
-                }
+                            if re.search(pattern, inline_script_content, re.IGNORECASE):
+                                # Extract the specific event name if possible (e.g., 'Lead' from fbq('track','Lead'))
+                                match = re.search(pattern, inline_script_content, re.IGNORECASE)
+                                if match and len(match.groups()) > 0 and match.group(1):
+                                    conversion_funnel_effectiveness["identified_conversion_events"].add(f"{event_type}: {match.group(1)}")
+                                else:
+                                    conversion_funnel_effectiveness["identified_conversion_events"].add(event_type)
+                        except re.error:
+                            pass
+        conversion_funnel_effectiveness["identified_conversion_events"] = sorted(list(conversion_funnel_effectiveness["identified_conversion_events"]))
+
+        # 2. Analyze <form> tags in the main frame and relevant iframes.
+        # Same-origin iframes are read in the same round trip; cross-origin
+        # frames are URL-filtered and evaluated under a time budget.
+        _check_cancelled(cancel_event)
+        print(f"    Analyzing forms for {current_url}...")
+        forms_data, iframe_report = analyze_page_forms(page, current_url)
+        conversion_funnel_effectiveness["forms_analysis"] = forms_data
+        conversion_funnel_effectiveness["iframe_analysis"] = iframe_report
+        if iframe_report["frames_total"] or iframe_report["frames_batched_same_origin"]:
+            print(f"    INFO: {iframe_report['frames_total']} iframe(s) on {current_url}: "
+                  f"{iframe_report['frames_batched_same_origin']} batched, {iframe_report['frames_evaluated']} evaluated, "
+                  f"{len(iframe_report['frames_skipped'])} skipped. Found {iframe_report['forms_found_in_iframes']} forms "
+                  f"in {iframe_report['elapsed_ms']} ms.")
+        # print(f"Conversion/Funnel clues: {conversion_funnel_effectiveness}") # Optional debug
+
+        # ===================================================================================
+        # === CORE ANALYSIS AREA 5: Competitive Posture & Strategic Tests (Planned) ===
+        # ===================================================================================
+        # This area uncovers client-side evidence of iteration, differentiation, or focus. [cite: 1, 13]
+        # (Code for this section to be added here)
+        # E.g., identify A/B testing clues, feature flags, unique MarTech usage
+
+        competitive_strategic_clues = {
+            "ab_testing_tools_present": [],
+            "feature_flags_systems_identified": set(),
+            "advanced_martech_indicators": [] # e.g., CDPs
+        }
 
-                # 1. A/B Testing Tool Presence
-                # Check from already identified MarTech tools (from identified_martech_on_page)
-                known_ab_testing_tools = ["Optimizely"] # Add other known A/B tools if in MARTECH_SIGNATURES
-                for tool in identified_martech_on_page: # This set is populated in MarTech sections
-                    if tool in known_ab_testing_tools:
-                        competitive_strategic_clues["ab_testing_tools_present"].append(tool)
-
-                # 2. Feature Flag Systems Identification
-                # Check script tags (src and inline content)
-                for script_tag in script_tags: # script_tags is already defined
-                    script_content_to_check = ""
-                    if script_tag.get("src"):
-                        script_content_to_check += script_tag.get("src").lower() + " " # Lowercase for case-insensitive match
-                    script_content_to_check += script_tag.string.lower() if script_tag.string else ""
-
-                    if script_content_to_check.strip():
-                        for tool_name, patterns in FEATURE_FLAG_SIGNATURES.items():
-                            for pattern in patterns:
-                                try:
-                                    if re.search(pattern, script_content_to_check, re.IGNORECASE):
-                                        competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
-                                except re.error:
-                                    pass
-                
-                # Check Network Requests (some SDKs might load resources this way)
-                for req_url in requests_log: # requests_log is defined from page.on("request")
-                    req_url_lower = req_url.lower()
-                    for tool_name, patterns in FEATURE_FLAG_SIGNATURES.items():
-                        for pattern in patterns:
-                            if r"\." in pattern or r"/" in pattern or "http" in pattern.lower(): # URL-like patterns
-                                try:
-                                    if re.search(pattern, req_url_lower, re.IGNORECASE):
-                                        competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
-                                except re.error:
-                                    pass
-                
-                # Check full HTML for global JS variables (basic check)
-                html_content_lower = html_content.lower() # Search in lowercase
+        # 1. A/B Testing Tool Presence
+        # Check from already identified MarTech tools (from identified_martech_on_page)
+        known_ab_testing_tools = ["Optimizely"] # Add other known A/B tools if in MARTECH_SIGNATURES
+        for tool in identified_martech_on_page: # This set is populated in MarTech sections
+            if tool in known_ab_testing_tools:
+                competitive_strategic_clues["ab_testing_tools_present"].append(tool)
+
+        # 2. Feature Flag Systems Identification
+        # Check script tags (src and inline content)
+        for script_tag in script_tags: # script_tags is already defined
+            script_content_to_check = ""
+            if script_tag.get("src"):
+                script_content_to_check += script_tag.get("src").lower() + " " # Lowercase for case-insensitive match
+            script_content_to_check += script_tag.string.lower() if script_tag.string else ""
+
+            if script_content_to_check.strip():
                 for tool_name, patterns in FEATURE_FLAG_SIGNATURES.items():
-                    if "window." in "".join(patterns).lower(): # Only check patterns explicitly looking for window objects
-                        for pattern in patterns:
-                             if "window." in pattern.lower():
-                                try:
-                                    js_object_pattern = pattern.replace(r"window.", r"window\.") # Escape dot for regex
-                                    if re.search(js_object_pattern, html_content_lower, re.IGNORECASE):
-                                        competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
-                                except re.error:
-                                    pass
-
-                competitive_strategic_clues["feature_flags_systems_identified"] = sorted(list(competitive_strategic_clues["feature_flags_systems_identified"]))
-
-                # 3. Advanced MarTech Indicators
-                # Example: Check for CDPs like Segment from identified_martech_on_page
-                if "Segment" in identified_martech_on_page: # Segment is a key in MARTECH_SIGNATURES
-                    competitive_strategic_clues["advanced_martech_indicators"].append("Segment (CDP)")
-                # Add other advanced tool checks here as needed
-
-                # print(f"Competitive/Strategic clues: {competitive_strategic_clues}") # Optional debug
-
-                # -----------------------------------------------------------------
-                # --- Compile Extracted Information for this URL for JSON Output ---
-                # -----------------------------------------------------------------
-                page_fetch_time_utc = datetime.now(timezone.utc)
-                page_title_val = page.title() # Capture page title separately
-
-                # This data_for_json will be the content of the "data": {} field in the JSON
-                data_for_json = {
-                    "marketing_technology_data_foundation": {
-                        "martech_identified": sorted(list(identified_martech_on_page)),
-                        "dataLayer_summary": { # Standardizing dataLayer output
-                            "exists": data_layer_exists_on_page,
-                            "total_pushes": data_layer_content_summary.get("total_pushes") if data_layer_exists_on_page and data_layer_content_summary else None,
-                            "sample_pushes_structure": data_layer_content_summary.get("sample_pushes_structure") if data_layer_exists_on_page and data_layer_content_summary else None,
-                            "error": data_layer_content_summary.get("error") if data_layer_content_summary and "error" in data_layer_content_summary else None
-                        },
-                        "cookie_consent_tools_identified": sorted(list(identified_cookie_consent_tools))
-                    },
-                    "organic_presence_content_signals": organic_signals, # organic_signals is already a dict
-                    "user_experience_performance_clues": ux_performance_clues, # ux_performance_clues is already a dict
-                    "conversion_funnel_effectiveness": conversion_funnel_effectiveness, # this is already a dict
-                    "competitive_posture_strategic_tests": competitive_strategic_clues # this is already a dict
-                }
-
-                url_result_object = {
-                    "url": current_url,
-                    "fetch_status": "success",
-                    "error_details": None,
-                    "fetch_timestamp_utc": page_fetch_time_utc.isoformat(),
-                    "page_title": page_title_val,
-                    "data": data_for_json
-                }
-                processed_urls_results_list.append(url_result_object)
-                successful_fetches += 1
-
-            except Exception as e:
-                print(f"Could not process {current_url}. Error: {e}")
-                page_fetch_time_utc = datetime.now(timezone.utc) # Capture error time
-                url_result_object = {
-                    "url": current_url,
-                    "fetch_status": "error",
-                    "error_details": str(e),
-                    "fetch_timestamp_utc": page_fetch_time_utc.isoformat(),
-                    "page_title": None,
-                    "data": None # Or provide a default empty structure for "data" if preferred
-                }
-                processed_urls_results_list.append(url_result_object)
-                failed_fetches += 1
+                    for pattern in patterns:
+                        try:
+                            if re.search(pattern, script_content_to_check, re.IGNORECASE):
+                                competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
+                        except re.error:
+                            pass
+        
+        # Check Network Requests (some SDKs might load resources this way)
+        for req_url in requests_log: # requests_log is defined from page.on("request")
+            req_url_lower = req_url.lower()
+            for tool_name, patterns in FEATURE_FLAG_SIGNATURES.items():
+                for pattern in patterns:
+                    if r"\." in pattern or r"/" in pattern or "http" in pattern.lower(): # URL-like patterns
+                        try:
+                            if re.search(pattern, req_url_lower, re.IGNORECASE):
+                                competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
+                        except re.error:
+                            pass
+        
+        # Check full HTML for global JS variables (basic check)
+        html_content_lower = html_content.lower() # Search in lowercase
+        for tool_name, patterns in FEATURE_FLAG_SIGNATURES.items():
+            if "window." in "".join(patterns).lower(): # Only check patterns explicitly looking for window objects
+                for pattern in patterns:
+                     if "window." in pattern.lower():
+                        try:
+                            js_object_pattern = pattern.replace(r"window.", r"window\.") # Escape dot for regex
+                            if re.search(js_object_pattern, html_content_lower, re.IGNORECASE):
+                                competitive_strategic_clues["feature_flags_systems_identified"].add(tool_name)
+                        except re.error:
+                            pass
 
-            finally:
-                # Ensure page is closed exactly once, whether success or error
-                try:
-                    if 'page' in locals() and page and not page.is_closed():
-                        page.close()
-                except Exception as e_page_close:
-                    # Silently handle page close errors as they're not critical
-                    pass
-            time.sleep(1)
-
-        # --- End of URL Processing Loop ---
-
-        # ---------------------------------------------------------------------
-        # --- FINAL OUTPUT SECTION ---
-        # ---------------------------------------------------------------------
-        # --- End of URL Processing Loop ---
-
-        # Construct the final JSON object
-        final_json_output = {
-            "collection_metadata": {
-                "collector_version": "1.0.0", # You can manage this version string
-                "collection_timestamp_utc": collection_start_time_utc.isoformat(),
-                 "total_urls_processed": len(urls_to_process), # MODIFIED HERE
-                "total_urls_successful": successful_fetches,
-                "total_urls_failed": failed_fetches
+        competitive_strategic_clues["feature_flags_systems_identified"] = sorted(list(competitive_strategic_clues["feature_flags_systems_identified"]))
+
+        # 3. Advanced MarTech Indicators
+        # Example: Check for CDPs like Segment from identified_martech_on_page
+        if "Segment" in identified_martech_on_page: # Segment is a key in MARTECH_SIGNATURES
+            competitive_strategic_clues["advanced_martech_indicators"].append("Segment (CDP)")
+        # Add other advanced tool checks here as needed
+
+        # print(f"Competitive/Strategic clues: {competitive_strategic_clues}") # Optional debug
+
+        # -----------------------------------------------------------------
+        # --- Compile Extracted Information for this URL for JSON Output ---
+        # -----------------------------------------------------------------
+        page_fetch_time_utc = datetime.now(timezone.utc)
+        page_title_val = page.title() # Capture page title separately
+
+        # This data_for_json will be the content of the "data": {} field in the JSON
+        data_for_json = {
+            "marketing_technology_data_foundation": {
+                "martech_identified": sorted(list(identified_martech_on_page)),
+                "dataLayer_summary": { # Standardizing dataLayer output
+                    "exists": data_layer_exists_on_page,
+                    "total_pushes": data_layer_content_summary.get("total_pushes") if data_layer_exists_on_page and data_layer_content_summary else None,
+                    "sample_pushes_structure": data_layer_content_summary.get("sample_pushes_structure") if data_layer_exists_on_page and data_layer_content_summary else None,
+                    "error": data_layer_content_summary.get("error") if data_layer_content_summary and "error" in data_layer_content_summary else None
+                },
+                "cookie_consent_tools_identified": sorted(list(identified_cookie_consent_tools))
             },
-            "url_analysis_results": processed_urls_results_list
+            "organic_presence_content_signals": organic_signals, # organic_signals is already a dict
+            "user_experience_performance_clues": ux_performance_clues, # ux_performance_clues is already a dict
+            "conversion_funnel_effectiveness": conversion_funnel_effectiveness, # this is already a dict
+            "competitive_posture_strategic_tests": competitive_strategic_clues # this is already a dict
         }
 
-        # Write the JSON output to a file
-        # Generate output filename based on execution mode:
-        # - Single URL: output/deepstack_output-{domain}.json 
-        # - Batch mode: output/deepstack_output.json
-        
-        # Create output directory if it doesn't exist
-        output_dir = "output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print(f"Created output directory: {output_dir}/")
-        
-        if args.url:
-            # Single URL mode - extract domain name for filename
-            parsed_url = urlparse(args.url)
-            # Remove www. prefix and replace colons with underscores for ports
-            domain = parsed_url.netloc.replace('www.', '').replace(':', '_')
-            output_filename = os.path.join(output_dir, f"deepstack_output-{domain}.json")
-        else:
-            # Batch mode - use generic filename
-            output_filename = os.path.join(output_dir, "deepstack_output.json")
-        try:
-            with open(output_filename, 'w') as f:
-                json.dump(final_json_output, f, indent=2) # indent=2 for pretty-printing
-            print(f"\nResults successfully saved to {output_filename}")
-        except IOError as e:
-            print(f"\nError writing results to JSON file {output_filename}: {e}")
-        except TypeError as e:
-            print(f"\nError serializing data to JSON: {e}. Check data structures.")
-
-        # The existing console output loop can remain for immediate feedback if desired,
-        # or you might choose to simplify or remove it now that data is saved to a file.
-        print("\n--- Console Output Summary ---") # Optional: Changed heading for clarity
-        # (The line "print("\n--- Collection Finished ---")" or "print("\n--- Console Output Summary ---")" should be right above this new loop)
-
-        for result_item in processed_urls_results_list: # Iterate through the new list
-            print(f"\nData for {result_item['url']}:") # Access URL from result_item
-
-            if result_item['fetch_status'] == "error": # Check fetch_status
-                print(f"  Error: {result_item['error_details']}")
-                continue # Skip to next URL if there was a fetch error
-
-            # If successful, 'data_payload' is the dictionary holding all the categorized data
-            data_payload = result_item.get('data')
-            if not data_payload: 
-                print("  Error: No data payload found for this URL despite successful fetch.")
-                continue
+        url_result_object = {
+            "url": current_url,
+            "fetch_status": "success",
+            "error_details": None,
+            "fetch_timestamp_utc": page_fetch_time_utc.isoformat(),
+            "page_title": page_title_val,
+            "error_category": None,
+            "challenge": challenge_info,
+            "data": data_for_json
+        }
 
-            print(f"  Page Title: {result_item.get('page_title', 'Not found')}")
-
-            # Marketing Technology & Data Foundation
-            mt_df = data_payload.get('marketing_technology_data_foundation', {})
-            print(f"  Marketing Technology & Data Foundation:")
-            print(f"    MarTech Identified: {mt_df.get('martech_identified', 'None found')}")
-            
-            dl_summary_data = mt_df.get('dataLayer_summary', {}) 
-            print(f"    DataLayer Exists: {dl_summary_data.get('exists', False)}")
-            if dl_summary_data.get('exists'):
-                if dl_summary_data.get('error'):
-                     print(f"    DataLayer Summary Error: {dl_summary_data.get('error')}")
-                else:
-                    print(f"    DataLayer Summary - Total Pushes: {dl_summary_data.get('total_pushes', 'N/A')}")
-                    if dl_summary_data.get('sample_pushes_structure'):
-                        print("    DataLayer Summary - Sample Pushes Structure:")
-                        for sample_push in dl_summary_data.get('sample_pushes_structure', []):
-                            print(f"      {sample_push}")
-            elif dl_summary_data.get('error'): 
-                 print(f"    DataLayer Summary Error: {dl_summary_data.get('error')}")
-            print(f"    Cookie Consent Tools: {mt_df.get('cookie_consent_tools_identified', 'None found')}")
-
-            # Organic Presence & Content Signals
-            ops_signals = data_payload.get('organic_presence_content_signals', {})
-            if ops_signals: 
-                print(f"  Organic Presence & Content Signals:")
-                print(f"    Meta Title: {ops_signals.get('meta_title', 'Not found')}")
-                meta_desc = ops_signals.get('meta_description')
-                print(f"    Meta Description: {meta_desc[:100] + '...' if meta_desc and len(meta_desc) > 100 else meta_desc if meta_desc else 'Not found'}")
-                print(f"    Meta Keywords: {ops_signals.get('meta_keywords', 'Not found')}")
-                print(f"    Canonical URL: {ops_signals.get('canonical_url', 'Not found')}")
-                print(f"    Robots Meta: {ops_signals.get('robots_meta', 'Not found')}")
-                print(f"    H1 Tags: {ops_signals.get('h1_tags', [])}")
-                print(f"    H2 Tags (count): {len(ops_signals.get('h2_tags', []))}")
-                print(f"    JSON-LD Scripts (count): {len(ops_signals.get('json_ld_scripts', []))}")
-                print(f"    Hreflang Tags (count): {len(ops_signals.get('hreflang_tags', []))}")
-
-            # User Experience & Website Performance (Client-Side Clues)
-            ux_perf = data_payload.get('user_experience_performance_clues', {})
-            if ux_perf:
-                print(f"  User Experience & Website Performance Clues:")
-                print(f"    Viewport Meta Content: {ux_perf.get('viewport_meta_content', 'Not found')}")
-                print(f"    Identified CDN Domains: {ux_perf.get('identified_cdn_domains', 'None found')}")
-                lazy_info = ux_perf.get('lazy_loading_images', {})
-                print(f"    Lazy Loading Images: {lazy_info.get('with_lazy_loading', 0)} found with 'loading=\"lazy\"' out of {lazy_info.get('sampled_images', 0)} sampled")
-                alt_info = ux_perf.get('alt_text_images', {})
-                print(f"    Image Alt Texts: {alt_info.get('with_alt_text', 0)} found with 'alt' attribute out of {alt_info.get('sampled_images', 0)} sampled")
-
-            # Conversion & Funnel Effectiveness - Simplified console output
-            conv_funnel = data_payload.get('conversion_funnel_effectiveness', {})
-            print(f"  Conversion & Funnel Effectiveness:")
-            print(f"    Identified Conversion Events: {conv_funnel.get('identified_conversion_events', 'None detected or empty')}")
-            print(f"    Forms Analyzed (count): {len(conv_funnel.get('forms_analysis', []))}")
-
-            # Competitive Posture & Strategic Tests - Simplified console output
-            comp_strat = data_payload.get('competitive_posture_strategic_tests', {})
-            print(f"  Competitive Posture & Strategic Tests:")
-            print(f"    A/B Testing Tools Identified: {comp_strat.get('ab_testing_tools_present', 'None detected')}")
-            print(f"    Feature Flag Systems Identified: {comp_strat.get('feature_flags_systems_identified', 'None detected')}")
-            print(f"    Advanced MarTech Indicators: {comp_strat.get('advanced_martech_indicators', 'None detected')}")
-
-        print("\nAttempting to close browser resources...")
+    except Exception as e:
+        print(f"Could not process {current_url}. Error: {e}")
+        page_fetch_time_utc = datetime.now(timezone.utc) # Capture error time
+        url_result_object = {
+            "url": current_url,
+            "fetch_status": "error",
+            "error_details": str(e),
+            "fetch_timestamp_utc": page_fetch_time_utc.isoformat(),
+            "page_title": None,
+            "error_category": classify_error(e),
+            "challenge": challenge_info,
+            "data": None # Or provide a default empty structure for "data" if preferred
+        }
+
+    finally:
+        # Ensure page is closed exactly once, whether success or error
         try:
-            # Attempt to close context
-            if 'context' in locals() and context:
-                print("Closing browser context...")
-                context.close()
-                print("Browser context successfully closed.")
-            else:
-                print("Browser context object not available or already handled.")
-
-            # Attempt to close browser
-            if 'browser' in locals() and browser:
-                if browser.is_connected(): # Correct check for browser
-                    print("Closing browser...")
-                    browser.close()
-                    print("Browser successfully closed.")
-                else:
-                    print("Browser was already disconnected or closed.")
-            else:
-                print("Browser object not available.")
-                
-        except Exception as e_close:
-            print(f"Error during browser/context close: {type(e_close).__name__} - {e_close}")
-            # More specific checks for common Playwright closure issues
-            if "Target page, context or browser has been closed" in str(e_close):
-                 print("Indicates that a resource was likely already closed when an operation was attempted on it.")
-            elif "Event loop is closed" in str(e_close) or "Browser has been closed" in str(e_close):
-                print("Playwright's communication channel was already terminated or browser was already closed.")
+            if 'page' in locals() and page and not page.is_closed():
+                page.close()
+        except Exception as e_page_close:
+            # Silently handle page close errors as they're not critical
+            pass
+
+    return url_result_object
+
+
+def _error_result(url, error_details, error_category, challenge_info):
+    """url_result_object for a URL that could not be processed."""
+    return {
+        "url": url,
+        "fetch_status": "error",
+        "error_details": error_details,
+        "fetch_timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "page_title": None,
+        "error_category": error_category,
+        "challenge": challenge_info,
+        "data": None
+    }
+
+
+def analyze_url_with_retries(session, url, challenge_memory, cancel_event=None):
+    """
+    Run analyze_url() under the retry policy for its error category.
+
+    Failed attempts are retried with exponential backoff when the category
+    allows it, and the session's context or browser is recycled first when
+    the policy asks for it (always after a browser crash). The backoff ends
+    early, without another attempt, once cancel_event is set. The returned
+    url_result_object records the number of attempts and each error.
+    """
+    attempt = 0
+    attempt_errors = []
+    while True:
+        attempt += 1
+        result = analyze_url(session.context, url, challenge_memory, cancel_event=cancel_event)
+        if result["fetch_status"] == "success":
+            break
+
+        category = result["error_category"]
+        attempt_errors.append({"attempt": attempt, "category": category, "error": result["error_details"]})
+        decision = retry_decision(category, attempt)
+        if decision["recycle"] == RECYCLE_BROWSER or not session.browser_connected():
+            session.recycle_browser(reason=category)
+        elif decision["recycle"] == RECYCLE_CONTEXT:
+            session.recycle_context(reason=category)
+        if not decision["retry"] or (cancel_event is not None and cancel_event.is_set()):
+            break
+        print(f"    INFO: {category} error for {url} (attempt {attempt}). Retrying in {decision['delay']}s...")
+        if cancel_event is not None:
+            if cancel_event.wait(decision["delay"]):
+                break
+        else:
+            time.sleep(decision["delay"])
+
+    result["attempts"] = attempt
+    if attempt_errors and result["fetch_status"] == "success":
+        result["recovered_errors"] = attempt_errors
+    return result
+
+
+def _collect_worker(worker_id, scheduler, results, challenge_memory, worker_stats, cancel_event=None):
+    """
+    Collector worker thread: owns one Playwright instance and browser.
+
+    Pulls URLs from the politeness scheduler until it is drained and stores
+    each url_result_object at its input index in results. Playwright's sync
+    API is not thread-safe, so every worker launches its own browser. The
+    session's lifecycle stats are appended to worker_stats on exit. Once
+    cancel_event is set the worker stops taking new URLs.
+    """
+    try:
+        with sync_playwright() as p:
+            session = BrowserSession(p, worker_id)
+            try:
+                while True:
+                    item = scheduler.next()
+                    if item is None:
+                        break
+                    domain, (url, index) = item
+                    if cancel_event is not None and cancel_event.is_set():
+                        scheduler.done(domain)
+                        break
+                    try:
+                        results[index] = analyze_url_with_retries(session, url, challenge_memory, cancel_event)
+                    finally:
+                        scheduler.done(domain)
+                    session.after_page()
+            finally:
+                session.close()
+                worker_stats.append(session.stats())
+    except Exception as e_worker:
+        print(f"ERROR: Collector worker {worker_id} failed: {type(e_worker).__name__} - {e_worker}")
+
+
+# --- Library API ---
+# Options accepted by collect(); unspecified keys fall back to these defaults
+DEFAULT_COLLECT_OPTIONS = {
+    "workers": DEFAULT_WORKERS,                       # Parallel browser workers
+    "challenge_memory_file": CHALLENGE_MEMORY_FILE,   # Per-domain challenge memory (None: in memory only)
+    "fingerprint_dir": FINGERPRINT_DIR,               # Change-detection fingerprint store (None: no change detection)
+    "detect_changes": True,                           # Compare with the previous scan of each domain
+    "domain_min_interval": None,                      # Politeness overrides (None: scheduler defaults)
+    "domain_jitter": None,
+    "cancel_event": None,                             # threading.Event; set it to stop the collection
+}
+
+
+def normalize_url(url):
+    """Strip whitespace and default to https:// when no scheme is given."""
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+def collect(urls, options=None):
+    """
+    Analyze URLs and return the results as Python objects.
+
+    Runs the same pipeline as the command line (politeness scheduler,
+    parallel browser workers, retries, change detection) without parsing
+    arguments, changing directory or writing output files. Per-domain state
+    persists across runs at options["challenge_memory_file"] and
+    options["fingerprint_dir"]; set both to None to write nothing at all.
+
+    Args:
+        urls: URL strings to analyze (https:// is assumed when missing)
+        options: Optional dict overriding DEFAULT_COLLECT_OPTIONS
+
+    Returns:
+        Dict with "collection_metadata" and "url_analysis_results" (the
+        structure of deepstack_output.json), plus "url_changes" holding the
+        change report and changed section data for each successful URL
+    """
+    options = {**DEFAULT_COLLECT_OPTIONS, **(options or {})}
+    cancel_event = options["cancel_event"]
+    urls_to_process = [normalize_url(url) for url in urls if url and url.strip()]
+
+    collection_start_time_utc = datetime.now(timezone.utc)
+    challenge_memory = ChallengeMemory(options["challenge_memory_file"])
+
+    processed_urls_results_list = [None] * len(urls_to_process) # Structured data for each URL, in input order
+    worker_stats = [] # Browser lifecycle stats, one entry per worker
+    worker_count = 0
+
+    # Queue every URL with the politeness scheduler: same-domain requests are
+    # spaced out, different domains are dispatched to workers in parallel
+    scheduler = PolitenessScheduler(min_interval=options["domain_min_interval"], jitter=options["domain_jitter"])
+    for index, url in enumerate(urls_to_process):
+        scheduler.submit(url, index)
+    scheduler.close()
+
+    if urls_to_process:
+        domain_count = scheduler.stats()["domains_pending"]
+        worker_count = max(1, min(options["workers"], len(urls_to_process), domain_count * scheduler.max_in_flight))
+        workers = [
+            threading.Thread(
+                target=_collect_worker,
+                args=(worker_id, scheduler, processed_urls_results_list, challenge_memory, worker_stats, cancel_event),
+                name=f"deepstack-worker-{worker_id}"
+            )
+            for worker_id in range(1, worker_count + 1)
+        ]
+        print(f"Starting {worker_count} browser worker(s) for {len(urls_to_process)} URL(s) across {domain_count} domain(s)...")
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    cancelled = cancel_event is not None and cancel_event.is_set()
+    for index, result_item in enumerate(processed_urls_results_list):
+        if result_item is None:
+            # URL never reached: the collection was cancelled or every worker died
+            if cancelled:
+                processed_urls_results_list[index] = _error_result(urls_to_process[index], "Collection cancelled", CANCELLED, None)
             else:
-                print("The browser or context might have been in an unstable state during closure.")
+                processed_urls_results_list[index] = _error_result(urls_to_process[index], "Collector worker failed before processing this URL", BROWSER_CRASH, None)
+    successful_fetches = sum(1 for r in processed_urls_results_list if r["fetch_status"] == "success")
+    failed_fetches = len(processed_urls_results_list) - successful_fetches
+
+    # Compare each successful result with the previous scan of the same domain.
+    # The full result keeps a compact change report; changed section data is
+    # returned separately so consumers can skip unchanged domains.
+    change_reports = []
+    if options["detect_changes"] and options["fingerprint_dir"]:
+        for result_item in processed_urls_results_list:
+            report = detect_changes(result_item, options["fingerprint_dir"])
+            if report is None:
+                continue
+            changed_data = report.pop("changed_data")
+            result_item["change_detection"] = report
+            change_reports.append({"url": result_item["url"], **report, "changed_data": changed_data})
+    changed_urls = sum(1 for r in change_reports if r["changed"])
+
+    scheduler_stats = scheduler.stats()
+    print(f"\nScheduler: {scheduler_stats['dispatched']} request(s) dispatched, "
+          f"avg wait {scheduler_stats['avg_wait_seconds']}s, max wait {scheduler_stats['max_wait_seconds']}s")
+    rss_high_water_mb = max((w["rss_high_water_mb"] for w in worker_stats), default=None)
+    print(f"Memory high-water mark: {rss_high_water_mb} MB")
+
+    return {
+        "collection_metadata": {
+            "collector_version": "1.0.0", # You can manage this version string
+            "collection_timestamp_utc": collection_start_time_utc.isoformat(),
+            "total_urls_processed": len(urls_to_process),
+            "total_urls_successful": successful_fetches,
+            "total_urls_failed": failed_fetches,
+            "workers": worker_count,
+            "scheduler_stats": scheduler_stats,
+            "rss_high_water_mb": rss_high_water_mb,
+            "browser_workers": sorted(worker_stats, key=lambda w: w["worker_id"]),
+            "total_urls_changed": changed_urls,
+            "cancelled": cancelled
+        },
+        "url_analysis_results": processed_urls_results_list,
+        "url_changes": change_reports
+    }
+
+
+async def collect_async(urls, options=None):
+    """
+    Awaitable collect() for asyncio callers (e.g. the FastAPI service).
+
+    The collection runs in a worker thread, so the event loop stays free and
+    Playwright's sync API never runs inside a running event loop.
+    """
+    return await asyncio.to_thread(collect, urls, options)
+
+
+def print_summary(url_results):
+    """Print a human-readable summary of url_analysis_results to the console."""
+    print("\n--- Console Output Summary ---")
+
+    for result_item in url_results:
+        print(f"\nData for {result_item['url']}:") # Access URL from result_item
+
+        if result_item['fetch_status'] == "error": # Check fetch_status
+            print(f"  Error: {result_item['error_details']}")
+            continue # Skip to next URL if there was a fetch error
+
+        # If successful, 'data_payload' is the dictionary holding all the categorized data
+        data_payload = result_item.get('data')
+        if not data_payload: 
+            print("  Error: No data payload found for this URL despite successful fetch.")
+            continue
+
+        print(f"  Page Title: {result_item.get('page_title', 'Not found')}")
+        change_report = result_item.get('change_detection') or {}
+        if change_report.get('first_scan'):
+            print("  Changes: first scan of this domain")
+        elif change_report:
+            print(f"  Changes since {change_report.get('previous_scan_utc')}: {change_report.get('changed_sections') or 'none'}")
+
+        # Marketing Technology & Data Foundation
+        mt_df = data_payload.get('marketing_technology_data_foundation', {})
+        print(f"  Marketing Technology & Data Foundation:")
+        print(f"    MarTech Identified: {mt_df.get('martech_identified', 'None found')}")
         
-        # The original "print("Browser closed.")" is now part of the try block logic.
+        dl_summary_data = mt_df.get('dataLayer_summary', {}) 
+        print(f"    DataLayer Exists: {dl_summary_data.get('exists', False)}")
+        if dl_summary_data.get('exists'):
+            if dl_summary_data.get('error'):
+                 print(f"    DataLayer Summary Error: {dl_summary_data.get('error')}")
+            else:
+                print(f"    DataLayer Summary - Total Pushes: {dl_summary_data.get('total_pushes', 'N/A')}")
+                if dl_summary_data.get('sample_pushes_structure'):
+                    print("    DataLayer Summary - Sample Pushes Structure:")
+                    for sample_push in dl_summary_data.get('sample_pushes_structure', []):
+                        print(f"      {sample_push}")
+        elif dl_summary_data.get('error'): 
+             print(f"    DataLayer Summary Error: {dl_summary_data.get('error')}")
+        print(f"    Cookie Consent Tools: {mt_df.get('cookie_consent_tools_identified', 'None found')}")
+
+        # Organic Presence & Content Signals
+        ops_signals = data_payload.get('organic_presence_content_signals', {})
+        if ops_signals: 
+            print(f"  Organic Presence & Content Signals:")
+            print(f"    Meta Title: {ops_signals.get('meta_title', 'Not found')}")
+            meta_desc = ops_signals.get('meta_description')
+            print(f"    Meta Description: {meta_desc[:100] + '...' if meta_desc and len(meta_desc) > 100 else meta_desc if meta_desc else 'Not found'}")
+            print(f"    Meta Keywords: {ops_signals.get('meta_keywords', 'Not found')}")
+            print(f"    Canonical URL: {ops_signals.get('canonical_url', 'Not found')}")
+            print(f"    Robots Meta: {ops_signals.get('robots_meta', 'Not found')}")
+            print(f"    H1 Tags: {ops_signals.get('h1_tags', [])}")
+            print(f"    H2 Tags (count): {len(ops_signals.get('h2_tags', []))}")
+            print(f"    JSON-LD Scripts (count): {len(ops_signals.get('json_ld_scripts', []))}")
+            print(f"    Hreflang Tags (count): {len(ops_signals.get('hreflang_tags', []))}")
+
+        # User Experience & Website Performance (Client-Side Clues)
+        ux_perf = data_payload.get('user_experience_performance_clues', {})
+        if ux_perf:
+            print(f"  User Experience & Website Performance Clues:")
+            print(f"    Viewport Meta Content: {ux_perf.get('viewport_meta_content', 'Not found')}")
+            print(f"    Identified CDN Domains: {ux_perf.get('identified_cdn_domains', 'None found')}")
+            lazy_info = ux_perf.get('lazy_loading_images', {})
+            print(f"    Lazy Loading Images: {lazy_info.get('with_lazy_loading', 0)} found with 'loading=\"lazy\"' out of {lazy_info.get('sampled_images', 0)} sampled")
+            alt_info = ux_perf.get('alt_text_images', {})
+            print(f"    Image Alt Texts: {alt_info.get('with_alt_text', 0)} found with 'alt' attribute out of {alt_info.get('sampled_images', 0)} sampled")
+
+        # Conversion & Funnel Effectiveness - Simplified console output
+        conv_funnel = data_payload.get('conversion_funnel_effectiveness', {})
+        print(f"  Conversion & Funnel Effectiveness:")
+        print(f"    Identified Conversion Events: {conv_funnel.get('identified_conversion_events', 'None detected or empty')}")
+        print(f"    Forms Analyzed (count): {len(conv_funnel.get('forms_analysis', []))}")
+
+        # Competitive Posture & Strategic Tests - Simplified console output
+        comp_strat = data_payload.get('competitive_posture_strategic_tests', {})
+        print(f"  Competitive Posture & Strategic Tests:")
+        print(f"    A/B Testing Tools Identified: {comp_strat.get('ab_testing_tools_present', 'None detected')}")
+        print(f"    Feature Flag Systems Identified: {comp_strat.get('feature_flags_systems_identified', 'None detected')}")
+        print(f"    Advanced MarTech Indicators: {comp_strat.get('advanced_martech_indicators', 'None detected')}")
+
+
+# --- Output Files ---
+def output_paths(output_dir="output", url=None, job_id=None):
+    """
+    Output and changes file paths for a collection.
+
+    Single-URL runs are named after the domain, batch runs use the generic
+    name. A job_id scopes both files to output_dir/{job_id}/, so concurrent
+    jobs (even for the same domain) never share a file.
+    """
+    if job_id:
+        output_dir = os.path.join(output_dir, re.sub(r"[^a-zA-Z0-9._-]", "_", job_id))
+    if url:
+        # Remove www. prefix and replace colons with underscores for ports
+        domain = urlparse(normalize_url(url)).netloc.replace('www.', '').replace(':', '_')
+        name = f"deepstack_output-{domain}.json"
+    else:
+        name = "deepstack_output.json"
+    return os.path.join(output_dir, name), os.path.join(output_dir, name.replace("deepstack_output", "deepstack_changes"))
+
+
+def write_json_atomic(path, data):
+    """
+    Write JSON via a temp file in the same directory and rename it into place.
+
+    Readers see either the previous file or the complete new one, never a
+    partially written file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2) # indent=2 for pretty-printing
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# --- Main Function ---
+def main():
+    # --- Argument Parsing for Command-Line URL ---
+    parser = argparse.ArgumentParser(description="DeepStack Collector: Analyze website(s) for MarTech and other signals.")
+    parser.add_argument("-u", "--url", help="A single URL to analyze. If provided, urls_to_analyze.txt will be ignored.")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help=f"Parallel browser workers for batch mode (default: {DEFAULT_WORKERS}). Requests to the same domain are still rate limited.")
+    parser.add_argument("-o", "--output-dir", default="output", help="Directory for output files (default: output)")
+    parser.add_argument("-j", "--job-id", help="Write output files to OUTPUT_DIR/JOB_ID/ so concurrent runs never collide")
+    args = parser.parse_args()
+
+    urls_to_process = [] # This will hold the URLs the script will iterate over
+
+    if args.url:
+        single_url = normalize_url(args.url)
+        urls_to_process = [single_url]
+        print(f"INFO: Analyzing single URL provided via command line: {single_url}")
+    else:
+        # URL_INPUT_FILE is still a global constant
+        urls_to_process = load_urls_from_file(URL_INPUT_FILE)
+        # load_urls_from_file already prints messages about loaded URLs or errors
+
+    if not urls_to_process:
+        print("INFO: No URLs to analyze (neither from command line nor from file). Exiting.")
+        return # Exit if there are no URLs
+
+    print("DeepStack Collector starting...") # Moved this message here
+
+    final_json_output = collect(urls_to_process, {"workers": args.workers})
+    change_reports = final_json_output.pop("url_changes")
+
+    # ---------------------------------------------------------------------
+    # --- FINAL OUTPUT SECTION ---
+    # ---------------------------------------------------------------------
+
+    # Write the JSON output to a file
+    # Generate output filename based on execution mode:
+    # - Single URL: {output_dir}/[{job_id}/]deepstack_output-{domain}.json
+    # - Batch mode: {output_dir}/[{job_id}/]deepstack_output.json
+    output_filename, changes_filename = output_paths(args.output_dir, args.url, args.job_id)
+    try:
+        write_json_atomic(output_filename, final_json_output)
+        print(f"\nResults successfully saved to {output_filename}")
+    except (IOError, OSError) as e:
+        print(f"\nError writing results to JSON file {output_filename}: {e}")
+    except TypeError as e:
+        print(f"\nError serializing data to JSON: {e}. Check data structures.")
+
+    # Changes file: only the sections that differ from the previous scan
+    changed_urls = final_json_output["collection_metadata"]["total_urls_changed"]
+    try:
+        write_json_atomic(changes_filename, {
+            "collection_timestamp_utc": final_json_output["collection_metadata"]["collection_timestamp_utc"],
+            "total_urls_changed": changed_urls,
+            "url_changes": change_reports
+        })
+        print(f"Change report ({changed_urls} of {len(change_reports)} URL(s) changed) saved to {changes_filename}")
+    except (IOError, OSError, TypeError) as e:
+        print(f"\nError writing change report {changes_filename}: {e}")
+
+    print_summary(final_json_output["url_analysis_results"])
+
 # --- Script Execution ---
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,286 @@
+"""
+Form Analysis - Bounded main-frame and iframe form extraction for DeepStack Collector
+
+Collects form summaries from the main document and all same-origin iframes
+in a single page.evaluate() round trip. Cross-origin iframes (which the main
+frame cannot read) are filtered cheaply by URL first - only known form
+providers and same-site frames are evaluated - and each evaluation runs
+under a per-frame time budget inside an overall page budget. Frames that
+are filtered out or dropped for budget reasons are recorded, so total page
+time stays bounded even on ad-heavy pages with dozens of frames.
+
+Usage:
+    from form_analysis import analyze_page_forms
+    forms, iframe_report = analyze_page_forms(page, page_url)
+"""
+
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+
+# -----------------------------------------------------------------------------
+# --- CONFIGURATION ---
+# -----------------------------------------------------------------------------
+
+# Budget for evaluating a single cross-origin frame
+FRAME_BUDGET_MS = int(os.getenv("DEEPSTACK_FRAME_BUDGET_MS", "3000"))
+# Budget for all cross-origin frame evaluations on one page
+PAGE_FRAMES_BUDGET_MS = int(os.getenv("DEEPSTACK_PAGE_FRAMES_BUDGET_MS", "10000"))
+# Frames are not started with less than this much budget left
+MIN_FRAME_BUDGET_MS = 500
+
+# Third-party form and scheduling providers commonly embedded via iframe
+FORM_PROVIDER_PATTERNS = [
+    r"hsforms\.(com|net)",
+    r"hubspot\.com",
+    r"marketo\.(com|net)",
+    r"mktoweb\.com",
+    r"pardot\.com",
+    r"go\.pardot",
+    r"typeform\.com",
+    r"jotform\.com",
+    r"docs\.google\.com/forms",
+    r"forms\.office\.com",
+    r"formstack\.com",
+    r"wufoo\.com",
+    r"cognitoforms\.com",
+    r"formassembly\.com",
+    r"tally\.so",
+    r"paperform\.co",
+    r"airtable\.com/embed",
+    r"calendly\.com",
+    r"chilipiper\.com",
+    r"forms\.zohopublic\.com",
+]
+_FORM_PROVIDER_RE = re.compile("|".join(FORM_PROVIDER_PATTERNS), re.IGNORECASE)
+
+# Collects form summaries from one document. Shared by the batched
+# main-frame script and the per-frame evaluation of cross-origin iframes.
+JS_COLLECT_FORMS_FUNCTION = """
+(doc) => {
+  const forms = Array.from(doc.forms);
+  return forms.map(form => {
+    const formDetails = {
+      form_id: form.id || null,
+      form_name: form.name || null,
+      form_classes: Array.from(form.classList),
+      form_action: form.action || null, // This will be the fully resolved URL
+      form_method: form.method ? form.method.toUpperCase() : 'GET',
+      handler_attributes: {},
+      input_fields_summary: []
+    };
+
+    // Check for common data-* attributes used by form handlers
+    if (form.dataset.netlify === 'true') formDetails.handler_attributes.netlify_form = true;
+    // Note: dataset access converts kebab-case (data-hs-cf-bound) to camelCase (hsCfBound)
+    if (form.dataset.hsCfBound === 'true') formDetails.handler_attributes.hubspot_form_indicator = true;
+    if (form.dataset.marketoFormId) formDetails.handler_attributes.marketo_form_id = form.dataset.marketoFormId;
+
+    const inputs = Array.from(form.elements); // form.elements gets all form controls
+    const keyInputTypes = ["email", "text", "tel", "submit", "hidden", "password", "search", "url", "number", "checkbox", "radio", "date", "select-one", "select-multiple", "textarea"];
+    const keyInputNames = ["email", "name", "firstname", "first_name", "last_name", "lastname", "phone", "tel", "mobile", "company", "website", "job_title", "query", "q", "search", "address", "city", "state", "zip", "postal", "country", "utm_"];
+
+    inputs.forEach(input => {
+      const inputName = (input.name || '').toLowerCase();
+      const inputType = (input.type || input.tagName.toLowerCase()).toLowerCase();
+      const inputId = (input.id || '').toLowerCase();
+      let isKeyField = false;
+
+      if (keyInputTypes.includes(inputType)) {
+        isKeyField = true;
+      } else {
+        for (const keyNamePart of keyInputNames) {
+          if (inputName.includes(keyNamePart) || inputId.includes(keyNamePart)) {
+            isKeyField = true;
+            break;
+          }
+        }
+      }
+
+      // Always consider submit buttons as key fields
+      if (inputType === 'submit' || (input.tagName.toLowerCase() === 'button' && input.type === 'submit')) {
+        isKeyField = true;
+      }
+
+      if (isKeyField) {
+        const fieldSummary = {
+            name: input.name || null,
+            type: inputType,
+            id: input.id || null,
+            value: input.value || null, // Capture value for some input types
+            placeholder: input.placeholder || null // Capture placeholder
+        };
+        if (input.tagName.toLowerCase() === 'button' || inputType === 'submit') {
+          fieldSummary.text = input.textContent ? input.textContent.trim() : (input.value || '');
+        }
+        formDetails.input_fields_summary.push(fieldSummary);
+      }
+    });
+    return formDetails;
+  });
+}
+"""
+
+# One round trip: main document plus every iframe whose document the main
+# frame can read (same-origin). Cross-origin iframes throw or return null.
+JS_BATCH_FORMS_SCRIPT = f"""
+() => {{
+  const collectForms = {JS_COLLECT_FORMS_FUNCTION};
+  const result = {{ main: collectForms(document), frames: [] }};
+  for (const iframe of document.querySelectorAll('iframe')) {{
+    let doc = null;
+    try {{ doc = iframe.contentDocument; }} catch (e) {{ doc = null; }}
+    if (doc && doc.forms) {{
+      result.frames.push({{ url: doc.URL, name: iframe.name || null, forms: collectForms(doc) }});
+    }}
+  }}
+  return result;
+}}
+"""
+
+# Per-frame script for wait_for_function: an array is always truthy, so the
+# call returns on first evaluation but still honours the timeout.
+JS_FRAME_FORMS_SCRIPT = f"() => ({JS_COLLECT_FORMS_FUNCTION})(document)"
+
+
+def _site_of(url):
+    """Approximate registrable domain: last two host labels (example.com)."""
+    host = (urlparse(url).hostname or "").lower()
+    return ".".join(host.split(".")[-2:])
+
+
+def is_form_provider(url):
+    """True if the URL belongs to a known embedded-form provider."""
+    return bool(url) and bool(_FORM_PROVIDER_RE.search(url))
+
+
+def classify_frame(frame_url, page_url):
+    """
+    Decide whether a cross-origin frame is worth evaluating, by URL alone.
+
+    Returns:
+        (eligible, reason) where reason is "form_provider", "same_site",
+        "blank" or "not_form_provider"
+    """
+    if not frame_url or frame_url == "about:blank" or frame_url.startswith(("about:", "data:", "javascript:")):
+        return False, "blank"
+    if is_form_provider(frame_url):
+        return True, "form_provider"
+    if _site_of(frame_url) == _site_of(page_url):
+        return True, "same_site"
+    return False, "not_form_provider"
+
+
+def _frame_entry(frame, reason):
+    try:
+        return {"url": frame.url, "name": frame.name or None, "reason": reason}
+    except Exception:
+        return {"url": None, "name": None, "reason": reason}
+
+
+def analyze_page_forms(page, page_url, frame_budget_ms=None, page_budget_ms=None):
+    """
+    Extract forms from the main frame and relevant iframes within a time budget.
+
+    Args:
+        page: Playwright Page (sync API)
+        page_url: URL that was navigated to (used for same-site checks)
+        frame_budget_ms: Time budget per cross-origin frame
+        page_budget_ms: Total budget for all cross-origin frames on the page
+
+    Returns:
+        (forms_analysis, iframe_report) - forms_analysis is a list in the
+        existing DeepStack output format (iframe forms carry found_in_iframe,
+        iframe_url, iframe_name); iframe_report summarises what was evaluated
+        and what was skipped and why.
+    """
+    frame_budget_ms = frame_budget_ms if frame_budget_ms is not None else FRAME_BUDGET_MS
+    page_budget_ms = page_budget_ms if page_budget_ms is not None else PAGE_FRAMES_BUDGET_MS
+    started = time.monotonic()
+
+    forms_analysis = []
+    iframe_report = {
+        "frames_total": 0,
+        "frames_batched_same_origin": 0,
+        "frames_evaluated": 0,
+        "frames_skipped": [],
+        "forms_found_in_iframes": 0,
+        "elapsed_ms": 0,
+    }
+
+    def add_iframe_forms(forms, frame_url, frame_name):
+        for form_item in forms or []:
+            form_item["found_in_iframe"] = True
+            form_item["iframe_url"] = frame_url
+            form_item["iframe_name"] = frame_name
+            forms_analysis.append(form_item)
+            iframe_report["forms_found_in_iframes"] += 1
+
+    # --- Stage 1: main document + same-origin iframes in one round trip ---
+    batched_urls = set()
+    try:
+        batch = page.evaluate(JS_BATCH_FORMS_SCRIPT) or {}
+        forms_analysis.extend(batch.get("main") or [])
+        for frame_data in batch.get("frames") or []:
+            batched_urls.add(frame_data.get("url"))
+            iframe_report["frames_batched_same_origin"] += 1
+            add_iframe_forms(frame_data.get("forms"), frame_data.get("url"), frame_data.get("name"))
+    except Exception as e_form:
+        print(f"    Error during form analysis with page.evaluate(): {e_form}")
+        forms_analysis.append({"error": f"Form analysis failed: {str(e_form)}"})
+
+    # --- Stage 2: cheap URL filter over the remaining frames ---
+    child_frames = page.frames[1:]
+    iframe_report["frames_total"] = len(child_frames)
+    eligible = []
+    for frame in child_frames:
+        try:
+            if frame.is_detached():
+                iframe_report["frames_skipped"].append(_frame_entry(frame, "detached"))
+                continue
+            if frame.url in batched_urls:
+                continue
+            ok, reason = classify_frame(frame.url, page_url)
+        except Exception:
+            iframe_report["frames_skipped"].append(_frame_entry(frame, "detached"))
+            continue
+        if ok:
+            eligible.append(frame)
+        else:
+            iframe_report["frames_skipped"].append(_frame_entry(frame, reason))
+
+    # Known form providers first: they are the most likely to hold forms
+    eligible.sort(key=lambda f: 0 if is_form_provider(f.url) else 1)
+
+    # --- Stage 3: per-frame evaluation inside the page budget ---
+    deadline = time.monotonic() + page_budget_ms / 1000.0
+    for frame in eligible:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms < MIN_FRAME_BUDGET_MS:
+            iframe_report["frames_skipped"].append(_frame_entry(frame, "budget"))
+            continue
+        timeout_ms = min(frame_budget_ms, remaining_ms)
+        handle = None
+        try:
+            handle = frame.wait_for_function(JS_FRAME_FORMS_SCRIPT, timeout=timeout_ms, polling=100)
+            frame_forms = handle.json_value()
+            iframe_report["frames_evaluated"] += 1
+            if isinstance(frame_forms, list):
+                add_iframe_forms(frame_forms, frame.url, frame.name or None)
+        except Exception as e_iframe:
+            reason = "timeout" if "Timeout" in type(e_iframe).__name__ else "error"
+            entry = _frame_entry(frame, reason)
+            entry["error"] = f"{type(e_iframe).__name__} - {str(e_iframe)[:200]}"
+            iframe_report["frames_skipped"].append(entry)
+            print(f"    WARNING: Could not evaluate forms in iframe {entry['url']}: {entry['error']}")
+        finally:
+            if handle is not None:
+                try:
+                    handle.dispose()
+                except Exception:
+                    pass
+
+    iframe_report["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+    return forms_analysis, iframe_report
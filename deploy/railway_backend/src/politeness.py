@@ -0,0 +1,222 @@
+"""
+Politeness Scheduler - Per-domain rate limiting for DeepStack Collector
+
+Replaces the fixed random sleep before every URL with per-domain rules: a
+minimum interval (plus jitter) between requests to the same domain and a cap
+on in-flight requests per domain. Different domains are dispatched in
+parallel without any artificial delay, so batch wall time is bounded by
+network and CPU rather than sleeps.
+
+Workers pull URLs with next(), which only hands out a URL whose domain is
+currently allowed; a busy or cooling-down domain never blocks work for other
+domains. Callers outside the queue can use slot(domain) for the same rules.
+
+Usage:
+    from politeness import PolitenessScheduler
+    scheduler = PolitenessScheduler(min_interval=2.0, jitter=3.0)
+    for index, url in enumerate(urls):
+        scheduler.submit(url, index)
+    scheduler.close()
+
+    # In each worker thread
+    while (item := scheduler.next()) is not None:
+        domain, (url, index) = item
+        try:
+            ...
+        finally:
+            scheduler.done(domain)
+
+    print(scheduler.stats())
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from challenge_detector import domain_of
+
+
+# -----------------------------------------------------------------------------
+# --- CONFIGURATION ---
+# -----------------------------------------------------------------------------
+
+# Seconds between two requests to the same domain (before jitter)
+DEFAULT_MIN_INTERVAL = float(os.getenv("DEEPSTACK_DOMAIN_MIN_INTERVAL", "2.0"))
+# Extra random delay (0..jitter seconds) added to each domain interval
+DEFAULT_JITTER = float(os.getenv("DEEPSTACK_DOMAIN_JITTER", "3.0"))
+# Concurrent requests allowed against one domain
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("DEEPSTACK_DOMAIN_MAX_IN_FLIGHT", "1"))
+
+
+class PolitenessScheduler:
+    """Thread-safe per-domain scheduler with queue-depth and wait statistics."""
+
+    def __init__(self, min_interval=None, jitter=None, max_in_flight_per_domain=None):
+        self.min_interval = DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+        self.jitter = DEFAULT_JITTER if jitter is None else jitter
+        self.max_in_flight = DEFAULT_MAX_IN_FLIGHT if max_in_flight_per_domain is None else max_in_flight_per_domain
+
+        self._cond = threading.Condition()
+        self._pending = {}        # domain -> deque of (enqueued_at, item)
+        self._domain_order = []   # round-robin order of domains
+        self._rr_index = 0
+        self._in_flight = {}      # domain -> count
+        self._next_allowed = {}   # domain -> monotonic time
+        self._closed = False
+
+        self._dispatched = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._domain_stats = {}   # domain -> {"dispatched", "total_wait"}
+
+    # --- Queue interface ---------------------------------------------------
+
+    def submit(self, url, item=None):
+        """Queue a URL (with an optional payload) for its domain."""
+        domain = domain_of(url)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            if domain not in self._pending:
+                self._pending[domain] = deque()
+                self._domain_order.append(domain)
+            self._pending[domain].append((time.monotonic(), (url, item)))
+            self._cond.notify_all()
+        return domain
+
+    def close(self):
+        """Signal that no more URLs will be submitted."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def next(self, timeout=None):
+        """
+        Block until a URL whose domain may be requested now is available.
+
+        Returns:
+            (domain, (url, item)), or None when the scheduler is closed and
+            drained (or the timeout expires). The caller must call
+            done(domain) when the request finishes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                domain, wake_at = self._pick_ready(now)
+                if domain is not None:
+                    enqueued_at, payload = self._pending[domain].popleft()
+                    if not self._pending[domain]:
+                        self._drop_domain(domain)
+                    self._grant(domain, now, now - enqueued_at)
+                    return domain, payload
+
+                if self._closed and not self._pending:
+                    return None
+
+                wait_for = None if wake_at is None else max(0.0, wake_at - now)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    wait_for = remaining if wait_for is None else min(wait_for, remaining)
+                self._cond.wait(wait_for)
+
+    def done(self, domain):
+        """Release a domain slot obtained from next() or acquire()."""
+        with self._cond:
+            self._in_flight[domain] = max(0, self._in_flight.get(domain, 0) - 1)
+            self._cond.notify_all()
+
+    # --- Direct slot interface ---------------------------------------------
+
+    def acquire(self, domain):
+        """Block until a request to domain is allowed; returns seconds waited."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wake_at = self._ready_at(domain, now)
+                if wake_at is not None and wake_at <= now:
+                    waited = now - started
+                    self._grant(domain, now, waited)
+                    return waited
+                self._cond.wait(None if wake_at is None else wake_at - now)
+
+    @contextmanager
+    def slot(self, domain):
+        """Context manager wrapper around acquire()/done()."""
+        self.acquire(domain)
+        try:
+            yield
+        finally:
+            self.done(domain)
+
+    # --- Statistics ----------------------------------------------------------
+
+    def stats(self):
+        """Snapshot of queue depth, in-flight counts and wait statistics."""
+        with self._cond:
+            return {
+                "queue_depth": sum(len(q) for q in self._pending.values()),
+                "domains_pending": len(self._pending),
+                "in_flight": sum(self._in_flight.values()),
+                "dispatched": self._dispatched,
+                "total_wait_seconds": round(self._total_wait, 3),
+                "avg_wait_seconds": round(self._total_wait / self._dispatched, 3) if self._dispatched else 0.0,
+                "max_wait_seconds": round(self._max_wait, 3),
+                "per_domain": {
+                    domain: {
+                        "dispatched": s["dispatched"],
+                        "total_wait_seconds": round(s["total_wait"], 3),
+                        "pending": len(self._pending.get(domain, ())),
+                        "in_flight": self._in_flight.get(domain, 0),
+                    }
+                    for domain, s in self._domain_stats.items()
+                },
+            }
+
+    # --- Internals (caller holds self._cond) -------------------------------
+
+    def _ready_at(self, domain, now):
+        """When domain may next be requested, or None if its slots are full."""
+        if self._in_flight.get(domain, 0) >= self.max_in_flight:
+            return None
+        return max(now, self._next_allowed.get(domain, now))
+
+    def _pick_ready(self, now):
+        """Round-robin over pending domains; returns (ready_domain, earliest_wake)."""
+        earliest = None
+        count = len(self._domain_order)
+        for offset in range(count):
+            index = (self._rr_index + offset) % count
+            domain = self._domain_order[index]
+            ready_at = self._ready_at(domain, now)
+            if ready_at is None:
+                continue
+            if ready_at <= now:
+                self._rr_index = index + 1
+                return domain, None
+            earliest = ready_at if earliest is None else min(earliest, ready_at)
+        return None, earliest
+
+    def _drop_domain(self, domain):
+        index = self._domain_order.index(domain)
+        self._domain_order.pop(index)
+        del self._pending[domain]
+        if index < self._rr_index:
+            self._rr_index -= 1
+
+    def _grant(self, domain, now, waited):
+        self._in_flight[domain] = self._in_flight.get(domain, 0) + 1
+        interval = self.min_interval + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        self._next_allowed[domain] = now + interval
+        self._dispatched += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        stats = self._domain_stats.setdefault(domain, {"dispatched": 0, "total_wait": 0.0})
+        stats["dispatched"] += 1
+        stats["total_wait"] += waited
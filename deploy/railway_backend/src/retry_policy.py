@@ -0,0 +1,164 @@
+"""
+Retry Policy - Error classification and retry decisions for DeepStack Collector
+
+Sorts per-URL failures into categories (transient network, timeout,
+challenge, hard HTTP 4xx, HTTP 5xx, browser crash) and maps each category to
+a retry policy: how many retries, exponential backoff, and whether the
+browser context or the whole browser must be recycled before trying again.
+Flaky targets are retried instead of failing the URL on the first error.
+
+Usage:
+    from retry_policy import classify_error, retry_decision
+    category = classify_error(exc)
+    decision = retry_decision(category, attempt)
+    if decision["retry"]:
+        time.sleep(decision["delay"])
+"""
+
+import os
+import random
+
+
+# -----------------------------------------------------------------------------
+# --- ERROR CATEGORIES ---
+# -----------------------------------------------------------------------------
+
+TRANSIENT_NETWORK = "transient_network"
+TIMEOUT = "timeout"
+CHALLENGE = "challenge"
+HTTP_CLIENT = "http_client_error"
+HTTP_SERVER = "http_server_error"
+BROWSER_CRASH = "browser_crash"
+CANCELLED = "cancelled"
+UNKNOWN = "unknown"
+
+# Recycle scopes
+RECYCLE_CONTEXT = "context"
+RECYCLE_BROWSER = "browser"
+
+
+class CollectorError(Exception):
+    """Collector failure with a known category."""
+
+    category = UNKNOWN
+
+
+class ChallengeError(CollectorError):
+    """Bot-protection challenge that was blocked, skipped or never resolved."""
+
+    category = CHALLENGE
+
+
+class CollectionCancelled(CollectorError):
+    """The caller cancelled the collection (e.g. the API job was cancelled)."""
+
+    category = CANCELLED
+
+
+class HttpStatusError(CollectorError):
+    """Main document returned an HTTP error status."""
+
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.category = HTTP_SERVER if status >= 500 or status == 408 else HTTP_CLIENT
+
+
+# Message fragments (lowercase) per category, checked in order
+_CRASH_MARKERS = [
+    "target crashed",
+    "page crashed",
+    "browser has been closed",
+    "target page, context or browser has been closed",
+    "browser closed",
+    "connection closed",
+    "browser.newpage",
+]
+_NETWORK_MARKERS = [
+    "net::err_",
+    "ns_error_net",
+    "ns_error_connection",
+    "ns_error_proxy",
+    "ns_error_unknown_host",
+    "ns_error_offline",
+    "ns_error_abort",
+    "connection reset",
+    "connection refused",
+    "econnreset",
+    "econnrefused",
+    "socket hang up",
+    "ssl_error",
+]
+_TIMEOUT_MARKERS = [
+    "timeout",
+    "timed out",
+    "ns_error_net_timeout",
+]
+
+# -----------------------------------------------------------------------------
+# --- RETRY POLICY ---
+# -----------------------------------------------------------------------------
+
+# max_retries: retries after the first attempt
+# backoff_base: seconds before the first retry (doubles per retry)
+# recycle: what to rebuild before retrying (None, "context" or "browser")
+RETRY_POLICY = {
+    TRANSIENT_NETWORK: {"max_retries": 2, "backoff_base": 2.0, "recycle": None},
+    TIMEOUT: {"max_retries": 1, "backoff_base": 3.0, "recycle": RECYCLE_CONTEXT},
+    HTTP_SERVER: {"max_retries": 2, "backoff_base": 5.0, "recycle": None},
+    HTTP_CLIENT: {"max_retries": 0, "backoff_base": 0.0, "recycle": None},
+    # Challenges are handled by the per-domain challenge memory; retrying
+    # straight away would only burn another budget on the same interstitial
+    CHALLENGE: {"max_retries": 0, "backoff_base": 0.0, "recycle": None},
+    BROWSER_CRASH: {"max_retries": 1, "backoff_base": 1.0, "recycle": RECYCLE_BROWSER},
+    CANCELLED: {"max_retries": 0, "backoff_base": 0.0, "recycle": None},
+    UNKNOWN: {"max_retries": 1, "backoff_base": 2.0, "recycle": RECYCLE_CONTEXT},
+}
+
+# Upper bound on any single backoff delay
+MAX_BACKOFF_SECONDS = float(os.getenv("DEEPSTACK_MAX_BACKOFF_SECONDS", "30"))
+# Global cap on retries per URL (overrides larger per-category values)
+MAX_RETRIES = int(os.getenv("DEEPSTACK_MAX_RETRIES", "2"))
+
+
+def classify_error(error):
+    """
+    Map an exception raised while processing a URL to an error category.
+
+    CollectorError subclasses carry their category; Playwright and network
+    errors are classified from the exception type and message.
+    """
+    category = getattr(error, "category", None)
+    if category:
+        return category
+
+    message = f"{type(error).__name__}: {error}".lower()
+    # Crashes first: a crashed target often also reports a timeout
+    if any(marker in message for marker in _CRASH_MARKERS):
+        return BROWSER_CRASH
+    if any(marker in message for marker in _NETWORK_MARKERS):
+        return TRANSIENT_NETWORK
+    if type(error).__name__ == "TimeoutError" or any(marker in message for marker in _TIMEOUT_MARKERS):
+        return TIMEOUT
+    return UNKNOWN
+
+
+def retry_decision(category, attempt, policy=None):
+    """
+    Decide what to do after attempt number `attempt` (1-based) failed.
+
+    Returns:
+        Dict with "retry" (bool), "delay" (seconds before retrying) and
+        "recycle" (None, "context" or "browser"). The recycle scope applies
+        even when no retry follows, so a crashed browser is never reused
+        for the next URL.
+    """
+    policy = policy or RETRY_POLICY
+    rules = policy.get(category, policy[UNKNOWN])
+    max_retries = min(rules["max_retries"], MAX_RETRIES)
+    retry = attempt <= max_retries
+    delay = 0.0
+    if retry and rules["backoff_base"]:
+        delay = rules["backoff_base"] * (2 ** (attempt - 1))
+        delay = min(MAX_BACKOFF_SECONDS, delay + random.uniform(0, delay / 4))
+    return {"retry": retry, "delay": round(delay, 2), "recycle": rules["recycle"]}
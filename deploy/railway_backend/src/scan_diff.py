@@ -0,0 +1,269 @@
+"""
+Scan Diff - Incremental change detection between DeepStack scans
+
+Fingerprints each section of a DeepStack URL result (martech, cookie
+consent, organic signals, forms, feature flags) and stores the compact
+fingerprints per domain. On the next scan of the same domain only the
+sections whose fingerprint changed are emitted, with a change summary, so
+downstream MEARA steps and dashboards can skip recomputation when nothing
+material changed.
+
+Fingerprints ignore volatile values (hidden-field tokens, timings) so a
+re-scan of an unchanged site reports no changes.
+
+Usage:
+    # As library
+    from scan_diff import detect_changes
+    report = detect_changes(url_result, "output/fingerprints")
+
+    # As CLI (compare a DeepStack output file against the stored fingerprints)
+    python3 scan_diff.py --input output/deepstack_output-example.com.json
+    python3 scan_diff.py --input output/deepstack_output-example.com.json --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+
+# -----------------------------------------------------------------------------
+# --- CONFIGURATION ---
+# -----------------------------------------------------------------------------
+
+DEFAULT_STORE_DIR = os.getenv("DEEPSTACK_FINGERPRINT_DIR", os.path.join("output", "fingerprints"))
+
+# Bump when section extraction changes so old fingerprints are not compared
+FINGERPRINT_VERSION = 1
+
+
+def _martech(data):
+    foundation = data.get("marketing_technology_data_foundation") or {}
+    data_layer = foundation.get("dataLayer_summary") or {}
+    return {
+        "martech_identified": sorted(foundation.get("martech_identified") or []),
+        "dataLayer_exists": bool(data_layer.get("exists")),
+    }
+
+
+def _cookie_consent(data):
+    foundation = data.get("marketing_technology_data_foundation") or {}
+    return sorted(foundation.get("cookie_consent_tools_identified") or [])
+
+
+def _organic_signals(data):
+    return data.get("organic_presence_content_signals") or {}
+
+
+def _forms(data):
+    """Form structure only: hidden-field values (CSRF tokens, timestamps) change every load."""
+    conversion = data.get("conversion_funnel_effectiveness") or {}
+    forms = []
+    for form in conversion.get("forms_analysis") or []:
+        if "error" in form:
+            continue
+        fields = [
+            {key: value for key, value in field.items() if key != "value"}
+            for field in form.get("input_fields_summary") or []
+        ]
+        forms.append({
+            "form_id": form.get("form_id"),
+            "form_action": form.get("form_action"),
+            "form_method": form.get("form_method"),
+            "handler_attributes": form.get("handler_attributes") or {},
+            "iframe_url": form.get("iframe_url"),
+            "fields": fields,
+        })
+    return sorted(forms, key=lambda f: json.dumps(f, sort_keys=True))
+
+
+def _feature_flags(data):
+    competitive = data.get("competitive_posture_strategic_tests") or {}
+    return sorted(competitive.get("feature_flags_systems_identified") or [])
+
+
+# Section name -> function extracting its canonical value from result["data"]
+SECTION_EXTRACTORS = {
+    "martech": _martech,
+    "cookie_consent": _cookie_consent,
+    "organic_signals": _organic_signals,
+    "forms": _forms,
+    "feature_flags": _feature_flags,
+}
+
+# Sections whose values are short lists, stored verbatim for added/removed summaries
+LIST_SECTIONS = {"cookie_consent", "feature_flags"}
+
+
+def _fingerprint(value):
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def scan_key(url):
+    """Store key for a URL: bare domain, plus the path for non-root pages."""
+    parsed = urlparse(url)
+    key = (parsed.hostname or "").lower().removeprefix("www.")
+    path = parsed.path.strip("/")
+    if path:
+        key = f"{key}/{path}"
+    return key
+
+
+def _store_path(store_dir, key):
+    return os.path.join(store_dir, re.sub(r"[^a-zA-Z0-9._-]", "_", key) + ".json")
+
+
+def fingerprint_sections(data):
+    """Return {section: fingerprint} for a DeepStack result's "data" payload."""
+    return {name: _fingerprint(extract(data)) for name, extract in SECTION_EXTRACTORS.items()}
+
+
+def compact_record(url, data, scanned_at=None):
+    """Compact per-domain record stored between scans."""
+    martech = _martech(data)
+    return {
+        "fingerprint_version": FINGERPRINT_VERSION,
+        "url": url,
+        "scanned_at_utc": scanned_at or datetime.now(timezone.utc).isoformat(),
+        "sections": fingerprint_sections(data),
+        "values": {
+            "martech": martech["martech_identified"],
+            **{name: SECTION_EXTRACTORS[name](data) for name in LIST_SECTIONS},
+        },
+        "counts": {
+            "forms": len(_forms(data)),
+            "h1_tags": len(_organic_signals(data).get("h1_tags") or []),
+        },
+    }
+
+
+def load_record(store_dir, key):
+    path = _store_path(store_dir, key)
+    try:
+        with open(path) as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("fingerprint_version") != FINGERPRINT_VERSION:
+        return None
+    return record
+
+
+def save_record(store_dir, key, record):
+    """Write a record atomically (write to temp file, then rename)."""
+    os.makedirs(store_dir, exist_ok=True)
+    path = _store_path(store_dir, key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _list_change(old, new):
+    old, new = set(old or []), set(new or [])
+    return {"added": sorted(new - old), "removed": sorted(old - new)}
+
+
+def compare_records(previous, current):
+    """
+    Compare two compact records.
+
+    Returns:
+        (changed_sections, summary) - summary holds added/removed items for
+        list sections and count deltas where available
+    """
+    changed = [
+        name for name in SECTION_EXTRACTORS
+        if previous["sections"].get(name) != current["sections"].get(name)
+    ]
+    summary = {}
+    for name in changed:
+        if name == "martech" or name in LIST_SECTIONS:
+            summary[name] = _list_change(previous["values"].get(name), current["values"].get(name))
+        elif name == "forms":
+            summary[name] = {"previous_count": previous["counts"].get("forms"), "current_count": current["counts"].get("forms")}
+        else:
+            summary[name] = {"changed": True}
+    return changed, summary
+
+
+def detect_changes(url_result, store_dir=None, update_store=True):
+    """
+    Compare a successful DeepStack URL result with the previous scan of its domain.
+
+    Args:
+        url_result: One entry of "url_analysis_results"
+        store_dir: Directory holding per-domain fingerprint records
+        update_store: Save this scan's fingerprints as the new baseline
+
+    Returns:
+        Change report with "changed", "changed_sections", "summary" and
+        "changed_data" (the full data of changed sections only), or None for
+        failed fetches
+    """
+    if url_result.get("fetch_status") != "success" or not url_result.get("data"):
+        return None
+    store_dir = store_dir or DEFAULT_STORE_DIR
+    key = scan_key(url_result["url"])
+    data = url_result["data"]
+
+    current = compact_record(url_result["url"], data, url_result.get("fetch_timestamp_utc"))
+    previous = load_record(store_dir, key)
+
+    if previous is None:
+        changed_sections = list(SECTION_EXTRACTORS)
+        summary = {"first_scan": True}
+    else:
+        changed_sections, summary = compare_records(previous, current)
+
+    if update_store:
+        try:
+            save_record(store_dir, key, current)
+        except OSError as e:
+            print(f"WARNING: Could not save fingerprints for {key}: {e}")
+
+    return {
+        "scan_key": key,
+        "first_scan": previous is None,
+        "previous_scan_utc": previous["scanned_at_utc"] if previous else None,
+        "changed": bool(changed_sections),
+        "changed_sections": changed_sections,
+        "unchanged_sections": [name for name in SECTION_EXTRACTORS if name not in changed_sections],
+        "summary": summary,
+        "fingerprints": current["sections"],
+        "changed_data": {name: SECTION_EXTRACTORS[name](data) for name in changed_sections},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a DeepStack output file with the stored per-domain fingerprints.")
+    parser.add_argument("--input", required=True, help="DeepStack output JSON file")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR, help=f"Fingerprint store directory (default: {DEFAULT_STORE_DIR})")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without updating the stored fingerprints")
+    args = parser.parse_args()
+
+    try:
+        with open(args.input) as f:
+            output = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not read {args.input}: {e}", file=sys.stderr)
+        return 1
+
+    reports = []
+    for url_result in output.get("url_analysis_results", []):
+        report = detect_changes(url_result, args.store, update_store=not args.dry_run)
+        if report:
+            report.pop("changed_data")
+            reports.append(report)
+    print(json.dumps(reports, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+step_contracts.py
+
+Output contracts for the MEARA orchestrator steps that return JSON.
+
+Each step declares a JSON Schema for the keys later steps and the dashboard
+transformer rely on (e.g. strategic_verification["high_priority_count"],
+recommendations["recommendations"]). Validators are compiled once at import,
+so checking a step's output right after parsing costs microseconds, and a
+malformed output is caught before later steps spend minutes on it.
+
+Usage:
+    from step_contracts import validate_step_output, StepContractError
+    errors = validate_step_output("strategic_verifier", data)   # [] when valid
+
+    # CLI: validate a saved _state.json against all contracts
+    python3 step_contracts.py analysis_results/acme_20260101_120000_state.json
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+from jsonschema import Draft7Validator
+
+
+_NON_EMPTY_OBJECT = {"type": "object", "minProperties": 1}
+_LEVEL = {"type": "string", "enum": ["CRITICAL", "HIGH", "MEDIUM", "LOW"]}
+
+# Enum fields upper-cased before validation (models write "High" as often as "HIGH")
+LEVEL_FIELDS = {"recommendation_builder": ("recommendations", ("impact", "effort"))}
+
+STEP_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "research_agent": {
+        **_NON_EMPTY_OBJECT,
+        "properties": {"deep_research_brief": {"type": ["object", "string"]}},
+    },
+    "evidence_collector": _NON_EMPTY_OBJECT,
+    "dimension_evaluator": {
+        **_NON_EMPTY_OBJECT,
+        "properties": {"dimensions": {"type": ["object", "array"], "minProperties": 1, "minItems": 1}},
+    },
+    "strategic_verifier": {
+        "type": "object",
+        "required": ["high_priority_count"],
+        "properties": {"high_priority_count": {"type": "integer", "minimum": 0}},
+    },
+    "bottleneck_analyst": {
+        **_NON_EMPTY_OBJECT,
+        "properties": {
+            "bottlenecks": {"type": "array", "minItems": 1},
+            "root_causes": {"type": "array", "minItems": 1},
+        },
+    },
+    "recommendation_builder": {
+        "type": "object",
+        "required": ["recommendations"],
+        "properties": {
+            "recommendations": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "object",
+                    "required": ["title"],
+                    "properties": {
+                        "title": {"type": "string", "minLength": 1},
+                        "impact": _LEVEL,
+                        "effort": _LEVEL,
+                    },
+                },
+            },
+        },
+    },
+}
+
+# state.to_dict() key holding each step's output (for the CLI)
+STATE_KEYS = {
+    "evidence_collector": "evidence_collection",
+    "dimension_evaluator": "dimension_evaluations",
+    "strategic_verifier": "strategic_verification",
+    "bottleneck_analyst": "scalability_bottlenecks",
+    "recommendation_builder": "recommendations",
+}
+
+for _schema in STEP_SCHEMAS.values():
+    Draft7Validator.check_schema(_schema)
+VALIDATORS = {step: Draft7Validator(schema) for step, schema in STEP_SCHEMAS.items()}
+
+MAX_REPORTED_ERRORS = 5
+
+
+class StepContractError(ValueError):
+    """A step's output still violated its contract after retrying."""
+
+    def __init__(self, step_key: str, errors: List[str]):
+        self.step_key = step_key
+        self.errors = errors
+        super().__init__(f"{step_key} output violates its contract: {'; '.join(errors)}")
+
+
+def normalize_levels(step_key: str, data: Any) -> None:
+    """Upper-case a step's level fields (impact, effort) in place."""
+    if step_key not in LEVEL_FIELDS or not isinstance(data, dict):
+        return
+    list_key, fields = LEVEL_FIELDS[step_key]
+    items = data.get(list_key)
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        for field in fields:
+            if isinstance(item.get(field), str):
+                item[field] = item[field].strip().upper()
+
+
+def validate_step_output(step_key: str, data: Any) -> List[str]:
+    """
+    Contract violations of a step's output ([] if valid or no contract).
+
+    Level fields are normalized to upper case first (see normalize_levels),
+    so data is modified in place. Messages name the offending path, e.g.
+    "recommendations/0: 'title' is a required property".
+    """
+    validator = VALIDATORS.get(step_key)
+    if validator is None:
+        return []
+    normalize_levels(step_key, data)
+    errors = sorted(validator.iter_errors(data), key=lambda error: list(error.path))
+    return [
+        f"{'/'.join(str(part) for part in error.path) or '(root)'}: {error.message}"
+        for error in errors[:MAX_REPORTED_ERRORS]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a saved MEARA state file against the step contracts.")
+    parser.add_argument("state_file", help="Path to a *_state.json file")
+    args = parser.parse_args()
+    with open(args.state_file) as f:
+        state = json.load(f)
+    failed = False
+    for step_key, state_key in STATE_KEYS.items():
+        errors = validate_step_output(step_key, state.get(state_key))
+        print(f"{step_key}: {'OK' if not errors else '; '.join(errors)}")
+        failed = failed or bool(errors)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+structured_output.py
+
+JSON extraction from assistant responses.
+
+Responses are tried, in order, as plain JSON, as the content of fenced
+```json blocks, and finally as balanced {...} / [...] spans found in a single
+linear scan that respects string literals and escapes. Unlike a greedy
+regex this stays linear on report-sized responses and is not confused by
+braces in trailing prose.
+
+Usage:
+    from structured_output import extract_json, StructuredOutputError
+    data = extract_json(response_text)
+
+    # CLI: extract JSON from a saved response
+    python3 structured_output.py response.txt
+"""
+
+import argparse
+import json
+from typing import Any, Iterator, List, Tuple
+
+
+# Instruction sent when a response could not be parsed
+REPAIR_PROMPT = (
+    "Your previous response could not be parsed as JSON ({error}). "
+    "Reply with only the corrected JSON object from that response: no prose, no markdown fences."
+)
+
+
+class StructuredOutputError(ValueError):
+    """No JSON value could be extracted from a response."""
+
+
+def balanced_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) of every outermost balanced {...} or [...] span.
+
+    One pass over the text; brackets inside JSON string literals are ignored.
+    A bracket that is never closed does not hide the balanced spans after
+    it when it is a stray bracket in prose; when it looks like the start of
+    JSON (truncated output), the spans inside it are fragments and are
+    dropped.
+    """
+    spans: List[Tuple[int, int]] = []
+    stack: List[Tuple[str, int]] = []
+    in_string = False
+    escaped = False
+    closers = {"{": "}", "[": "]"}
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"' and stack:
+            in_string = True
+        elif char in closers:
+            stack.append((closers[char], index))
+        elif stack and char == stack[-1][0]:
+            _, start = stack.pop()
+            # Spans close inner-first; drop the ones this span contains
+            while spans and spans[-1][0] >= start:
+                spans.pop()
+            spans.append((start, index + 1))
+        elif char in "}]":
+            # Mismatched closer: forget the open brackets and keep scanning
+            stack.clear()
+
+    for _, start in stack:
+        following = text[start + 1:start + 64].lstrip()
+        if following[:1] in ('"', "{", "[", "]", "}"):
+            spans = [span for span in spans if span[0] < start]
+            break
+    return spans
+
+
+def _fenced_blocks(text: str) -> Iterator[str]:
+    position = 0
+    while True:
+        opening = text.find("```", position)
+        if opening == -1:
+            return
+        body_start = text.find("\n", opening)
+        if body_start == -1:
+            return
+        closing = text.find("```", body_start)
+        if closing == -1:
+            return
+        yield text[body_start + 1:closing]
+        position = closing + 3
+
+
+def extract_json(text: str) -> Any:
+    """
+    The JSON value in an assistant response.
+
+    Objects are preferred over arrays when a response contains both.
+
+    Raises:
+        StructuredOutputError: Nothing in the response parses as JSON.
+    """
+    if text is None:
+        raise StructuredOutputError("Empty response")
+    stripped = text.strip()
+    try:
+        return json.loads(stripped)
+    except json.JSONDecodeError:
+        pass
+
+    for block in _fenced_blocks(stripped):
+        try:
+            return json.loads(block)
+        except json.JSONDecodeError:
+            continue
+
+    arrays = []
+    for start, end in balanced_spans(stripped):
+        try:
+            value = json.loads(stripped[start:end])
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+        arrays.append(value)
+    if arrays:
+        return arrays[0]
+
+    preview = stripped[:80].replace("\n", " ")
+    raise StructuredOutputError(f"Could not parse JSON from response ({len(stripped)} chars, starts: {preview!r})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the JSON value from a saved assistant response.")
+    parser.add_argument("file", help="Response text file")
+    args = parser.parse_args()
+    with open(args.file) as f:
+        text = f.read()
+    try:
+        print(json.dumps(extract_json(text), indent=2))
+    except StructuredOutputError as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Tests for portfolio batch analysis
+
+Company list validation, the two-stage CLI pipeline (per-company completion
+and failure isolation), the aggregate summary, and the /api/batch
+coordinator with its event stream.
+
+Run with: pytest test_batch_runner.py -v
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from batch_runner import BatchRunner, StartLimiter, load_companies, summarize_batch, validate_companies
+
+
+def companies(n):
+    return [{"company_name": f"Co {i}", "company_url": f"https://co{i}.example.com"} for i in range(n)]
+
+
+class TestCompanyInput:
+    """validate_companies / load_companies"""
+
+    def test_normalizes_and_dedups(self):
+        result = validate_companies([
+            {"company_name": " Acme ", "company_url": "https://acme.com "},
+            {"name": "Acme again", "url": "HTTPS://ACME.COM"},
+            {"company_url": "https://globex.com"},
+        ])
+        assert [c["company_name"] for c in result] == ["Acme", "https://globex.com"]
+        assert result[0]["company_url"] == "https://acme.com"
+
+    def test_rejects_bad_lists(self):
+        with pytest.raises(ValueError, match="no company_url"):
+            validate_companies([{"company_name": "Acme"}])
+        with pytest.raises(ValueError, match="No companies"):
+            validate_companies([])
+        with pytest.raises(ValueError, match="limit is 2"):
+            validate_companies(companies(3), max_companies=2)
+
+    def test_loads_csv_and_json(self, tmp_path):
+        csv_file = tmp_path / "companies.csv"
+        csv_file.write_text("company_name,company_url,drb_file\nAcme,https://acme.com,acme.md\nGlobex,https://globex.com,\n")
+        loaded = load_companies(str(csv_file))
+        assert [(c["company_name"], c["drb_file"]) for c in loaded] == [("Acme", "acme.md"), ("Globex", None)]
+
+        json_file = tmp_path / "companies.json"
+        json_file.write_text(json.dumps({"companies": companies(2)}))
+        assert len(load_companies(str(json_file))) == 2
+
+
+class TestPipeline:
+    """BatchRunner"""
+
+    def test_each_company_chains_into_meara(self):
+        finished = []
+        runner = BatchRunner(
+            companies(4), deepstack_workers=2, meara_workers=2, limiter=StartLimiter(0),
+            on_complete=lambda item: finished.append(item["company_name"]),
+            deepstack_fn=lambda c: {"collection_metadata": {"url": c["company_url"]}},
+            meara_fn=lambda c: {"report_file": f"{c['company_name']}.md"},
+        )
+        summary = runner.run()
+        assert sorted(finished) == [f"Co {i}" for i in range(4)]
+        assert summary["completed"] == 4 and summary["finished"]
+        assert summary["companies"][0]["report_file"] == "Co 0.md"
+
+    def test_failures_are_isolated(self):
+        def deepstack(company):
+            if company["company_name"] == "Co 1":
+                raise RuntimeError("blocked")
+            return {}
+
+        def meara(company):
+            if company["company_name"] == "Co 2":
+                raise RuntimeError("no assistant")
+            return {}
+
+        summary = BatchRunner(companies(3), limiter=StartLimiter(0), deepstack_fn=deepstack, meara_fn=meara).run()
+        assert summary["status_counts"] == {"completed": 1, "failed": 2}
+        errors = {f["company_name"]: f["error"] for f in summary["failures"]}
+        assert errors == {"Co 1": "DeepStack: blocked", "Co 2": "MEARA: no assistant"}
+
+    def test_raising_callback_does_not_hang_run(self):
+        def on_complete(item):
+            raise RuntimeError("report failed")
+
+        runner = BatchRunner(companies(2), run_meara=False, limiter=StartLimiter(0), on_complete=on_complete,
+                             deepstack_fn=lambda c: {})
+        done = threading.Event()
+        threading.Thread(target=lambda: (runner.run(), done.set()), daemon=True).start()
+        assert done.wait(5)
+
+    def test_stage_pool_caps_concurrency(self):
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def deepstack(company):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return {}
+
+        runner = BatchRunner(companies(6), deepstack_workers=2, run_meara=False,
+                             limiter=StartLimiter(0), deepstack_fn=deepstack)
+        assert runner.run()["completed"] == 6
+        assert peak[0] == 2
+
+    def test_start_limiter_spaces_starts(self):
+        limiter = StartLimiter(0.05)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.wait()
+        assert time.monotonic() - start >= 0.1
+
+
+class TestSummary:
+    """summarize_batch"""
+
+    def test_counts_and_durations(self):
+        items = [
+            {"company_name": "A", "company_url": "a", "status": "completed", "error": None,
+             "started_at": 100.0, "completed_at": 110.0},
+            {"company_name": "B", "company_url": "b", "status": "completed", "error": None,
+             "started_at": 100.0, "completed_at": 130.0},
+            {"company_name": "C", "company_url": "c", "status": "meara", "error": None,
+             "started_at": 100.0, "completed_at": None},
+        ]
+        summary = summarize_batch(items)
+        assert summary["status_counts"] == {"completed": 2, "meara": 1}
+        assert summary["avg_company_seconds"] == 20.0 and summary["max_company_seconds"] == 30.0
+        assert not summary["finished"]
+
+
+class TestBatchAPI:
+    """/api/batch coordinator and event stream"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        monkeypatch.setattr(main, "BATCH_POLL_SECONDS", 0.01)
+        monkeypatch.setattr(main, "BATCH_START_INTERVAL_SECONDS", 0)
+
+        def fake_deepstack(item, priority):
+            job_id = f"batch-test-{item['company_name']}"
+            failed = item["company_name"] == "Co 1"
+            main.jobs[job_id] = {
+                "status": "failed" if failed else "completed",
+                "error": "blocked" if failed else None,
+                "company_name": item["company_name"],
+                "company_url": item["company_url"],
+            }
+            return job_id
+
+        monkeypatch.setattr(main, "start_batch_deepstack", fake_deepstack)
+        with testclient.TestClient(main.app) as client:
+            yield main, client
+        for i in range(3):
+            main.jobs.pop(f"batch-test-Co {i}", None)
+
+    def test_batch_runs_and_streams_events(self, client):
+        main, client = client
+        response = client.post("/api/batch", json={"companies": companies(3), "run_meara": False})
+        assert response.status_code == 200
+        batch_id = response.json()["batch_id"]
+
+        stream = client.get(f"/api/batch/{batch_id}/events")
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        events = [block for block in stream.text.split("\n\n") if block]
+        assert sum(block.count("event: company") for block in events) == 3
+        assert events[-1].startswith("event: summary")
+        summary = json.loads(events[-1].split("data: ", 1)[1])
+        assert summary["status"] == "completed"
+        assert summary["status_counts"] == {"completed": 2, "failed": 1}
+
+        status = client.get(f"/api/batch/{batch_id}").json()
+        assert status["summary"]["failures"][0]["error"] == "DeepStack: blocked"
+
+    def test_invalid_batch_rejected(self, client):
+        _, client = client
+        assert client.post("/api/batch", json={"companies": []}).status_code == 400
+        assert client.get("/api/batch/missing").status_code == 404
+
+    def test_events_stream_before_batch_finishes(self, client):
+        """Each event reaches a gzip-accepting client while the batch is still running"""
+        main, _ = client
+        batch_id = "batch-stream-test"
+        item = {**companies(1)[0], "status": "completed", "error": None,
+                "deepstack_job_id": None, "analysis_job_id": None}
+        main.batches[batch_id] = {"status": "running", "created_at": 0.0, "run_meara": False,
+                                  "items": [item], "events": []}
+        main.batch_event(main.batches[batch_id], item)
+
+        async def first_event():
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": f"/api/batch/{batch_id}/events", "raw_path": b"", "query_string": b"",
+                "root_path": "", "headers": [(b"host", b"test"), (b"accept-encoding", b"gzip")],
+                "client": ("test", 1), "server": ("test", 80),
+            }
+            messages = asyncio.Queue()
+
+            async def receive():
+                await asyncio.sleep(3600)
+
+            task = asyncio.ensure_future(main.app(scope, receive, messages.put))
+            try:
+                start = await asyncio.wait_for(messages.get(), 5)
+                body = await asyncio.wait_for(messages.get(), 5)
+            finally:
+                task.cancel()
+            return start, body
+
+        try:
+            start, body = asyncio.run(first_event())
+        finally:
+            main.batches.pop(batch_id, None)
+        headers = dict(start["headers"])
+        assert headers[b"content-encoding"] == b"identity"
+        assert body["body"].startswith(b"id: 1\nevent: company\n")
+        assert body["more_body"]
@@ -0,0 +1,128 @@
+"""
+Unit tests for the DeepStack browser session lifecycle
+
+Run with: pytest test_browser_session.py -v
+"""
+
+import itertools
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import browser_session
+from browser_session import BrowserSession, process_tree_rss_mb
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.connected = True
+
+    def new_context(self, **options):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.connected = False
+
+
+class FakeFirefox:
+    def __init__(self):
+        self.launched = []
+
+    def launch(self, **options):
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.firefox = FakeFirefox()
+
+
+class TestBrowserSession:
+    def test_context_recycled_after_page_limit(self):
+        pw = FakePlaywright()
+        session = BrowserSession(pw, 1, max_pages_per_context=3, rss_limit_mb=0, measure_rss=lambda: 100.0)
+        first_context = session.context
+        for _ in range(3):
+            session.after_page()
+
+        assert first_context.closed
+        assert session.context is not first_context
+        assert session.context_recycles == 1
+        assert session.pages_in_context == 0
+        assert session.stats()["recycle_reasons"] == {"page_limit": 1}
+        assert len(pw.firefox.launched) == 1
+
+    def test_browser_relaunched_above_rss_limit(self):
+        readings = iter([200.0, 900.0, 300.0])
+        pw = FakePlaywright()
+        session = BrowserSession(pw, 1, max_pages_per_context=0, rss_limit_mb=800, measure_rss=lambda: next(readings))
+        session.after_page()
+
+        assert len(pw.firefox.launched) == 2
+        assert not pw.firefox.launched[0].connected
+        assert session.stats()["recycle_reasons"] == {"rss_limit": 1}
+        assert session.rss_high_water_mb == 900.0
+
+    def test_stats_report_high_water_mark(self):
+        readings = iter([150.0, 400.0, 250.0, 260.0])
+        session = BrowserSession(FakePlaywright(), 7, max_pages_per_context=0, rss_limit_mb=0, measure_rss=lambda: next(readings))
+        session.after_page()
+        session.after_page()
+        session.close()
+
+        stats = session.stats()
+        assert stats["worker_id"] == 7
+        assert stats["pages"] == 2
+        assert stats["rss_high_water_mb"] == 400.0
+
+    def test_only_the_session_over_budget_relaunches(self, monkeypatch):
+        """Each session measures its own Firefox, not the other workers' or the server's"""
+        me = os.getpid()
+        tree = {me: (1, 400_000), 10: (me, 50_000)}  # this process and a Playwright driver
+        pids = itertools.count(100)
+
+        class TreeFirefox(FakeFirefox):
+            def launch(self, **options):
+                main_pid = next(pids)
+                tree[main_pid] = (10, 100_000)
+                tree[next(pids)] = (main_pid, 100_000)  # content process
+                return super().launch(**options)
+
+        monkeypatch.setattr(browser_session, "_read_proc_tree", lambda: dict(tree))
+        small, large = FakePlaywright(), FakePlaywright()
+        small.firefox, large.firefox = TreeFirefox(), TreeFirefox()
+        quiet = BrowserSession(small, 1, max_pages_per_context=0, rss_limit_mb=600)
+        busy = BrowserSession(large, 2, max_pages_per_context=0, rss_limit_mb=600)
+        assert quiet.browser_pids == [100] and busy.browser_pids == [102]
+        assert quiet.browser_rss_mb() == round(200_000 / 1024, 1)
+
+        tree[150] = (102, 500_000)  # a new content process takes busy past 600 MB
+        quiet.after_page()
+        busy.after_page()
+
+        assert len(small.firefox.launched) == 1
+        assert len(large.firefox.launched) == 2
+        assert busy.stats()["recycle_reasons"] == {"rss_limit": 1}
+        assert busy.browser_pids == [104]
+
+
+def test_process_tree_rss_is_positive():
+    assert process_tree_rss_mb(os.getpid()) > 0
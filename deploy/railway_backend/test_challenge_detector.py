@@ -0,0 +1,105 @@
+"""
+Unit tests for the DeepStack challenge detector
+
+Covers early response classification and the per-domain challenge memory
+that lets known-blocked domains fail fast.
+
+Run with: pytest test_challenge_detector.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from challenge_detector import (
+    classify_response, ChallengeMemory, domain_of,
+    CLEAR, CHALLENGE, BLOCKED, BLOCK_THRESHOLD, MIN_CHALLENGE_BUDGET_MS
+)
+
+
+class TestClassifyResponse:
+    """Classification from status, headers and title"""
+
+    def test_plain_page_is_clear(self):
+        result = classify_response(200, {"server": "nginx"}, "Acme - Home")
+        assert result["classification"] == CLEAR
+        assert result["vendor"] is None
+
+    def test_cf_mitigated_header_is_challenge(self):
+        headers = {"CF-Mitigated": "challenge", "Server": "cloudflare"}
+        result = classify_response(403, headers, "Acme")
+        assert result["classification"] == CHALLENGE
+        assert result["vendor"] == "Cloudflare"
+
+    def test_cloudflare_503_interstitial_is_challenge(self):
+        result = classify_response(503, {"server": "cloudflare", "cf-ray": "8a1"}, "Just a moment...")
+        assert result["classification"] == CHALLENGE
+
+    def test_cloudflare_503_outage_is_not_challenge(self):
+        result = classify_response(503, {"server": "cloudflare", "cf-ray": "8a1"}, "503 Service Unavailable")
+        assert result["classification"] == CLEAR
+        assert result["vendor"] == "Cloudflare"
+
+    def test_cloudflare_403_without_interstitial_is_blocked(self):
+        result = classify_response(403, {"server": "cloudflare"}, "Access denied")
+        assert result["classification"] == BLOCKED
+
+    def test_rate_limit_is_blocked(self):
+        assert classify_response(429, {}, None)["classification"] == BLOCKED
+
+    def test_challenge_title_without_headers(self):
+        result = classify_response(200, None, "Just a moment...")
+        assert result["classification"] == CHALLENGE
+
+
+class TestChallengeMemory:
+    """Per-domain memory, budgets and fail-fast"""
+
+    def test_domain_of_strips_www_and_port(self):
+        assert domain_of("https://www.Example.com:8443/path") == "example.com"
+
+    def test_unknown_domain_is_not_skipped(self):
+        memory = ChallengeMemory()
+        assert memory.should_skip("example.com") is None
+        memory.record("example.com", "clear")
+        assert memory.get("example.com") is None
+
+    def test_repeated_failures_trigger_fail_fast(self):
+        memory = ChallengeMemory()
+        for _ in range(BLOCK_THRESHOLD):
+            memory.record("blocked.com", "unresolved", now=1000)
+        assert memory.should_skip("blocked.com", now=1001) is not None
+        # Cooldown elapses eventually
+        assert memory.should_skip("blocked.com", now=1000 + 10 * 24 * 3600) is None
+
+    def test_budget_halves_per_failure_with_floor(self):
+        memory = ChallengeMemory()
+        full = memory.challenge_budget_ms("slow.com", default_ms=40000)
+        memory.record("slow.com", "unresolved")
+        assert memory.challenge_budget_ms("slow.com", default_ms=40000) == full // 2
+        for _ in range(10):
+            memory.record("slow.com", "unresolved")
+        assert memory.challenge_budget_ms("slow.com", default_ms=40000) == MIN_CHALLENGE_BUDGET_MS
+
+    def test_resolved_challenge_resets_failures(self):
+        memory = ChallengeMemory()
+        memory.record("cf.com", "unresolved")
+        memory.record("cf.com", "resolved")
+        entry = memory.get("cf.com")
+        assert entry["consecutive_failures"] == 0
+        assert entry["challenges"] == 2
+        assert entry["resolved"] == 1
+
+    def test_unknown_outcome_rejected(self):
+        with pytest.raises(ValueError):
+            ChallengeMemory().record("x.com", "maybe")
+
+    def test_memory_persists_to_disk(self, tmp_path):
+        path = tmp_path / "memory.json"
+        memory = ChallengeMemory(str(path))
+        memory.record("cf.com", "blocked")
+        reloaded = ChallengeMemory(str(path))
+        assert reloaded.get("cf.com")["blocked"] == 1
@@ -0,0 +1,86 @@
+"""
+Tests for the company registry
+
+MEA_CONFIG files are indexed by companyId, name and analysis date and
+re-read only when they change.
+
+Run with: pytest test_company_registry.py -v
+"""
+
+import json
+import os
+
+import pytest
+
+from company_registry import CompanyRegistry
+
+
+def write_config(directory, filename, company_id, name, date):
+    path = directory / filename
+    path.write_text(json.dumps({"companyId": company_id, "companyName": name, "analysisDate": date}))
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_config(tmp_path, "acme_old.json", "comp_acme", "Acme", "2025-01-01")
+    write_config(tmp_path, "acme_new.json", "comp_acme", "Acme", "2025-06-01")
+    write_config(tmp_path, "globex.json", "comp_globex", "Globex", "2025-03-01")
+    (tmp_path / "notes.json").write_text('{"unrelated": true}')
+    (tmp_path / "broken.json").write_text("{not json")
+    return tmp_path
+
+
+class TestCompanyRegistry:
+    """Indexing, lookup and listing"""
+
+    def test_latest_analysis_wins(self, data_dir):
+        registry = CompanyRegistry(data_dir)
+        assert registry.get("comp_acme")["analysis_date"] == "2025-06-01"
+        assert registry.get("comp_acme", "2025-01-01")["file"].endswith("acme_old.json")
+        assert [r["analysis_date"] for r in registry.analyses("comp_acme")] == ["2025-06-01", "2025-01-01"]
+        assert registry.get("comp_missing") is None
+        assert len(registry) == 2
+
+    def test_list_pagination_and_query(self, data_dir):
+        registry = CompanyRegistry(data_dir)
+        page = registry.list(limit=1)
+        assert page["total"] == 2
+        assert [c["company_name"] for c in page["companies"]] == ["Acme"]
+        assert page["companies"][0]["analysis_count"] == 2
+        assert [c["company_name"] for c in registry.list(limit=1, offset=1)["companies"]] == ["Globex"]
+        assert [c["company_id"] for c in registry.list(query="GLOB")["companies"]] == ["comp_globex"]
+
+    def test_refresh_is_throttled_and_incremental(self, data_dir, monkeypatch):
+        import company_registry
+        registry = CompanyRegistry(data_dir, refresh_seconds=3600)
+        registry.refresh()
+        reads = []
+        original = company_registry.read_header
+        monkeypatch.setattr(company_registry, "read_header", lambda path: reads.append(path) or original(path))
+
+        write_config(data_dir, "initech.json", "comp_initech", "Initech", "2025-02-01")
+        assert registry.get("comp_initech") is None
+
+        assert registry.refresh(force=True) is True
+        assert [os.path.basename(p) for p in reads] == ["initech.json"]
+        assert registry.get("comp_initech")["company_name"] == "Initech"
+
+    def test_removed_file_drops_company(self, data_dir):
+        registry = CompanyRegistry(data_dir, refresh_seconds=0)
+        assert registry.get("comp_globex")
+        (data_dir / "globex.json").unlink()
+        assert registry.get("comp_globex") is None
+
+
+class TestCompaniesEndpoint:
+    """/api/gtm/companies and registry-backed dashboard lookup"""
+
+    def test_list_and_unknown_company(self):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        client = testclient.TestClient(main.app)
+
+        listing = client.get("/api/gtm/companies", params={"q": "solutions"}).json()
+        assert [c["company_id"] for c in listing["companies"]] == ["comp_ai_solutions_inc"]
+        assert client.get("/api/gtm/dashboard/comp_unknown").status_code == 404
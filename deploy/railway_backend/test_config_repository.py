@@ -0,0 +1,111 @@
+"""
+Tests for the MEA_CONFIG cache
+
+Parsed configs and transformed dashboards are reused until the file
+changes, evicted least recently used, and served with ETags.
+
+Run with: pytest test_config_repository.py -v
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from config_repository import ConfigLoadError, ConfigRepository
+
+SAMPLE_CONFIG = Path(__file__).parent / "sample_data" / "ai-solutions_inc_mea_config.json"
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "acme_mea_config.json"
+    shutil.copy(SAMPLE_CONFIG, path)
+    return path
+
+
+@pytest.fixture
+def transform_calls(monkeypatch):
+    import gtm_dashboard_transformer
+    calls = []
+    original = gtm_dashboard_transformer.transform_mea_config
+
+    def counting_transform(config):
+        calls.append(config["companyId"])
+        return original(config)
+
+    monkeypatch.setattr(gtm_dashboard_transformer, "transform_mea_config", counting_transform)
+    return calls
+
+
+class TestConfigRepository:
+    """Caching by file version"""
+
+    def test_second_get_is_cached(self, config_file, transform_calls):
+        repo = ConfigRepository()
+        first = repo.get(config_file)
+        second = repo.get(config_file)
+        assert first is second
+        assert transform_calls == ["comp_ai_solutions_inc"]
+        assert repo.stats()["hits"] == 1
+        assert json.loads(first["dashboard_body"])
+
+    def test_reloads_when_file_changes(self, config_file, transform_calls):
+        repo = ConfigRepository()
+        first = repo.get(config_file)
+        config = json.loads(config_file.read_text())
+        config["companyName"] = "Acme Renamed"
+        config_file.write_text(json.dumps(config))
+        stat = config_file.stat()
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        second = repo.get(config_file)
+        assert second["config"]["companyName"] == "Acme Renamed"
+        assert second["etag"] != first["etag"]
+        assert len(transform_calls) == 2
+
+    def test_lru_eviction(self, tmp_path, transform_calls):
+        repo = ConfigRepository(max_entries=2)
+        paths = []
+        for name in ("a", "b", "c"):
+            path = tmp_path / f"{name}.json"
+            shutil.copy(SAMPLE_CONFIG, path)
+            paths.append(path)
+        repo.get(paths[0])
+        repo.get(paths[1])
+        repo.get(paths[0])
+        repo.get(paths[2])
+        assert repo.stats()["entries"] == 2
+        repo.get(paths[0])
+        assert repo.stats()["hits"] == 2
+        repo.get(paths[1])
+        assert repo.stats()["misses"] == 4
+
+    def test_invalid_json(self, tmp_path):
+        path = tmp_path / "broken.json"
+        path.write_text("{not json")
+        with pytest.raises(ConfigLoadError, match="Invalid JSON"):
+            ConfigRepository().get(path)
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            ConfigRepository().get(tmp_path / "missing.json")
+
+
+class TestGtmDashboardEndpoint:
+    """Conditional GET on /api/gtm/dashboard"""
+
+    def test_etag_and_304(self):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        client = testclient.TestClient(main.app)
+
+        first = client.get("/api/gtm/dashboard/comp_ai_solutions_inc")
+        assert first.status_code == 200
+        assert first.json()
+        etag = first.headers["etag"]
+
+        second = client.get("/api/gtm/dashboard/comp_ai_solutions_inc", headers={"If-None-Match": etag})
+        assert second.status_code == 304
@@ -0,0 +1,94 @@
+"""
+Tests for the cached analysis dashboard endpoint
+
+The dashboard of a completed analysis is built once and then served from
+the job, with ETag / If-None-Match support.
+
+Run with: pytest test_dashboard_cache.py -v
+"""
+
+import json
+
+import pytest
+
+main = pytest.importorskip("main")
+testclient = pytest.importorskip("fastapi.testclient")
+http_cache = pytest.importorskip("http_cache")
+
+
+@pytest.fixture
+def transform_calls(monkeypatch):
+    import dashboard_transformer
+    calls = []
+
+    def fake_transform(company_name, company_url, analysis_date, analysis_job_id, workflow_state_dict):
+        calls.append(analysis_job_id)
+        return {"company_name": company_name, "analysis_date": analysis_date, "score": 72}
+
+    monkeypatch.setattr(dashboard_transformer, "transform_workflow_state_to_dashboard", fake_transform)
+    monkeypatch.setattr(dashboard_transformer, "validate_dashboard_data", lambda data: True)
+    return calls
+
+
+@pytest.fixture
+def completed_job():
+    job_id = "dash-test"
+    main.analysis_jobs[job_id] = {
+        "status": "completed",
+        "company_name": "Acme",
+        "company_url": "https://acme.com",
+        "progress": 100,
+        "completed_at": 1767225600.0,
+        "workflow_state": {"recommendations": {}},
+    }
+    yield job_id
+    main.analysis_jobs.pop(job_id, None)
+
+
+class TestDashboardCache:
+    """Built once, served with ETags"""
+
+    def test_served_from_precomputed_cache(self, transform_calls, completed_job):
+        main.build_dashboard(completed_job)
+        client = testclient.TestClient(main.app)
+
+        first = client.get(f"/api/analysis/dashboard/{completed_job}")
+        second = client.get(f"/api/analysis/dashboard/{completed_job}")
+        assert first.status_code == second.status_code == 200
+        assert first.json()["score"] == 72
+        assert first.headers["etag"] == second.headers["etag"]
+        assert transform_calls == [completed_job]
+
+    def test_if_none_match_returns_304(self, transform_calls, completed_job):
+        client = testclient.TestClient(main.app)
+        etag = client.get(f"/api/analysis/dashboard/{completed_job}").headers["etag"]
+
+        response = client.get(f"/api/analysis/dashboard/{completed_job}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert len(transform_calls) == 1
+
+    def test_analysis_date_is_completion_date(self, transform_calls, completed_job):
+        body, _ = main.build_dashboard(completed_job)
+        assert json.loads(body)["analysis_date"].startswith("2026-01-0")
+
+    def test_state_file_fallback(self, transform_calls, completed_job, tmp_path):
+        report = tmp_path / "acme_20260101_report.md"
+        (tmp_path / "acme_20260101_state.json").write_text('{"recommendations": {}}')
+        job = main.analysis_jobs[completed_job]
+        job.pop("workflow_state")
+        job["report_file"] = str(report)
+        main.build_dashboard(completed_job)
+        assert job["dashboard_etag"]
+
+
+class TestEtagMatching:
+    """If-None-Match parsing"""
+
+    def test_lists_weak_and_wildcard(self):
+        etag = '"abc"'
+        assert http_cache.etag_matches('"x", "abc"', etag)
+        assert http_cache.etag_matches('W/"abc"', etag)
+        assert http_cache.etag_matches("*", etag)
+        assert not http_cache.etag_matches('"other"', etag)
+        assert not http_cache.etag_matches(None, etag)
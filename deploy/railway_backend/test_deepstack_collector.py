@@ -0,0 +1,104 @@
+"""
+Unit tests for the DeepStack Collector library API
+
+collect() and collect_async() must return results as Python objects in
+input order, without writing output files or changing directory; their
+persistent per-domain state is optional. The
+browser workers are replaced by a fake that answers from the scheduler.
+
+Run with: pytest test_deepstack_collector.py -v
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import deepstack_collector
+
+
+def fake_worker(worker_id, scheduler, results, challenge_memory, worker_stats, cancel_event=None):
+    while (item := scheduler.next()) is not None:
+        domain, (url, index) = item
+        if cancel_event is not None and cancel_event.is_set():
+            scheduler.done(domain)
+            break
+        if "fail" in url:
+            results[index] = deepstack_collector._error_result(url, "boom", "unknown", None)
+        else:
+            results[index] = {
+                "url": url,
+                "fetch_status": "success",
+                "error_details": None,
+                "fetch_timestamp_utc": "2026-01-01T00:00:00+00:00",
+                "page_title": domain,
+                "error_category": None,
+                "challenge": None,
+                "data": {"marketing_technology_data_foundation": {"martech_identified": ["HubSpot"]}},
+            }
+        scheduler.done(domain)
+    worker_stats.append({"worker_id": worker_id, "rss_high_water_mb": 1.0})
+
+
+@pytest.fixture
+def options(tmp_path, monkeypatch):
+    monkeypatch.setattr(deepstack_collector, "_collect_worker", fake_worker)
+    return {
+        "workers": 2,
+        "challenge_memory_file": str(tmp_path / "memory.json"),
+        "fingerprint_dir": str(tmp_path / "fingerprints"),
+        "domain_min_interval": 0.0,
+        "domain_jitter": 0.0,
+    }
+
+
+class TestCollect:
+    """In-process collection"""
+
+    def test_results_in_input_order(self, options):
+        results = deepstack_collector.collect(["a.com", "https://b.com", "https://fail.com"], options)
+        urls = [r["url"] for r in results["url_analysis_results"]]
+        assert urls == ["https://a.com", "https://b.com", "https://fail.com"]
+        metadata = results["collection_metadata"]
+        assert metadata["total_urls_successful"] == 2
+        assert metadata["total_urls_failed"] == 1
+        assert [c["url"] for c in results["url_changes"]] == ["https://a.com", "https://b.com"]
+
+    def test_no_output_files_or_cwd_change(self, options, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        deepstack_collector.collect(["https://a.com"], options)
+        assert os.getcwd() == str(tmp_path)
+        assert not (tmp_path / "output").exists()
+
+    def test_persistent_state_is_optional(self, options, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        stateless = {**options, "challenge_memory_file": None, "fingerprint_dir": None}
+        results = deepstack_collector.collect(["https://a.com"], stateless)
+        assert results["url_changes"] == []
+        assert list(tmp_path.iterdir()) == []
+
+    def test_change_detection_can_be_disabled(self, options):
+        results = deepstack_collector.collect(["https://a.com"], {**options, "detect_changes": False})
+        assert results["url_changes"] == []
+        assert "change_detection" not in results["url_analysis_results"][0]
+
+    def test_empty_url_list(self, options):
+        results = deepstack_collector.collect([], options)
+        assert results["url_analysis_results"] == []
+        assert results["collection_metadata"]["workers"] == 0
+
+    def test_collect_async(self, options):
+        results = asyncio.run(deepstack_collector.collect_async(["https://a.com"], options))
+        assert results["url_analysis_results"][0]["fetch_status"] == "success"
+
+    def test_cancelled_collection(self, options):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        results = deepstack_collector.collect(["https://a.com", "https://b.com"], {**options, "cancel_event": cancel_event})
+        assert results["collection_metadata"]["cancelled"] is True
+        assert {r["error_category"] for r in results["url_analysis_results"]} == {"cancelled"}
@@ -0,0 +1,144 @@
+"""
+Tests for document text extraction
+
+Covers txt/docx/pptx extraction, the content-hash cache, chunking,
+budgeted context selection and how analyses record extraction failures.
+
+Run with: pytest test_document_ingestion.py -v
+"""
+
+import asyncio
+import os
+import threading
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+import document_ingestion
+from document_ingestion import (UnsupportedDocument, build_context, chunk_text, extract_documents, extract_text)
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+DRAWING_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+
+def make_docx(path, paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{WORD_NS}"><w:body>{body}</w:body></w:document>')
+    return path
+
+
+def make_pptx(path, slides):
+    with zipfile.ZipFile(path, "w") as archive:
+        for number, lines in enumerate(slides, 1):
+            paragraphs = "".join(f"<a:p><a:r><a:t>{line}</a:t></a:r></a:p>" for line in lines)
+            archive.writestr(f"ppt/slides/slide{number}.xml", f'<p:sld xmlns:a="{DRAWING_NS}" xmlns:p="x">{paragraphs}</p:sld>')
+    return path
+
+
+class TestExtraction:
+    """Formats and caching"""
+
+    def test_docx_and_pptx(self, tmp_path):
+        docx = make_docx(tmp_path / "memo.docx", ["Investment memo", "ARR grew 3x"])
+        pptx = make_pptx(tmp_path / "deck.pptx", [["Acme"], ["Pricing", "Per seat"]])
+        assert extract_text(docx, tmp_path / "cache") == "Investment memo\n\nARR grew 3x"
+        assert extract_text(pptx, tmp_path / "cache") == "[Slide 1]\nAcme\n\n[Slide 2]\nPricing\nPer seat"
+
+    def test_cache_skips_reextraction(self, tmp_path, monkeypatch):
+        first = tmp_path / "a.md"
+        second = tmp_path / "b.md"
+        first.write_text("# Brief")
+        second.write_text("# Brief")
+        calls = []
+        original = document_ingestion._extract_uncached
+        monkeypatch.setattr(document_ingestion, "_extract_uncached", lambda path: calls.append(path) or original(path))
+        assert extract_text(first, tmp_path / "cache") == extract_text(second, tmp_path / "cache") == "# Brief"
+        assert len(calls) == 1
+
+    def test_concurrent_extraction_of_same_content(self, tmp_path, monkeypatch):
+        path = tmp_path / "deck.txt"
+        path.write_text("same deck")
+        # Every thread misses the cache, then all write the cache file at once
+        barrier = threading.Barrier(8)
+        uncached = document_ingestion._extract_uncached
+        monkeypatch.setattr(document_ingestion, "_extract_uncached", lambda p: (barrier.wait(5), uncached(p))[1])
+        results, errors = [], []
+
+        def extract():
+            try:
+                results.append(extract_text(path, tmp_path / "cache"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=extract) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [] and results == ["same deck"] * 8
+        assert [p.name.endswith(".txt") for p in (tmp_path / "cache").iterdir()] == [True]
+
+    def test_unsupported_format(self, tmp_path):
+        path = tmp_path / "image.png"
+        path.write_bytes(b"\x89PNG")
+        with pytest.raises(UnsupportedDocument):
+            extract_text(path, tmp_path / "cache")
+
+    def test_extract_documents_reports_errors(self, tmp_path):
+        good = tmp_path / "notes.txt"
+        good.write_text("pipeline notes")
+        bad = tmp_path / "broken.docx"
+        bad.write_bytes(b"not a zip")
+        documents = extract_documents([str(good), str(bad)], ["notes.txt", "broken.docx"], cache_dir=tmp_path / "cache")
+        assert documents[0]["text"] == "pipeline notes" and documents[0]["error"] is None
+        assert documents[1]["error"] and documents[1]["chunks"] == []
+
+
+class TestContext:
+    """Chunking and budgeted selection"""
+
+    def test_chunks_respect_size(self):
+        text = "\n\n".join(f"Paragraph {i} " + "x" * 300 for i in range(20))
+        chunks = chunk_text(text, chunk_chars=1000)
+        assert all(len(chunk) <= 1000 for chunk in chunks)
+        assert "".join(chunks).count("Paragraph") == 20
+
+    def test_relevant_chunks_within_budget(self):
+        documents = [{"name": "deck.pptx", "chunks": ["Team offsite photos", "Pricing and pipeline metrics", "Office plants"]}]
+        context = build_context(documents, ["pricing", "pipeline"], budget_chars=70)
+        assert context == "[Source: deck.pptx]\nPricing and pipeline metrics"
+
+
+class TestAnalysisInputs:
+    """Document extraction in run_meara_full_analysis"""
+
+    def test_drb_extraction_error_recorded(self, tmp_path, monkeypatch):
+        main = pytest.importorskip("main")
+        monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "test-key"))
+        meara_orchestrator = pytest.importorskip("meara_orchestrator")
+        drb = tmp_path / "brief.docx"
+        drb.write_bytes(b"not a zip")
+        received = {}
+
+        def fake_workflow(**kwargs):
+            received.update(kwargs)
+            state = SimpleNamespace(final_report="report", api_stats={}, to_dict=dict,
+                                    usage=SimpleNamespace(to_dict=dict))
+            return state, tmp_path / "report.md"
+
+        monkeypatch.setattr(meara_orchestrator, "run_meara_workflow", fake_workflow)
+        monkeypatch.setattr(main, "build_dashboard", lambda job_id: None)
+        monkeypatch.setattr(document_ingestion, "DOCUMENT_CACHE_DIR", tmp_path / "cache")
+        job_id = "drb-error-test"
+        main.analysis_jobs[job_id] = {"status": "queued", "company_name": "Acme", "company_url": "https://acme.com",
+                                      "progress": 0, "drb_file_path": str(drb)}
+        try:
+            asyncio.run(main.run_meara_full_analysis(job_id, "deepstack-1", "Acme", "https://acme.com"))
+            job = main.analysis_jobs[job_id]
+            assert job["status"] == "completed"
+            assert job["drb_extraction"]["name"] == "brief.docx" and job["drb_extraction"]["error"]
+            assert received["deep_research_brief"] is None
+        finally:
+            main.analysis_jobs.pop(job_id, None)
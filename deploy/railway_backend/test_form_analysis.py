@@ -0,0 +1,113 @@
+"""
+Unit tests for DeepStack form analysis
+
+Uses lightweight fakes in place of Playwright pages and frames to check the
+URL filter, the single-round-trip batch and the per-page frame budget.
+
+Run with: pytest test_form_analysis.py -v
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from form_analysis import analyze_page_forms, classify_frame, JS_BATCH_FORMS_SCRIPT
+
+
+class FakeHandle:
+    def __init__(self, value):
+        self.value = value
+
+    def json_value(self):
+        return self.value
+
+    def dispose(self):
+        pass
+
+
+class FakeFrame:
+    def __init__(self, url, forms=None, name="", delay=0.0, detached=False):
+        self.url = url
+        self.name = name
+        self.forms = forms if forms is not None else []
+        self.delay = delay
+        self.detached = detached
+        self.evaluated = False
+
+    def is_detached(self):
+        return self.detached
+
+    def wait_for_function(self, script, timeout=None, polling=None):
+        self.evaluated = True
+        time.sleep(self.delay)
+        return FakeHandle([dict(f) for f in self.forms])
+
+
+class FakePage:
+    def __init__(self, main_forms, batched_frames, child_frames):
+        self.main_forms = main_forms
+        self.batched_frames = batched_frames
+        self.frames = [FakeFrame("https://acme.com/")] + child_frames
+        self.evaluate_calls = 0
+
+    def evaluate(self, script):
+        self.evaluate_calls += 1
+        assert script == JS_BATCH_FORMS_SCRIPT
+        return {"main": list(self.main_forms), "frames": list(self.batched_frames)}
+
+
+class TestClassifyFrame:
+    def test_form_provider_is_eligible(self):
+        assert classify_frame("https://share.hsforms.com/1abc", "https://acme.com") == (True, "form_provider")
+
+    def test_same_site_is_eligible(self):
+        assert classify_frame("https://app.acme.com/embed", "https://www.acme.com") == (True, "same_site")
+
+    def test_ad_frame_is_filtered(self):
+        assert classify_frame("https://ads.doubleclick.net/x", "https://acme.com") == (False, "not_form_provider")
+
+    def test_blank_frame_is_filtered(self):
+        assert classify_frame("about:blank", "https://acme.com") == (False, "blank")
+
+
+class TestAnalyzePageForms:
+    def test_same_origin_frames_come_from_single_round_trip(self):
+        page = FakePage(
+            main_forms=[{"form_id": "main"}],
+            batched_frames=[{"url": "https://acme.com/newsletter", "name": "nl", "forms": [{"form_id": "nl"}]}],
+            child_frames=[FakeFrame("https://acme.com/newsletter", forms=[{"form_id": "dup"}])],
+        )
+        forms, report = analyze_page_forms(page, "https://acme.com/")
+
+        assert page.evaluate_calls == 1
+        assert [f["form_id"] for f in forms] == ["main", "nl"]
+        assert forms[1]["found_in_iframe"] is True
+        assert report["frames_batched_same_origin"] == 1
+        assert report["frames_evaluated"] == 0
+        assert not page.frames[1].evaluated
+
+    def test_only_relevant_cross_origin_frames_are_evaluated(self):
+        hubspot = FakeFrame("https://share.hsforms.com/1abc", forms=[{"form_id": "hs"}])
+        ad = FakeFrame("https://ads.example-adnet.com/slot")
+        page = FakePage([], [], [ad, hubspot, FakeFrame("https://x.com", detached=True)])
+
+        forms, report = analyze_page_forms(page, "https://acme.com/")
+
+        assert [f["form_id"] for f in forms] == ["hs"]
+        assert forms[0]["iframe_url"] == hubspot.url
+        assert not ad.evaluated
+        reasons = sorted(s["reason"] for s in report["frames_skipped"])
+        assert reasons == ["detached", "not_form_provider"]
+
+    def test_page_budget_bounds_frame_evaluation(self):
+        slow_frames = [FakeFrame(f"https://app.acme.com/f{i}", delay=0.3) for i in range(5)]
+        page = FakePage([], [], slow_frames)
+
+        _, report = analyze_page_forms(page, "https://acme.com/", frame_budget_ms=1000, page_budget_ms=1000)
+
+        budget_skips = [s for s in report["frames_skipped"] if s["reason"] == "budget"]
+        assert budget_skips
+        assert report["frames_evaluated"] + len(budget_skips) == 5
+        assert report["elapsed_ms"] < 2000
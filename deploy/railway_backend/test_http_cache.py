@@ -0,0 +1,86 @@
+"""
+Tests for the JSON response layer
+
+Fast serialization, compression of large bodies (cached per ETag) and
+Cache-Control on completed-job resources.
+
+Run with: pytest test_http_cache.py -v
+"""
+
+import gzip
+import json
+
+import pytest
+
+http_cache = pytest.importorskip("http_cache")
+main = pytest.importorskip("main")
+testclient = pytest.importorskip("fastapi.testclient")
+
+
+@pytest.fixture
+def completed_job():
+    job_id = "results-test"
+    main.jobs[job_id] = {
+        "status": "completed",
+        "company_name": "Acme",
+        "company_url": "https://acme.com",
+        "progress": 100,
+        "result": {"pages": [{"url": f"https://acme.com/{i}", "tools": ["gtm"] * 20} for i in range(50)]},
+    }
+    yield job_id
+    main.jobs.pop(job_id, None)
+
+
+class TestSerialization:
+    """dumps_json"""
+
+    def test_matches_stdlib_output(self):
+        payload = {"name": "Zoë", "n": [1, 2.5, None, True], "nested": {"a": "b"}}
+        assert json.loads(http_cache.dumps_json(payload)) == payload
+
+    def test_falls_back_for_big_integers(self):
+        assert json.loads(http_cache.dumps_json({"n": 2 ** 70})) == {"n": 2 ** 70}
+
+
+class TestEncodingNegotiation:
+    """choose_encoding"""
+
+    def test_gzip_and_refusals(self, monkeypatch):
+        monkeypatch.setattr(http_cache, "brotli", None)
+        assert http_cache.choose_encoding("gzip, deflate, br") == "gzip"
+        assert http_cache.choose_encoding("gzip;q=0, identity") is None
+        assert http_cache.choose_encoding(None) is None
+
+    def test_encoded_etag_matches_identity_tag(self):
+        assert http_cache.etag_matches('"abc-gzip"', '"abc"')
+        assert http_cache.etag_matches('"abc"', '"abc-br"')
+
+
+class TestCompletedJobResponses:
+    """Results of completed jobs are cached, compressed and immutable"""
+
+    def test_results_gzip_and_immutable(self, completed_job, monkeypatch):
+        monkeypatch.setattr(http_cache, "brotli", None)
+        client = testclient.TestClient(main.app)
+        response = client.get(f"/api/results/{completed_job}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == http_cache.IMMUTABLE
+        assert response.headers["etag"].endswith('-gzip"')
+        assert response.json()["result"]["pages"][0]["url"] == "https://acme.com/0"
+        assert main.jobs[completed_job]["results_json"] is not None
+
+        again = client.get(f"/api/results/{completed_job}",
+                           headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+        assert again.status_code == 304
+
+    def test_compressed_variant_is_cached(self, completed_job):
+        body, etag = http_cache.prepare_json(main.jobs[completed_job]["result"])
+        first = http_cache.compressed_body(body, etag, "gzip")
+        assert http_cache.compressed_body(body, etag, "gzip") is first
+        assert gzip.decompress(first) == body
+
+    def test_small_bodies_uncompressed(self):
+        client = testclient.TestClient(main.app)
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
@@ -0,0 +1,104 @@
+"""
+Concurrency tests for job-scoped DeepStack output
+
+Runs many DeepStack jobs for the same domain in parallel and checks that
+every job gets its own result and its own output file, and that atomic
+writes never expose a partially written file.
+
+Run with: pytest test_job_isolation.py -v
+"""
+
+import asyncio
+import json
+import random
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import deepstack_collector
+from deepstack_collector import output_paths, write_json_atomic
+
+main = pytest.importorskip("main")
+
+JOB_COUNT = 25
+
+
+async def fake_collect_async(urls, options=None):
+    """Stands in for a browser run: finishes in random order, echoes the URL."""
+    await asyncio.sleep(random.uniform(0, 0.05))
+    return {
+        "collection_metadata": {"total_urls_processed": len(urls)},
+        "url_analysis_results": [
+            {"url": url, "fetch_status": "success", "error_details": None, "data": {"marker": url}}
+            for url in urls
+        ],
+        "url_changes": [],
+    }
+
+
+class TestOutputPaths:
+    """Output file naming"""
+
+    def test_job_scoped_paths(self):
+        output_file, changes_file = output_paths("output", "https://www.example.com", "job-1")
+        assert output_file == str(Path("output/job-1/deepstack_output-example.com.json"))
+        assert changes_file == str(Path("output/job-1/deepstack_changes-example.com.json"))
+
+    def test_batch_paths_without_job(self):
+        output_file, _ = output_paths("output")
+        assert output_file == str(Path("output/deepstack_output.json"))
+
+    def test_job_id_cannot_escape_output_dir(self):
+        output_file, _ = output_paths("output", "https://example.com", "../../etc")
+        assert Path(output_file).parent.parent == Path("output")
+
+
+class TestAtomicWrite:
+    """write_json_atomic under concurrent writers"""
+
+    def test_concurrent_writers_leave_valid_json(self, tmp_path):
+        path = tmp_path / "out.json"
+        payloads = [{"writer": i, "rows": list(range(2000))} for i in range(10)]
+        threads = [threading.Thread(target=write_json_atomic, args=(str(path), p)) for p in payloads]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert json.loads(path.read_text()) in payloads
+        assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
+
+
+class TestParallelJobs:
+    """Parallel API jobs for the same domain"""
+
+    def test_each_job_gets_its_own_result(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(deepstack_collector, "collect_async", fake_collect_async)
+        monkeypatch.setattr(main, "JOB_OUTPUT_DIR", tmp_path)
+
+        job_urls = {f"job-{i}": f"https://example.com/?run={i}" for i in range(JOB_COUNT)}
+        for job_id, url in job_urls.items():
+            main.jobs[job_id] = {"status": "queued", "company_name": "Example", "company_url": url, "progress": 0}
+
+        async def run_all():
+            await asyncio.gather(*(
+                main.run_deepstack_analysis(job_id, "Example", url) for job_id, url in job_urls.items()
+            ))
+
+        try:
+            asyncio.run(run_all())
+            output_files = set()
+            for job_id, url in job_urls.items():
+                job = main.jobs[job_id]
+                assert job["status"] == "completed", job.get("error")
+                assert job["result"]["url_analysis_results"][0]["url"] == url
+                with open(job["output_file"]) as f:
+                    assert json.load(f)["url_analysis_results"][0]["data"]["marker"] == url
+                output_files.add(job["output_file"])
+            assert len(output_files) == JOB_COUNT
+        finally:
+            for job_id in job_urls:
+                main.jobs.pop(job_id, None)
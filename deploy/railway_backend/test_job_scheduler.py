@@ -0,0 +1,227 @@
+"""
+Unit tests for job admission control
+
+Covers worker limits, FIFO and priority ordering, queue positions,
+backpressure when the queue is full and cancellation, plus the API's 429
+and cancel responses.
+
+Run with: pytest test_job_scheduler.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from job_scheduler import JobScheduler, QueueFullError
+
+
+def make_job(log, name, gate):
+    async def job():
+        log.append(("start", name))
+        await gate.wait()
+        log.append(("end", name))
+    return job
+
+
+class TestJobScheduler:
+    """Queueing and dispatch"""
+
+    def test_worker_limit_and_fifo(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=2, max_queue=5)
+            gate, log = asyncio.Event(), []
+            positions = [scheduler.submit(f"j{i}", make_job(log, f"j{i}", gate)) for i in range(4)]
+            await asyncio.sleep(0)
+            assert positions == [0, 0, 1, 2]
+            assert scheduler.stats()["running"] == 2
+            assert [name for _, name in log] == ["j0", "j1"]
+            gate.set()
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+            starts = [name for event, name in log if event == "start"]
+            assert starts == ["j0", "j1", "j2", "j3"]
+            assert scheduler.stats()["completed"] == 4
+
+        asyncio.run(scenario())
+
+    def test_priority_runs_first(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=5)
+            gate, log = asyncio.Event(), []
+            scheduler.submit("first", make_job(log, "first", gate))
+            scheduler.submit("low", make_job(log, "low", gate))
+            scheduler.submit("high", make_job(log, "high", gate), priority=5)
+            assert scheduler.position("high") == 1
+            assert scheduler.position("low") == 2
+            assert scheduler.position("first") is None
+            gate.set()
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+            assert [name for event, name in log if event == "start"] == ["first", "high", "low"]
+
+        asyncio.run(scenario())
+
+    def test_queue_full_raises(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=1, default_job_seconds=30)
+            gate, log = asyncio.Event(), []
+            scheduler.submit("a", make_job(log, "a", gate))
+            scheduler.submit("b", make_job(log, "b", gate))
+            assert scheduler.full()
+            with pytest.raises(QueueFullError) as exc_info:
+                scheduler.submit("c", make_job(log, "c", gate))
+            assert exc_info.value.retry_after == 60
+            assert scheduler.full(reserve=1)
+            assert scheduler.stats()["rejected"] == 1
+            gate.set()
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+    def test_reserve_keeps_queue_headroom(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=3)
+            gate, log = asyncio.Event(), []
+            scheduler.submit("a", make_job(log, "a", gate))
+            assert not scheduler.full(reserve=2)
+            scheduler.submit("b", make_job(log, "b", gate))
+            assert scheduler.full(reserve=2) and not scheduler.full()
+            gate.set()
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+    def test_failed_job_frees_slot(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=2)
+            ran = []
+
+            async def boom():
+                raise RuntimeError("boom")
+
+            async def ok():
+                ran.append(True)
+
+            scheduler.submit("bad", boom)
+            scheduler.submit("good", ok)
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+            assert ran == [True]
+            assert scheduler.stats()["failed"] == 1
+
+        asyncio.run(scenario())
+
+
+class TestCancel:
+    """Cancelling queued and running jobs"""
+
+    def test_cancel_queued_job(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=5)
+            gate, log = asyncio.Event(), []
+            scheduler.submit("a", make_job(log, "a", gate))
+            scheduler.submit("b", make_job(log, "b", gate))
+            scheduler.submit("c", make_job(log, "c", gate))
+            assert scheduler.cancel("b") == "dequeued"
+            assert scheduler.position("c") == 1
+            gate.set()
+            while scheduler.stats()["running"] or scheduler.stats()["queued"]:
+                await asyncio.sleep(0.01)
+            assert [name for event, name in log if event == "start"] == ["a", "c"]
+
+        asyncio.run(scenario())
+
+    def test_cancel_running_job_frees_slot(self):
+        async def scenario():
+            scheduler = JobScheduler("test", max_workers=1, max_queue=5)
+            gate, log = asyncio.Event(), []
+            scheduler.submit("a", make_job(log, "a", gate))
+            scheduler.submit("b", make_job(log, "b", gate))
+            await asyncio.sleep(0)
+            assert scheduler.cancel("a") == "cancelled"
+            await asyncio.sleep(0.01)
+            assert scheduler.is_running("b")
+            assert ("end", "a") not in log
+            assert scheduler.stats()["cancelled"] == 1
+            assert scheduler.cancel("missing") is None
+            gate.set()
+
+        asyncio.run(scenario())
+
+    def test_cancel_endpoint_stops_job_thread(self, monkeypatch):
+        main = pytest.importorskip("main")
+
+        async def scenario():
+            scheduler = JobScheduler("deepstack", max_workers=1, max_queue=5)
+            monkeypatch.setattr(main, "deepstack_scheduler", scheduler)
+            stopped = asyncio.Event()
+
+            async def long_job():
+                try:
+                    main.jobs["job-x"]["status"] = "running"
+                    await asyncio.sleep(60)
+                finally:
+                    stopped.set()
+
+            main.jobs["job-x"] = {"status": "queued", "company_name": "Acme", "company_url": "https://acme.com", "progress": 0}
+            main.cancel_events["job-x"] = event = main.threading.Event()
+            scheduler.submit("job-x", long_job)
+            await asyncio.sleep(0)
+
+            response = await main.cancel_analysis("job-x")
+            await asyncio.wait_for(stopped.wait(), timeout=1)
+            assert response["was_running"] is True
+            assert event.is_set()
+            assert main.jobs["job-x"]["status"] == "cancelled"
+            with pytest.raises(main.HTTPException) as exc_info:
+                await main.cancel_analysis("job-x")
+            assert exc_info.value.status_code == 409
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            main.jobs.pop("job-x", None)
+            main.cancel_events.pop("job-x", None)
+
+
+class TestAdmissionEndpoint:
+    """429 backpressure from /api/analyze"""
+
+    def test_analyze_returns_429_when_full(self, monkeypatch):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        full = JobScheduler("deepstack", max_workers=1, max_queue=0)
+        monkeypatch.setattr(full, "full", lambda reserve=0: True)
+        monkeypatch.setattr(main, "deepstack_scheduler", full)
+        uploads = []
+        monkeypatch.setattr(main, "store_upload", lambda upload, budget: uploads.append(upload))
+
+        response = testclient.TestClient(main.app).post(
+            "/api/analyze", data={"company_name": "Acme", "company_url": "https://acme.com"},
+            files={"drb_file": ("brief.md", b"# Brief", "text/markdown")}
+        )
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        assert uploads == []
+
+    def test_full_analysis_rejected_before_uploads(self, monkeypatch):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        full = JobScheduler("meara", max_workers=1, max_queue=0)
+        monkeypatch.setattr(full, "full", lambda reserve=0: True)
+        monkeypatch.setattr(main, "meara_scheduler", full)
+        uploads = []
+        monkeypatch.setattr(main, "store_upload", lambda upload, budget: uploads.append(upload))
+        main.jobs["admission-test"] = {"status": "completed", "company_name": "Acme",
+                                       "company_url": "https://acme.com", "progress": 100}
+        try:
+            response = testclient.TestClient(main.app).post(
+                "/api/analyze/full", data={"deepstack_job_id": "admission-test"},
+                files={"additional_context_files": ("memo.md", b"# Memo", "text/markdown")}
+            )
+        finally:
+            main.jobs.pop("admission-test", None)
+        assert response.status_code == 429
+        assert uploads == []
@@ -0,0 +1,104 @@
+"""
+Tests for the indexed job store
+
+Status counters follow in-place status updates, and listings paginate by
+cursor with status, company and creation-time filters.
+
+Run with: pytest test_job_store.py -v
+"""
+
+import pytest
+
+from job_store import JobStore
+
+
+@pytest.fixture
+def store():
+    store = JobStore()
+    for i in range(10):
+        store[f"job-{i}"] = {
+            "status": "completed" if i % 2 else "queued",
+            "company_name": "Acme" if i < 5 else "Globex",
+            "company_url": "https://example.com",
+            "progress": 0,
+            "created_at": 1000.0 + i,
+            "result": {"large": "payload"},
+        }
+    return store
+
+
+class TestCounters:
+    """Maintained status counts"""
+
+    def test_counts_follow_status_changes(self, store):
+        assert store.counts() == {"queued": 5, "completed": 5}
+        store["job-0"]["status"] = "running"
+        store["job-2"].update(status="failed", error="boom")
+        assert store.counts() == {"queued": 3, "running": 1, "failed": 1, "completed": 5}
+        assert store.count("queued", "running") == 4
+        del store["job-1"]
+        assert store.count("completed") == 4
+        assert "job-1" not in store and len(store) == 9
+
+    def test_replacing_a_job(self, store):
+        store["job-0"] = {"status": "completed", "company_name": "Acme"}
+        assert store.counts() == {"queued": 4, "completed": 6}
+
+
+class TestListing:
+    """Cursor pagination, filters and projections"""
+
+    def test_cursor_pages_newest_first(self, store):
+        first = store.list(limit=4)
+        assert [j["job_id"] for j in first["jobs"]] == ["job-9", "job-8", "job-7", "job-6"]
+        second = store.list(limit=4, cursor=first["next_cursor"])
+        assert [j["job_id"] for j in second["jobs"]] == ["job-5", "job-4", "job-3", "job-2"]
+        last = store.list(limit=4, cursor=second["next_cursor"])
+        assert [j["job_id"] for j in last["jobs"]] == ["job-1", "job-0"]
+        assert last["next_cursor"] is None
+
+    def test_filters(self, store):
+        completed_acme = store.list(status="completed", company="acme")
+        assert [j["job_id"] for j in completed_acme["jobs"]] == ["job-3", "job-1"]
+        window = store.list(created_after=1002.0, created_before=1004.0)
+        assert [j["job_id"] for j in window["jobs"]] == ["job-4", "job-3", "job-2"]
+        store["job-3"]["status"] = "failed"
+        assert [j["job_id"] for j in store.list(status="failed")["jobs"]] == ["job-3"]
+
+    def test_status_filter_pagination(self, store):
+        first = store.list(status="queued", limit=2)
+        second = store.list(status="queued", limit=2, cursor=first["next_cursor"])
+        assert [j["job_id"] for j in first["jobs"] + second["jobs"]] == ["job-8", "job-6", "job-4", "job-2"]
+
+    def test_status_index_stays_in_creation_order(self, store):
+        for job_id in ("job-7", "job-2", "job-9", "job-4"):
+            store[job_id]["status"] = "running"
+        del store["job-9"]
+        running = store.list(status="running", limit=2)
+        rest = store.list(status="running", cursor=running["next_cursor"])
+        assert [j["job_id"] for j in running["jobs"] + rest["jobs"]] == ["job-7", "job-4", "job-2"]
+
+    def test_projection_excludes_payloads(self, store):
+        job = store.list(limit=1, fields=["status", "result", "company_name"])["jobs"][0]
+        assert job == {"job_id": "job-9", "status": "completed", "company_name": "Globex"}
+
+    def test_bad_cursor(self, store):
+        with pytest.raises(ValueError):
+            store.list(cursor="abc")
+
+
+class TestJobsEndpoint:
+    """/api/jobs over the store"""
+
+    def test_paginated_listing(self, monkeypatch, store):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        monkeypatch.setattr(main, "jobs", store)
+        client = testclient.TestClient(main.app)
+
+        page = client.get("/api/jobs", params={"status": "completed", "limit": 2}).json()
+        assert page["total_jobs"] == 10
+        assert [j["job_id"] for j in page["jobs"]] == ["job-9", "job-7"]
+        assert page["counts"]["completed"] == 5
+        assert client.get("/api/jobs", params={"cursor": "x"}).status_code == 400
+        assert client.get("/health").json()["completed_jobs"] == 5
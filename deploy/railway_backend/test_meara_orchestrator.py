@@ -0,0 +1,311 @@
+"""
+Unit tests for MEARA orchestrator assistant calls
+
+Uses an in-memory stand-in for the Assistants API client, so no network
+access or API key is needed.
+
+Run with: pytest test_meara_orchestrator.py -v
+"""
+
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+meara_orchestrator = pytest.importorskip("meara_orchestrator")
+from openai_scheduler import RateLimitScheduler
+from usage_ledger import BudgetExceeded, UsageLedger
+
+
+class FakeAssistantsClient:
+    """Minimal client.beta.threads API; runs stay in_progress for `polls` retrievals."""
+
+    def __init__(self, response="{}", polls=0):
+        self.response = response
+        self.polls = polls
+        self.threads_created = 0
+        self.cancelled_runs = []
+        self.on_retrieve = None
+        self.completions = []
+        self.runs_created = []
+        self.rate_limited_runs = 0  # runs that fail with rate_limit_exceeded first
+        runs = SimpleNamespace(create=self._create_run, retrieve=self._retrieve_run, cancel=self._cancel_run)
+        messages = SimpleNamespace(create=lambda **kwargs: None, list=self._list_messages)
+        threads = SimpleNamespace(create=self._create_thread, runs=runs, messages=messages)
+        self.beta = SimpleNamespace(threads=threads)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def _create_completion(self, **kwargs):
+        self.completions.append(kwargs)
+        message = SimpleNamespace(content="DIGEST " + kwargs["messages"][1]["content"][:20])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _create_thread(self, **kwargs):
+        self.threads_created += 1
+        return SimpleNamespace(id=f"thread_{self.threads_created}")
+
+    def _create_run(self, thread_id, assistant_id, **kwargs):
+        self.runs_created.append(kwargs)
+        self._remaining = self.polls
+        if self.rate_limited_runs:
+            self.rate_limited_runs -= 1
+            error = SimpleNamespace(code="rate_limit_exceeded", message="Rate limit reached. Please try again in 5ms.")
+            return SimpleNamespace(id="run_1", status="failed", last_error=error)
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=200, total_tokens=1200)
+        return SimpleNamespace(id="run_1", status="queued" if self.polls else "completed", usage=usage, model="gpt-4o")
+
+    def _retrieve_run(self, thread_id, run_id, **kwargs):
+        if self.on_retrieve:
+            self.on_retrieve()
+        self._remaining -= 1
+        return SimpleNamespace(id=run_id, status="in_progress" if self._remaining > 0 else "completed")
+
+    def _cancel_run(self, thread_id, run_id, **kwargs):
+        self.cancelled_runs.append(run_id)
+
+    def _list_messages(self, **kwargs):
+        response = self.response.pop(0) if isinstance(self.response, list) else self.response
+        text = SimpleNamespace(value=response)
+        return SimpleNamespace(data=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeAssistantsClient(response='{"ok": true}')
+    monkeypatch.setattr(meara_orchestrator, "client", client)
+    monkeypatch.setattr(meara_orchestrator.time, "sleep", lambda s: None)
+    monkeypatch.setattr(meara_orchestrator, "openai_scheduler", RateLimitScheduler(rpm=0, tpm=0))
+    return client
+
+
+class TestCallAssistant:
+    """call_assistant() round trip"""
+
+    def test_returns_response_and_thread(self, fake_client):
+        response, thread_id = meara_orchestrator.call_assistant("asst_1", "hello")
+        assert response == '{"ok": true}'
+        assert thread_id == "thread_1"
+
+    def test_rate_limited_run_is_retried(self, fake_client):
+        fake_client.rate_limited_runs = 1
+        response, _ = meara_orchestrator.call_assistant("asst_1", "hello")
+        assert response == '{"ok": true}'
+        assert len(fake_client.runs_created) == 2
+        assert meara_orchestrator.openai_scheduler.stats()["rate_limited"] == 1
+
+
+class TestCancellation:
+    """Cancelling a workflow stops the active run"""
+
+    def test_cancel_before_call_raises_without_api_calls(self, fake_client):
+        event = threading.Event()
+        event.set()
+        with pytest.raises(meara_orchestrator.WorkflowCancelled):
+            meara_orchestrator.call_assistant("asst_1", "hello", cancel_event=event)
+        assert fake_client.threads_created == 0
+
+    def test_cancel_during_run_cancels_it(self, fake_client):
+        event = threading.Event()
+        fake_client.polls = 10
+        fake_client.on_retrieve = event.set
+        with pytest.raises(meara_orchestrator.WorkflowCancelled):
+            meara_orchestrator.call_assistant("asst_1", "hello", cancel_event=event)
+        assert fake_client.cancelled_runs == ["run_1"]
+
+    def test_workflow_cancelled_before_saving(self, fake_client, monkeypatch):
+        saved = []
+        monkeypatch.setattr(meara_orchestrator, "save_results", lambda state: saved.append(state))
+        event = threading.Event()
+        event.set()
+        with pytest.raises(meara_orchestrator.WorkflowCancelled):
+            meara_orchestrator.run_meara_workflow("Acme", "https://acme.com", "x" * 200, cancel_event=event)
+        assert saved == []
+
+
+class TestInputDigests:
+    """Bounded DRB / evidence digests"""
+
+    @pytest.fixture
+    def digest_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(meara_orchestrator, "DIGEST_CACHE_DIR", tmp_path)
+        monkeypatch.setattr(meara_orchestrator, "DIGEST_THRESHOLD_CHARS", 100)
+        return tmp_path
+
+    def test_long_inputs_condensed_and_cached(self, fake_client, digest_dir):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500)
+        state.evidence_collection = {"pricing": "x"}
+        meara_orchestrator.step_04b_condense_inputs(state)
+        assert state.digests == {"drb": "DIGEST " + "D" * 20}
+        assert len(fake_client.completions) == 1
+
+        again = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500)
+        again.evidence_collection = {"pricing": "x"}
+        meara_orchestrator.step_04b_condense_inputs(again)
+        assert again.digests == state.digests
+        assert len(fake_client.completions) == 1
+
+    def test_steps_choose_full_or_digest(self, fake_client, digest_dir):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500)
+        state.digests["drb"] = "short digest"
+        assert meara_orchestrator.step_input(state, "strategic_verifier", "drb") == "short digest"
+        assert meara_orchestrator.step_input(state, "evidence_collector", "drb") == "D" * 500
+
+    def test_concurrent_digests_of_same_text(self, fake_client, digest_dir, monkeypatch):
+        barrier = threading.Barrier(6)
+        create = fake_client.chat.completions.create
+        monkeypatch.setattr(fake_client.chat.completions, "create", lambda **kwargs: (barrier.wait(5), create(**kwargs))[1])
+        results, errors = [], []
+
+        def digest():
+            try:
+                results.append(meara_orchestrator.digest_text("DRB", "D" * 500))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=digest) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [] and results == ["DIGEST " + "D" * 20] * 6
+        assert [p.suffix for p in digest_dir.iterdir()] == [".txt"]
+
+    def test_digest_failure_falls_back_to_full_text(self, fake_client, digest_dir, monkeypatch):
+        def fail(**kwargs):
+            raise RuntimeError("rate limited")
+        monkeypatch.setattr(fake_client.chat.completions, "create", fail)
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500)
+        meara_orchestrator.step_04b_condense_inputs(state)
+        assert state.digests == {}
+        assert meara_orchestrator.step_input(state, "bottleneck_analyst", "drb") == "D" * 500
+
+
+class TestSharedThread:
+    """Dependent steps on one thread"""
+
+    def run_chain(self, state):
+        state.evidence_collection = None
+        meara_orchestrator.step_04_evidence_collector(state)
+        meara_orchestrator.step_05_dimension_evaluator(state)
+        meara_orchestrator.step_07_strategic_verifier(state)
+        meara_orchestrator.step_09_bottleneck_analyst(state, False)
+        meara_orchestrator.step_10_recommendation_builder(state)
+
+    def test_shared_thread_sends_fewer_threads_and_bytes(self, fake_client, monkeypatch):
+        fake_client.response = '{"high_priority_count": 0, "recommendations": [{"title": "Pricing page"}]}'
+        drb = "Deep research " * 200
+        monkeypatch.setattr(meara_orchestrator, "SHARED_THREAD", False)
+        separate = meara_orchestrator.WorkflowState("Acme", "https://acme.com", drb)
+        self.run_chain(separate)
+
+        monkeypatch.setattr(meara_orchestrator, "SHARED_THREAD", True)
+        shared = meara_orchestrator.WorkflowState("Acme", "https://acme.com", drb)
+        self.run_chain(shared)
+
+        assert separate.api_stats["threads_created"] == 5
+        assert shared.api_stats["threads_created"] == 1
+        assert shared.api_stats["bytes_sent"] < separate.api_stats["bytes_sent"] - 2 * len(drb)
+        assert shared.thread_artifacts >= {"drb", "evidence", "dimension_evaluations", "strategic_verification"}
+
+    def test_reference_replaces_sent_artifact(self, monkeypatch):
+        monkeypatch.setattr(meara_orchestrator, "SHARED_THREAD", True)
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        first = meara_orchestrator.section(state, "dimension_evaluator", "Deep Research Brief", "drb", "brief")
+        second = meara_orchestrator.section(state, "strategic_verifier", "Deep Research Brief", "drb", "brief")
+        assert first == "Deep Research Brief:\nbrief"
+        assert "provided earlier" in second
+        assert meara_orchestrator.section(state, "research_agent", "Deep Research Brief", "drb", "brief").endswith("brief")
+
+
+class TestStructuredOutput:
+    """JSON mode and targeted repair"""
+
+    def test_json_mode_requested(self, fake_client):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        assert meara_orchestrator.call_step_json(state, "evidence_collector", "evidence_collector", "Return JSON") == {"ok": True}
+        assert fake_client.runs_created[0]["extra_body"] == {"response_format": {"type": "json_object"}}
+
+    def test_parse_failure_triggers_repair_on_same_thread(self, fake_client):
+        fake_client.response = ["Here is the analysis, hope it helps!", '{"repaired": true}']
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        result = meara_orchestrator.call_step_json(state, "evidence_collector", "evidence_collector", "Return JSON")
+        assert result == {"repaired": True}
+        assert state.api_stats["repairs"] == 1
+        assert fake_client.threads_created == 1
+        assert state.api_stats["messages_sent"] == 2
+
+
+class TestStepContracts:
+    """Invalid step outputs are retried at once"""
+
+    def test_contract_violation_retries_step(self, fake_client):
+        fake_client.response = ['{"verified": []}', '{"high_priority_count": 2}']
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        meara_orchestrator.step_07_strategic_verifier(state)
+        assert state.strategic_verification == {"high_priority_count": 2}
+        assert state.api_stats["step_retries"] == 1
+
+    def test_persistent_violation_raises(self, fake_client):
+        fake_client.response = ['{"recommendations": []}', '{"recommendations": [{"impact": "HUGE"}]}']
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        with pytest.raises(meara_orchestrator.StepContractError) as exc_info:
+            meara_orchestrator.step_10_recommendation_builder(state)
+        assert "recommendations/0" in str(exc_info.value)
+
+
+class TestUsageBudget:
+    """Usage accounting and budget enforcement"""
+
+    def test_usage_recorded_per_step(self, fake_client):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        meara_orchestrator.call_step_json(state, "evidence_collector", "evidence_collector", "Return JSON")
+        meara_orchestrator.call_step(state, "report_assembler", "report_assembler", "Write the report")
+        usage = state.to_dict()["usage"]
+        assert usage["steps"]["evidence_collector"]["total_tokens"] == 1200
+        assert usage["total"] == {"calls": 2, "prompt_tokens": 2000, "completion_tokens": 400,
+                                  "total_tokens": 2400, "cost_usd": 0.009}
+
+    def test_downgrade_skips_optional_steps_and_uses_digests(self, fake_client):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500,
+                                                 usage=UsageLedger(token_budget=1400))
+        state.digests["drb"] = "short digest"
+        state.final_report = "Report"
+        meara_orchestrator.call_step(state, "report_assembler", "report_assembler", "Write the report")
+        assert meara_orchestrator.step_input(state, "evidence_collector", "drb") == "D" * 500
+
+        meara_orchestrator.step_12_table_generator(state)
+        assert state.usage.downgraded
+        assert state.usage.skipped_steps == ["table_generator"]
+        assert state.final_report == "Report"
+        assert len(fake_client.runs_created) == 1
+        assert meara_orchestrator.step_input(state, "evidence_collector", "drb") == "short digest"
+
+    def test_abort_when_budget_spent(self, fake_client, monkeypatch):
+        monkeypatch.setattr(meara_orchestrator, "BUDGET_ACTION", "abort")
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief",
+                                                 usage=UsageLedger(token_budget=1000))
+        meara_orchestrator.call_step(state, "report_assembler", "report_assembler", "Write the report")
+        state.final_report = "Report"
+        with pytest.raises(BudgetExceeded) as exc_info:
+            meara_orchestrator.step_12_table_generator(state)
+        assert exc_info.value.usage["total"]["total_tokens"] == 1200
+        assert len(fake_client.runs_created) == 1
+
+    def test_step_crossing_threshold_sends_digest(self, fake_client, monkeypatch):
+        sent = []
+        monkeypatch.setattr(fake_client.beta.threads.messages, "create", lambda **kwargs: sent.append(kwargs["content"]))
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "D" * 500,
+                                                 usage=UsageLedger(token_budget=1400))
+        state.digests["drb"] = "short digest"
+        meara_orchestrator.call_step(state, "report_assembler", "report_assembler", "Write the report")
+        meara_orchestrator.step_04_evidence_collector(state)
+        assert state.usage.downgraded
+        assert "short digest" in sent[-1] and "D" * 500 not in sent[-1]
+
+    def test_skipped_step_sends_nothing(self, fake_client):
+        state = meara_orchestrator.WorkflowState("Acme", "https://acme.com", "brief")
+        state.usage.skipped_steps.append("table_generator")
+        assert meara_orchestrator.call_step(state, "table_generator", "table_generator", "Tables") == (None, None)
+        assert fake_client.runs_created == []
@@ -0,0 +1,203 @@
+"""
+Tests for the shared OpenAI rate-limit scheduler
+
+Token bucket refills, Retry-After parsing, 429 retries with a shared pause,
+lane priority and cancellation while waiting.
+
+Run with: pytest test_openai_scheduler.py -v
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from openai_scheduler import (LANE_BATCH, LANE_INTERACTIVE, RateLimitScheduler, RequestCancelled, TokenBucket,
+                              retry_after_seconds, run_retry_after)
+
+
+def rate_limit_error(headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/threads/runs")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return RateLimitError("Rate limit reached", response=response, body={"code": code} if code else None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """TokenBucket"""
+
+    def test_refills_per_minute(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock)
+        bucket.take(60)
+        assert bucket.wait_time(1) == pytest.approx(1.0)
+        clock.now += 30
+        assert bucket.wait_time(30) == 0.0
+        assert bucket.wait_time(31) == pytest.approx(1.0)
+
+    def test_oversized_requests_wait_for_a_full_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(600, clock)
+        bucket.take(600)
+        assert bucket.wait_time(10_000) == pytest.approx(60.0)
+
+    def test_give_back_corrects_estimates(self):
+        bucket = TokenBucket(1000, FakeClock())
+        bucket.take(800)
+        bucket.give_back(500)   # used 300 instead of 800
+        assert bucket.level == 700
+        bucket.give_back(-900)  # used 900 more than estimated
+        assert bucket.wait_time(100) > 0
+
+    def test_zero_limit_is_unlimited(self):
+        bucket = TokenBucket(0, FakeClock())
+        bucket.take(10 ** 9)
+        assert bucket.wait_time(10 ** 9) == 0.0
+
+
+class TestRetryAfter:
+    """Delays from 429 responses and rate-limited runs"""
+
+    def test_headers(self):
+        assert retry_after_seconds(rate_limit_error({"retry-after-ms": "250"})) == 0.25
+        assert retry_after_seconds(rate_limit_error({"retry-after": "7"})) == 7.0
+        assert retry_after_seconds(rate_limit_error({"x-ratelimit-reset-tokens": "1m30s",
+                                                     "x-ratelimit-reset-requests": "20ms"})) == 90.0
+        assert retry_after_seconds(rate_limit_error()) is None
+
+    def test_failed_run(self):
+        error = SimpleNamespace(code="rate_limit_exceeded", message="Rate limit reached. Please try again in 20.5s.")
+        assert run_retry_after(SimpleNamespace(status="failed", last_error=error)) == 20.5
+        other = SimpleNamespace(code="server_error", message="boom")
+        assert run_retry_after(SimpleNamespace(status="failed", last_error=other)) is None
+        assert run_retry_after(SimpleNamespace(status="completed", last_error=None)) is None
+
+
+class TestCall:
+    """RateLimitScheduler.call"""
+
+    def test_retries_after_429(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0)
+        attempts = []
+
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise rate_limit_error({"retry-after-ms": "30"})
+            return "ok"
+
+        assert scheduler.call(flaky, tokens=100, requests=1) == "ok"
+        assert len(attempts) == 3
+        assert attempts[2] - attempts[0] >= 0.05
+        stats = scheduler.stats()
+        assert stats["rate_limited"] == 2 and stats["retries"] == 2
+
+    def test_failed_attempts_are_refunded(self):
+        scheduler = RateLimitScheduler(rpm=600, tpm=60000)
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise rate_limit_error({"retry-after-ms": "1"})
+            return "ok"
+
+        assert scheduler.call(flaky, tokens=1000, requests=1) == "ok"
+        assert scheduler.stats()["tokens"] == 1000
+        assert scheduler._tokens.level == pytest.approx(59000, abs=50)
+        assert scheduler._requests.level == pytest.approx(599, abs=1)
+
+    def test_quota_exhaustion_is_not_retried(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0)
+        calls = []
+
+        def no_quota():
+            calls.append(1)
+            raise rate_limit_error(code="insufficient_quota")
+
+        with pytest.raises(RateLimitError):
+            scheduler.call(no_quota)
+        assert calls == [1]
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0, max_retries=1)
+
+        def always_limited():
+            raise rate_limit_error({"retry-after-ms": "1"})
+
+        with pytest.raises(RateLimitError):
+            scheduler.call(always_limited)
+
+
+class TestScheduling:
+    """Lanes, pacing and cancellation"""
+
+    def test_interactive_lane_served_first(self):
+        scheduler = RateLimitScheduler(rpm=600, tpm=0)
+        for _ in range(600):
+            scheduler.acquire()  # drain the request bucket
+        order = []
+
+        def request(lane):
+            scheduler.acquire(lane=lane)
+            order.append(lane)
+
+        batch = threading.Thread(target=request, args=(LANE_BATCH,))
+        batch.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=request, args=(LANE_INTERACTIVE,))
+        interactive.start()
+        batch.join(5)
+        interactive.join(5)
+        assert order == [LANE_INTERACTIVE, LANE_BATCH]
+
+    def test_token_budget_paces_requests(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=6000)  # 100 tokens per second
+        scheduler.acquire(tokens=6000)
+        waited = scheduler.acquire(tokens=10)
+        assert 0.05 <= waited < 1.0
+
+    def test_free_calls_skip_the_queue(self):
+        """A run poll completes while a large run creation waits for tokens"""
+        scheduler = RateLimitScheduler(rpm=0, tpm=6000)
+        scheduler.acquire(tokens=6000)  # drain the token bucket
+        creation = threading.Thread(target=scheduler.acquire, kwargs={"tokens": 6000})
+        creation.start()
+        time.sleep(0.02)
+        assert scheduler.stats()["waiting"] == 1
+        start = time.monotonic()
+        assert scheduler.call(lambda: "in_progress", tokens=0, requests=0) == "in_progress"
+        assert time.monotonic() - start < 0.5
+        assert creation.is_alive()
+        scheduler.settle(6000, 0)  # refund the first run so the creation can proceed
+        creation.join(5)
+        assert not creation.is_alive()
+
+    def test_backoff_pauses_all_lanes(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0)
+        scheduler.backoff(0.05)
+        assert scheduler.acquire(lane=LANE_BATCH) >= 0.04
+
+    def test_cancel_while_waiting(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0)
+        scheduler.backoff(30)
+        event = threading.Event()
+        threading.Timer(0.05, event.set).start()
+        with pytest.raises(RequestCancelled):
+            scheduler.acquire(cancel_event=event)
+        assert scheduler.stats()["waiting"] == 0
+
+    def test_free_calls_wait_out_a_pause(self):
+        scheduler = RateLimitScheduler(rpm=0, tpm=0)
+        scheduler.backoff(0.05)
+        assert scheduler.acquire(tokens=0, requests=0) >= 0.04
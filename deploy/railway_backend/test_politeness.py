@@ -0,0 +1,112 @@
+"""
+Unit tests for the DeepStack politeness scheduler
+
+Checks that same-domain requests are spaced and capped while different
+domains are dispatched in parallel, and that statistics are exposed.
+
+Run with: pytest test_politeness.py -v
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from politeness import PolitenessScheduler
+
+
+def drain(scheduler, workers, work_seconds=0.0):
+    """Run worker threads against the scheduler; return (url, start_time) pairs."""
+    started = []
+    lock = threading.Lock()
+
+    def worker():
+        while (item := scheduler.next()) is not None:
+            domain, (url, _) = item
+            with lock:
+                started.append((url, time.monotonic()))
+            time.sleep(work_seconds)
+            scheduler.done(domain)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return started
+
+
+class TestPolitenessScheduler:
+    def test_different_domains_run_without_delay(self):
+        scheduler = PolitenessScheduler(min_interval=5.0, jitter=0)
+        for i in range(4):
+            scheduler.submit(f"https://site{i}.com/", i)
+        scheduler.close()
+
+        t0 = time.monotonic()
+        started = drain(scheduler, workers=4)
+        assert len(started) == 4
+        assert max(t for _, t in started) - t0 < 1.0
+
+    def test_same_domain_requests_are_spaced(self):
+        scheduler = PolitenessScheduler(min_interval=0.3, jitter=0)
+        for i in range(3):
+            scheduler.submit(f"https://www.acme.com/page{i}", i)
+        scheduler.close()
+
+        started = drain(scheduler, workers=3)
+        times = sorted(t for _, t in started)
+        assert len(times) == 3
+        assert all(b - a >= 0.28 for a, b in zip(times, times[1:]))
+
+    def test_busy_domain_does_not_block_other_domains(self):
+        scheduler = PolitenessScheduler(min_interval=2.0, jitter=0)
+        scheduler.submit("https://acme.com/a", 0)
+        scheduler.submit("https://acme.com/b", 1)
+        scheduler.submit("https://other.com/", 2)
+        scheduler.close()
+
+        first = scheduler.next(timeout=1)
+        second = scheduler.next(timeout=1)
+        assert first[1][0] == "https://acme.com/a"
+        assert second[1][0] == "https://other.com/"
+        # acme.com is still cooling down and holds its only slot
+        assert scheduler.next(timeout=0.2) is None
+        assert scheduler.stats()["queue_depth"] == 1
+
+    def test_max_in_flight_per_domain(self):
+        scheduler = PolitenessScheduler(min_interval=0, jitter=0, max_in_flight_per_domain=2)
+        for i in range(3):
+            scheduler.submit(f"https://acme.com/{i}", i)
+        scheduler.close()
+
+        a = scheduler.next(timeout=1)
+        b = scheduler.next(timeout=1)
+        assert a and b
+        assert scheduler.next(timeout=0.1) is None
+        scheduler.done("acme.com")
+        assert scheduler.next(timeout=1) is not None
+
+    def test_stats_report_waits(self):
+        scheduler = PolitenessScheduler(min_interval=0.2, jitter=0)
+        scheduler.submit("https://acme.com/1", 0)
+        scheduler.submit("https://acme.com/2", 1)
+        scheduler.close()
+        drain(scheduler, workers=1)
+
+        stats = scheduler.stats()
+        assert stats["dispatched"] == 2
+        assert stats["queue_depth"] == 0
+        assert stats["max_wait_seconds"] >= 0.15
+        assert stats["per_domain"]["acme.com"]["dispatched"] == 2
+
+    def test_slot_applies_same_rules(self):
+        scheduler = PolitenessScheduler(min_interval=0.2, jitter=0)
+        with scheduler.slot("acme.com"):
+            pass
+        t0 = time.monotonic()
+        with scheduler.slot("acme.com"):
+            waited = time.monotonic() - t0
+        assert waited >= 0.15
@@ -0,0 +1,148 @@
+"""
+Unit tests for DeepStack collector error classification and retries
+
+Run with: pytest test_retry_policy.py -v
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import retry_policy
+from retry_policy import (
+    classify_error, retry_decision, ChallengeError, HttpStatusError,
+    TRANSIENT_NETWORK, TIMEOUT, CHALLENGE, HTTP_CLIENT, HTTP_SERVER, BROWSER_CRASH, UNKNOWN,
+    RECYCLE_BROWSER
+)
+
+
+class TimeoutError(Exception):
+    """Stand-in for playwright's TimeoutError (matched by class name)"""
+
+
+class TestClassifyError:
+    @pytest.mark.parametrize("error, expected", [
+        (Exception("page.goto: net::ERR_CONNECTION_RESET at https://x.com"), TRANSIENT_NETWORK),
+        (Exception("page.goto: NS_ERROR_NET_RESET"), TRANSIENT_NETWORK),
+        (TimeoutError("Timeout 90000ms exceeded."), TIMEOUT),
+        (Exception("Target crashed"), BROWSER_CRASH),
+        (Exception("Target page, context or browser has been closed"), BROWSER_CRASH),
+        (ChallengeError("Challenge not resolved within 20000 ms"), CHALLENGE),
+        (HttpStatusError(404, "https://x.com"), HTTP_CLIENT),
+        (HttpStatusError(503, "https://x.com"), HTTP_SERVER),
+        (ValueError("something odd"), UNKNOWN),
+    ])
+    def test_categories(self, error, expected):
+        assert classify_error(error) == expected
+
+
+class TestRetryDecision:
+    def test_hard_client_error_is_not_retried(self):
+        assert retry_decision(HTTP_CLIENT, 1)["retry"] is False
+
+    def test_challenge_is_not_retried(self):
+        assert retry_decision(CHALLENGE, 1)["retry"] is False
+
+    def test_transient_network_backs_off_exponentially(self):
+        first = retry_decision(TRANSIENT_NETWORK, 1)
+        second = retry_decision(TRANSIENT_NETWORK, 2)
+        assert first["retry"] and second["retry"]
+        assert 2.0 <= first["delay"] <= 2.5
+        assert 4.0 <= second["delay"] <= 5.0
+        assert retry_decision(TRANSIENT_NETWORK, 3)["retry"] is False
+
+    def test_crash_recycles_browser_even_without_retry(self):
+        assert retry_decision(BROWSER_CRASH, 1)["recycle"] == RECYCLE_BROWSER
+        last = retry_decision(BROWSER_CRASH, 5)
+        assert last["retry"] is False
+        assert last["recycle"] == RECYCLE_BROWSER
+
+    def test_backoff_is_capped(self, monkeypatch):
+        monkeypatch.setattr(retry_policy, "MAX_BACKOFF_SECONDS", 3.0)
+        monkeypatch.setattr(retry_policy, "MAX_RETRIES", 10)
+        policy = {UNKNOWN: {"max_retries": 10, "backoff_base": 2.0, "recycle": None}}
+        assert retry_decision(UNKNOWN, 6, policy)["delay"] == 3.0
+
+
+class TestAnalyzeUrlWithRetries:
+    """Retry loop in the collector, with analyze_url and the browser faked"""
+
+    class FakeSession:
+        context = object()
+
+        def __init__(self):
+            self.browser_recycles = 0
+            self.context_recycles = 0
+
+        def browser_connected(self):
+            return True
+
+        def recycle_browser(self, reason=None):
+            self.browser_recycles += 1
+
+        def recycle_context(self, reason=None):
+            self.context_recycles += 1
+
+    def run(self, monkeypatch, outcomes, cancel_event=None):
+        import deepstack_collector
+        calls = iter(outcomes)
+
+        def fake_analyze_url(context, url, memory, cancel_event=None):
+            category = next(calls)
+            if category is None:
+                return {"url": url, "fetch_status": "success", "error_details": None, "error_category": None}
+            return {"url": url, "fetch_status": "error", "error_details": category, "error_category": category}
+
+        monkeypatch.setattr(deepstack_collector, "analyze_url", fake_analyze_url)
+        monkeypatch.setattr(deepstack_collector.time, "sleep", lambda s: None)
+        session = self.FakeSession()
+        result = deepstack_collector.analyze_url_with_retries(session, "https://x.com", None, cancel_event)
+        return result, session
+
+    def test_transient_error_recovers(self, monkeypatch):
+        result, _ = self.run(monkeypatch, [TRANSIENT_NETWORK, None])
+        assert result["fetch_status"] == "success"
+        assert result["attempts"] == 2
+        assert result["recovered_errors"][0]["category"] == TRANSIENT_NETWORK
+
+    def test_crash_relaunches_browser_then_succeeds(self, monkeypatch):
+        result, session = self.run(monkeypatch, [BROWSER_CRASH, None])
+        assert result["fetch_status"] == "success"
+        assert session.browser_recycles == 1
+
+    def test_hard_error_fails_after_one_attempt(self, monkeypatch):
+        result, _ = self.run(monkeypatch, [HTTP_CLIENT])
+        assert result["fetch_status"] == "error"
+        assert result["attempts"] == 1
+
+    def test_cancel_during_backoff_stops_retrying(self, monkeypatch):
+        import deepstack_collector
+        monkeypatch.setattr(deepstack_collector, "retry_decision",
+                            lambda category, attempt: {"retry": True, "delay": 30.0, "recycle": None})
+        cancel_event = threading.Event()
+        threading.Timer(0.05, cancel_event.set).start()
+        start = time.monotonic()
+        result, _ = self.run(monkeypatch, [TRANSIENT_NETWORK, None], cancel_event)
+        assert time.monotonic() - start < 5
+        assert result["fetch_status"] == "error" and result["attempts"] == 1
+
+    def test_cancelled_url_opens_no_page(self):
+        import deepstack_collector
+
+        class NoPages:
+            def new_page(self):
+                raise AssertionError("page opened after cancel")
+
+        class Memory:
+            def should_skip(self, domain):
+                return None
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        result = deepstack_collector.analyze_url(NoPages(), "https://x.com", Memory(), cancel_event=cancel_event)
+        assert result["error_category"] == "cancelled"
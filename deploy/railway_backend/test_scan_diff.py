@@ -0,0 +1,109 @@
+"""
+Unit tests for DeepStack scan change detection
+
+Covers section fingerprinting, the per-domain fingerprint store and the
+change report emitted when a domain is scanned again.
+
+Run with: pytest test_scan_diff.py -v
+"""
+
+import copy
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from scan_diff import detect_changes, fingerprint_sections, scan_key, SECTION_EXTRACTORS
+
+
+def make_result(url="https://www.example.com/"):
+    return {
+        "url": url,
+        "fetch_status": "success",
+        "fetch_timestamp_utc": "2026-01-01T00:00:00+00:00",
+        "data": {
+            "marketing_technology_data_foundation": {
+                "martech_identified": ["GoogleAnalytics", "HubSpot"],
+                "dataLayer_summary": {"exists": True, "total_pushes": 4},
+                "cookie_consent_tools_identified": ["OneTrust"],
+            },
+            "organic_presence_content_signals": {"meta_title": "Example", "h1_tags": ["Welcome"]},
+            "conversion_funnel_effectiveness": {
+                "forms_analysis": [{
+                    "form_id": "contact",
+                    "form_action": "https://example.com/submit",
+                    "form_method": "POST",
+                    "handler_attributes": {},
+                    "input_fields_summary": [
+                        {"name": "email", "type": "email", "value": None},
+                        {"name": "csrf", "type": "hidden", "value": "token-1"},
+                    ],
+                }],
+                "iframe_analysis": {"elapsed_ms": 120},
+            },
+            "competitive_posture_strategic_tests": {"feature_flags_systems_identified": ["LaunchDarkly"]},
+        },
+    }
+
+
+class TestFingerprints:
+    """Section fingerprints ignore volatile values"""
+
+    def test_every_section_fingerprinted(self):
+        fingerprints = fingerprint_sections(make_result()["data"])
+        assert set(fingerprints) == set(SECTION_EXTRACTORS)
+
+    def test_hidden_values_and_timings_ignored(self):
+        changed = make_result()
+        forms = changed["data"]["conversion_funnel_effectiveness"]
+        forms["forms_analysis"][0]["input_fields_summary"][1]["value"] = "token-2"
+        forms["iframe_analysis"]["elapsed_ms"] = 900
+        changed["data"]["marketing_technology_data_foundation"]["dataLayer_summary"]["total_pushes"] = 7
+        assert fingerprint_sections(changed["data"]) == fingerprint_sections(make_result()["data"])
+
+    def test_scan_key_strips_www_and_keeps_path(self):
+        assert scan_key("https://www.Example.com/") == "example.com"
+        assert scan_key("https://example.com/pricing/") == "example.com/pricing"
+
+
+class TestDetectChanges:
+    """Change reports against the stored previous scan"""
+
+    def test_first_scan_reports_all_sections(self, tmp_path):
+        report = detect_changes(make_result(), tmp_path)
+        assert report["first_scan"] is True
+        assert report["changed_sections"] == list(SECTION_EXTRACTORS)
+
+    def test_unchanged_rescan(self, tmp_path):
+        detect_changes(make_result(), tmp_path)
+        report = detect_changes(make_result(), tmp_path)
+        assert report["changed"] is False
+        assert report["changed_data"] == {}
+        assert report["previous_scan_utc"] == "2026-01-01T00:00:00+00:00"
+
+    def test_changed_sections_and_summary(self, tmp_path):
+        detect_changes(make_result(), tmp_path)
+        rescan = copy.deepcopy(make_result())
+        foundation = rescan["data"]["marketing_technology_data_foundation"]
+        foundation["martech_identified"] = ["GoogleAnalytics", "Segment"]
+        rescan["data"]["competitive_posture_strategic_tests"]["feature_flags_systems_identified"] = []
+
+        report = detect_changes(rescan, tmp_path)
+        assert report["changed_sections"] == ["martech", "feature_flags"]
+        assert report["summary"]["martech"] == {"added": ["Segment"], "removed": ["HubSpot"]}
+        assert report["summary"]["feature_flags"] == {"added": [], "removed": ["LaunchDarkly"]}
+        assert set(report["changed_data"]) == {"martech", "feature_flags"}
+
+    def test_dry_run_keeps_baseline(self, tmp_path):
+        detect_changes(make_result(), tmp_path)
+        rescan = make_result()
+        rescan["data"]["organic_presence_content_signals"]["meta_title"] = "New title"
+        detect_changes(rescan, tmp_path, update_store=False)
+        report = detect_changes(rescan, tmp_path)
+        assert report["changed_sections"] == ["organic_signals"]
+
+    def test_failed_fetch_skipped(self, tmp_path):
+        result = make_result()
+        result["fetch_status"] = "error"
+        assert detect_changes(result, tmp_path) is None
+        assert not list(tmp_path.iterdir())
@@ -0,0 +1,125 @@
+"""
+Unit tests for single-flight request coalescing
+
+Covers URL normalization, content-based request keys, the freshness
+window and coalescing of identical /api/analyze submissions.
+
+Run with: pytest test_single_flight.py -v
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from single_flight import SingleFlight, normalize_url, request_key
+
+
+class TestNormalizeUrl:
+    """Canonical URLs"""
+
+    @pytest.mark.parametrize("url", [
+        "example.com",
+        "https://www.Example.com/",
+        "https://example.com:443",
+        "https://example.com/?utm_source=x#top",
+    ])
+    def test_equivalent_urls(self, url):
+        assert normalize_url(url) == "https://example.com"
+
+    def test_query_sorted_and_kept(self):
+        assert normalize_url("https://example.com/p?b=2&a=1") == "https://example.com/p?a=1&b=2"
+
+    def test_distinct_paths(self):
+        assert normalize_url("https://example.com/pricing") != normalize_url("https://example.com")
+
+
+class TestRequestKey:
+    """Keys depend on URL and file content only"""
+
+    def test_file_content_not_name(self, tmp_path):
+        a, b, c = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "c.txt"
+        a.write_text("brief")
+        b.write_text("brief")
+        c.write_text("other brief")
+        assert request_key("example.com", [a]) == request_key("https://www.example.com/", [b])
+        assert request_key("example.com", [a]) != request_key("example.com", [c])
+        assert request_key("example.com", [a]) != request_key("example.com")
+
+    def test_options_in_key(self):
+        assert request_key("example.com", options={"tokens": None}) == request_key("example.com")
+        budgeted = request_key("example.com", options={"tokens": 50000, "cost_usd": None})
+        assert budgeted != request_key("example.com")
+        assert budgeted != request_key("example.com", options={"tokens": 80000})
+
+    def test_missing_files_ignored(self, tmp_path):
+        assert request_key("example.com", [None, tmp_path / "gone.txt"]) == request_key("example.com")
+
+
+class TestSingleFlight:
+    """Lookup of in-progress and recent jobs"""
+
+    def test_in_progress_and_recent(self):
+        store = {"j1": {"status": "running"}}
+        flights = SingleFlight(store, freshness_seconds=60)
+        flights.register("k", "j1")
+        assert flights.find("k") == ("j1", "in_progress")
+        store["j1"].update(status="completed", completed_at=time.time())
+        assert flights.find("k") == ("j1", "recent")
+
+    def test_stale_failed_and_missing_dropped(self):
+        store = {
+            "old": {"status": "completed", "completed_at": time.time() - 120},
+            "bad": {"status": "failed"},
+        }
+        flights = SingleFlight(store, freshness_seconds=60)
+        flights.register("k1", "old")
+        flights.register("k2", "bad")
+        flights.register("k3", "gone")
+        assert flights.find("k1") is None
+        assert flights.find("k2") is None
+        assert flights.find("k3") is None
+
+    def test_attach_counts_subscribers(self):
+        store = {"j1": {"status": "queued"}}
+        flights = SingleFlight(store, freshness_seconds=60)
+        flights.attach("j1")
+        flights.attach("j1")
+        assert store["j1"]["subscribers"] == 3
+
+
+class TestAnalyzeCoalescing:
+    """Identical /api/analyze submissions share one job"""
+
+    def test_second_submission_attaches(self, monkeypatch, tmp_path):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        import deepstack_collector
+
+        async def slow_collect(urls, options=None):
+            await asyncio.sleep(5)
+            return {"collection_metadata": {}, "url_analysis_results": [], "url_changes": []}
+
+        monkeypatch.setattr(deepstack_collector, "collect_async", slow_collect)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(main, "deepstack_flights", SingleFlight(main.jobs, 60))
+        form = {"company_name": "Acme", "company_url": "https://acme.com"}
+
+        with testclient.TestClient(main.app) as client:
+            first = client.post("/api/analyze", data=form).json()
+            second = client.post("/api/analyze", data={**form, "company_url": "www.acme.com/"}).json()
+            forced = client.post("/api/analyze", data={**form, "force": "true"}).json()
+            for job_id in {first["job_id"], forced["job_id"]}:
+                client.post(f"/api/cancel/{job_id}")
+                client.post(f"/api/cancel/{job_id}")
+
+        assert second["job_id"] == first["job_id"]
+        assert second["deduplicated"] is True
+        assert second["dedup_reason"] == "in_progress"
+        assert forced["job_id"] != first["job_id"]
+        for job_id in (first["job_id"], forced["job_id"]):
+            main.jobs.pop(job_id, None)
@@ -0,0 +1,43 @@
+"""
+Unit tests for the orchestrator step contracts
+
+Run with: pytest test_step_contracts.py -v
+"""
+
+import pytest
+
+from step_contracts import STEP_SCHEMAS, VALIDATORS, validate_step_output
+
+
+class TestStepContracts:
+    """Precompiled validators per step"""
+
+    def test_all_steps_compiled(self):
+        assert set(VALIDATORS) == set(STEP_SCHEMAS)
+
+    def test_valid_outputs(self):
+        assert validate_step_output("strategic_verifier", {"high_priority_count": 0, "elements": []}) == []
+        assert validate_step_output("recommendation_builder", {
+            "recommendations": [{"title": "Add pricing page", "impact": "HIGH", "effort": "LOW"}]
+        }) == []
+        assert validate_step_output("dimension_evaluator", {"dimensions": {"positioning": {"score": 60}}}) == []
+
+    @pytest.mark.parametrize("step_key, data, fragment", [
+        ("strategic_verifier", {"elements": []}, "'high_priority_count' is a required property"),
+        ("strategic_verifier", {"high_priority_count": "2"}, "high_priority_count"),
+        ("recommendation_builder", {"recommendations": [{"impact": "HIGH"}]}, "recommendations/0"),
+        ("recommendation_builder", {"recommendations": [{"title": "x", "effort": "TINY"}]}, "recommendations/0/effort"),
+        ("evidence_collector", {}, "(root)"),
+        ("evidence_collector", ["not", "an", "object"], "(root)"),
+    ])
+    def test_violations_name_the_path(self, step_key, data, fragment):
+        errors = validate_step_output(step_key, data)
+        assert errors and any(fragment in error for error in errors)
+
+    def test_levels_are_case_insensitive(self):
+        data = {"recommendations": [{"title": "Add pricing page", "impact": "High", "effort": "Medium"}]}
+        assert validate_step_output("recommendation_builder", data) == []
+        assert data["recommendations"][0]["impact"] == "HIGH" and data["recommendations"][0]["effort"] == "MEDIUM"
+
+    def test_steps_without_contract(self):
+        assert validate_step_output("report_assembler", "markdown") == []
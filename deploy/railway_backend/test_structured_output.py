@@ -0,0 +1,50 @@
+"""
+Unit tests for JSON extraction from assistant responses
+
+Run with: pytest test_structured_output.py -v
+"""
+
+import json
+import time
+
+import pytest
+
+from structured_output import StructuredOutputError, balanced_spans, extract_json
+
+
+class TestExtractJson:
+    """Plain, fenced and embedded JSON"""
+
+    def test_plain_and_fenced(self):
+        assert extract_json(' {"a": 1} ') == {"a": 1}
+        assert extract_json('Result:\n```json\n{"a": [1, 2]}\n```\nDone.') == {"a": [1, 2]}
+
+    def test_trailing_prose_with_braces(self):
+        text = 'Analysis: {"score": 7, "note": "uses {curly} and \\"quotes\\""} Let me know if {anything} else.'
+        assert extract_json(text) == {"score": 7, "note": 'uses {curly} and "quotes"'}
+
+    def test_prefers_object_over_array(self):
+        assert extract_json('Steps [1, 2] then {"ok": true}') == {"ok": True}
+
+    def test_truncated_output_fails(self):
+        with pytest.raises(StructuredOutputError):
+            extract_json('Here you go: {"a": {"b": 1}')
+
+    def test_error_is_value_error(self):
+        with pytest.raises(ValueError):
+            extract_json("no json here")
+
+    def test_linear_on_large_responses(self):
+        payload = {"dimensions": [{"name": f"d{i}", "evidence": "x" * 200} for i in range(2000)]}
+        text = "Preamble with a stray { brace\n" + json.dumps(payload) + "\n" + "Closing remarks. " * 5000
+        start = time.time()
+        assert extract_json(text) == payload
+        assert time.time() - start < 2
+
+
+class TestBalancedSpans:
+    """Top-level span scanning"""
+
+    def test_spans_and_strings(self):
+        text = 'a {"x": "}"} b [1, [2]] c {'
+        assert [text[s:e] for s, e in balanced_spans(text)] == ['{"x": "}"}', "[1, [2]]"]
@@ -0,0 +1,81 @@
+"""
+Tests for streaming uploads
+
+Files are streamed into a content-addressed store with per-file and
+per-request limits; JSON uploads are parsed from disk.
+
+Run with: pytest test_upload_pipeline.py -v
+"""
+
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+
+from upload_pipeline import (RequestBudget, UploadTooLarge, load_json_upload, safe_filename, save_upload)
+
+
+def make_upload(content: bytes, filename: str = "brief.md") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+class TestSaveUpload:
+    """Chunked, hashed, deduplicated storage"""
+
+    def test_identical_content_stored_once(self, tmp_path):
+        first = asyncio.run(save_upload(make_upload(b"# Brief\n" * 1000, "acme.md"), store_dir=tmp_path))
+        second = asyncio.run(save_upload(make_upload(b"# Brief\n" * 1000, "globex.md"), store_dir=tmp_path))
+        assert first["path"] == second["path"]
+        assert first["deduplicated"] is False and second["deduplicated"] is True
+        assert first["size"] == 8000
+        blobs = [p for p in tmp_path.rglob("*") if p.is_file()]
+        assert len(blobs) == 1
+
+    def test_file_limit(self, tmp_path):
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(save_upload(make_upload(b"x" * 2048), max_bytes=1024, store_dir=tmp_path))
+        assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+    def test_request_budget_spans_files(self, tmp_path):
+        budget = RequestBudget(max_bytes=1500)
+
+        async def scenario():
+            await save_upload(make_upload(b"a" * 1000), budget=budget, store_dir=tmp_path)
+            await save_upload(make_upload(b"b" * 1000), budget=budget, store_dir=tmp_path)
+
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(scenario())
+
+    def test_safe_filename(self):
+        assert safe_filename("../../etc/passwd") == "passwd"
+        assert safe_filename("Pitch Deck (final).pdf") == "Pitch_Deck_final_.pdf"
+        assert safe_filename(None) == "upload"
+
+
+class TestJsonUpload:
+    """JSON parsed from the stored file"""
+
+    def test_parses_json(self, tmp_path):
+        payload = {"url": "https://acme.com", "pages": list(range(100))}
+        data, stored = asyncio.run(load_json_upload(make_upload(json.dumps(payload).encode(), "ds.json"), store_dir=tmp_path))
+        assert data == payload
+        assert stored["path"].endswith(".json")
+
+    def test_invalid_json(self, tmp_path):
+        with pytest.raises(json.JSONDecodeError):
+            asyncio.run(load_json_upload(make_upload(b"{broken", "ds.json"), store_dir=tmp_path))
+
+
+class TestUploadEndpoints:
+    """Size limits surfaced as 413"""
+
+    def test_oversized_request_rejected(self, monkeypatch):
+        main = pytest.importorskip("main")
+        testclient = pytest.importorskip("fastapi.testclient")
+        monkeypatch.setattr(main, "MAX_REQUEST_BYTES", 100)
+        response = testclient.TestClient(main.app).post(
+            "/api/upload-deepstack", files={"deepstack_json_file": ("ds.json", b"{" + b" " * 500 + b"}")}
+        )
+        assert response.status_code == 413
@@ -0,0 +1,83 @@
+"""
+Tests for MEARA usage accounting
+
+Per-step and total tokens, pricing by model, budget fractions and the
+cross-analysis summary.
+
+Run with: pytest test_usage_ledger.py -v
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from usage_ledger import BudgetExceeded, UsageLedger, model_price, summarize_usage
+
+
+def usage(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+class TestLedger:
+    """UsageLedger"""
+
+    def test_aggregates_per_step_and_total(self):
+        ledger = UsageLedger(token_budget=0, cost_budget_usd=0)
+        ledger.record("evidence_collector", "gpt-4o", usage(1_000_000, 0))
+        ledger.record("evidence_collector", "gpt-4o", usage(0, 100_000))
+        ledger.record("input_condensing", "gpt-4o-mini", {"prompt_tokens": 10_000, "completion_tokens": 1_000})
+        data = ledger.to_dict()
+        assert data["steps"]["evidence_collector"]["calls"] == 2
+        assert data["steps"]["evidence_collector"]["cost_usd"] == 3.5
+        assert data["steps"]["input_condensing"]["total_tokens"] == 11_000
+        assert data["total"]["total_tokens"] == 1_111_000
+        assert data["budget"]["fraction_used"] is None
+
+    def test_unknown_models_are_reported(self):
+        ledger = UsageLedger()
+        ledger.record("report_assembler", "custom-model", usage(100, 10))
+        data = ledger.to_dict()
+        assert data["cost_usd"] == 0.0
+        assert data["unpriced_models"] == ["custom-model"]
+
+    def test_fraction_uses_tightest_budget(self):
+        ledger = UsageLedger(token_budget=10_000, cost_budget_usd=0.01)
+        ledger.record("evidence_collector", "gpt-4o", usage(2_000, 500))  # 2500 tokens, $0.01
+        assert ledger.fraction_used() == pytest.approx(1.0)
+        ledger.cost_budget_usd = 0
+        assert ledger.fraction_used() == pytest.approx(0.25)
+
+    def test_budget_exceeded_message(self):
+        ledger = UsageLedger(token_budget=100)
+        ledger.record("evidence_collector", "gpt-4o", usage(100, 50))
+        error = BudgetExceeded("dimension_evaluator", ledger.to_dict())
+        assert "before dimension_evaluator" in str(error) and "150 tokens" in str(error)
+
+
+class TestPricing:
+    """model_price"""
+
+    def test_dated_models_match_longest_prefix(self):
+        assert model_price("gpt-4o-2024-08-06") == model_price("gpt-4o")
+        assert model_price("gpt-4o-mini-2024-07-18") == model_price("gpt-4o-mini")
+        assert model_price("gpt-4") is None
+        assert model_price(None) is None
+
+
+class TestSummary:
+    """summarize_usage"""
+
+    def test_averages_across_analyses(self):
+        ledgers = []
+        for tokens in (1_000, 3_000):
+            ledger = UsageLedger()
+            ledger.record("evidence_collector", "gpt-4o", usage(tokens, 0))
+            ledgers.append(ledger.to_dict())
+        ledgers[1]["budget"]["downgraded"] = True
+        summary = summarize_usage(ledgers + [None])
+        assert summary["analyses"] == 2
+        assert summary["total_tokens"] == 4_000
+        assert summary["avg_tokens_per_analysis"] == 2_000
+        assert summary["avg_tokens_per_step"] == {"evidence_collector": 2_000}
+        assert summary["downgraded_analyses"] == 1
+        assert summarize_usage([])["analyses"] == 0
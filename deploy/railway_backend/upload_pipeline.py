@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+upload_pipeline.py
+
+Streaming storage for uploaded files (Deep Research Briefs, context
+documents, DeepStack JSON).
+
+Uploads are copied to disk in fixed-size chunks, with the blocking reads and
+writes running in worker threads so the event loop keeps serving other
+requests. Each file is hashed while it streams and stored once under its
+SHA-256 (content-addressed), so the same pitch deck uploaded for several
+companies or analyses takes disk space once. Per-file and per-request size
+limits are enforced while streaming; a file that goes over is discarded
+without being read to the end.
+
+Usage:
+    from upload_pipeline import save_upload, load_json_upload, RequestBudget, UploadTooLarge
+    budget = RequestBudget()
+    stored = await save_upload(drb_file, budget=budget)   # {"path", "sha256", "size", "filename"}
+    data, stored = await load_json_upload(deepstack_json_file)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+
+
+MB = 1024 * 1024
+CHUNK_SIZE = 1 * MB
+# Largest single uploaded file
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_FILE_MB", "50")) * MB
+# Largest total upload per request (all files together)
+MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_MB", "200")) * MB
+# Content-addressed blob store
+UPLOAD_STORE_DIR = Path(os.getenv("UPLOAD_STORE_DIR", "context_inputs/blobs"))
+
+
+class UploadTooLarge(Exception):
+    """An upload exceeded a size limit."""
+
+    def __init__(self, what: str, limit: int):
+        self.limit = limit
+        super().__init__(f"{what} exceeds the {limit // MB} MB limit")
+
+
+class RequestBudget:
+    """Total bytes still allowed for the files of one request."""
+
+    def __init__(self, max_bytes: int = MAX_REQUEST_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def consume(self, size: int) -> None:
+        self.used += size
+        if self.used > self.max_bytes:
+            raise UploadTooLarge("Request upload size", self.max_bytes)
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Base name of an uploaded file, without directories or odd characters."""
+    name = Path(filename or "upload").name
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._")
+    return name or "upload"
+
+
+def blob_path(sha256: str, suffix: str, store_dir: Path = UPLOAD_STORE_DIR) -> Path:
+    """Where a blob with this content hash lives."""
+    return store_dir / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+
+async def save_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                      budget: Optional[RequestBudget] = None,
+                      store_dir: Path = UPLOAD_STORE_DIR) -> Dict[str, Any]:
+    """
+    Stream an upload into the blob store.
+
+    Returns:
+        {"path", "sha256", "size", "filename", "deduplicated"}
+
+    Raises:
+        UploadTooLarge: The file or the request went over its limit.
+    """
+    filename = safe_filename(upload.filename)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_name = tempfile.mkstemp(dir=store_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File {filename}", max_bytes)
+                if budget is not None:
+                    budget.consume(len(chunk))
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256, Path(filename).suffix, store_dir)
+        deduplicated = path.exists()
+        if deduplicated:
+            os.remove(tmp_name)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+    return {"path": str(path), "sha256": sha256, "size": size, "filename": filename, "deduplicated": deduplicated}
+
+
+def _load_json_file(path: str) -> Any:
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+async def load_json_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                           store_dir: Path = UPLOAD_STORE_DIR) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Stream a JSON upload to disk, then parse it from the file in a worker
+    thread (the raw bytes are never held in memory alongside the result).
+
+    Raises:
+        UploadTooLarge: The file went over its limit.
+        json.JSONDecodeError: The file is not valid JSON.
+    """
+    stored = await save_upload(upload, max_bytes=max_bytes, store_dir=store_dir)
+    data = await asyncio.to_thread(_load_json_file, stored["path"])
+    return data, stored
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+usage_ledger.py
+
+Token usage and cost accounting for MEARA analyses, with a per-analysis budget.
+
+Every assistant run and digest completion reports its usage (prompt and
+completion tokens, model). The ledger aggregates it per workflow step and
+per analysis, prices it with MODEL_PRICES, and tells the orchestrator how
+much of the analysis budget (tokens and/or USD) is spent. The orchestrator
+uses that to downgrade the rest of the workflow (digest inputs, skip
+optional steps) or abort it; see meara_orchestrator.enforce_budget.
+
+Usage:
+    from usage_ledger import UsageLedger, BudgetExceeded
+    ledger = UsageLedger(token_budget=400000, cost_budget_usd=2.0)
+    ledger.record("evidence_collector", run.model, run.usage)
+    ledger.fraction_used()   # 0.35, or None without a budget
+    ledger.to_dict()         # per-step and total tokens, cost, budget state
+
+    # CLI: usage of a saved _state.json
+    python3 usage_ledger.py analysis_results/acme_20260101_120000_state.json
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+# Per-analysis budget (0 disables that limit)
+MEARA_TOKEN_BUDGET = int(os.getenv("MEARA_TOKEN_BUDGET", "0"))
+MEARA_COST_BUDGET_USD = float(os.getenv("MEARA_COST_BUDGET_USD", "0"))
+
+# USD per 1M tokens (input, output); extend or override with MEARA_MODEL_PRICES,
+# e.g. '{"gpt-4o": [2.5, 10.0]}'. Dated model names match by prefix.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+MODEL_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("MEARA_MODEL_PRICES", "{}")).items()})
+
+
+class BudgetExceeded(Exception):
+    """The analysis spent its budget and MEARA_BUDGET_ACTION is "abort"."""
+
+    def __init__(self, step_key: str, usage: Dict[str, Any]):
+        self.step_key = step_key
+        self.usage = usage
+        total = usage["total"]
+        super().__init__(
+            f"Analysis budget exceeded before {step_key}: "
+            f"{total['total_tokens']} tokens, ${usage['cost_usd']:.2f} spent"
+        )
+
+
+def model_price(model: Optional[str]) -> Optional[tuple]:
+    """(input, output) USD per 1M tokens for a model, by exact or longest prefix match."""
+    if not model:
+        return None
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(f"{name}-")]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+
+
+def _usage_value(usage: Any, name: str) -> int:
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value or 0)
+
+
+class UsageLedger:
+    """Per-step and per-analysis token usage and cost of one workflow."""
+
+    def __init__(self, token_budget: int = MEARA_TOKEN_BUDGET, cost_budget_usd: float = MEARA_COST_BUDGET_USD):
+        self.token_budget = token_budget
+        self.cost_budget_usd = cost_budget_usd
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.total = _empty_totals()
+        self.unpriced_models = set()
+        self.downgraded = False  # set by the orchestrator once the downgrade threshold is crossed
+        self.skipped_steps = []
+
+    def record(self, step_key: str, model: Optional[str], usage: Any) -> None:
+        """Add one run's or completion's usage (object or dict with *_tokens) to a step."""
+        prompt = _usage_value(usage, "prompt_tokens")
+        completion = _usage_value(usage, "completion_tokens")
+        total = _usage_value(usage, "total_tokens") or prompt + completion
+        price = model_price(model)
+        if price is None:
+            self.unpriced_models.add(model or "unknown")
+            cost = 0.0
+        else:
+            cost = (prompt * price[0] + completion * price[1]) / 1_000_000
+
+        step = self.steps.setdefault(step_key, _empty_totals())
+        for entry in (step, self.total):
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt
+            entry["completion_tokens"] += completion
+            entry["total_tokens"] += total
+            entry["cost_usd"] += cost
+
+    def fraction_used(self) -> Optional[float]:
+        """Largest share of any configured budget spent so far; None without a budget."""
+        fractions = []
+        if self.token_budget > 0:
+            fractions.append(self.total["total_tokens"] / self.token_budget)
+        if self.cost_budget_usd > 0:
+            fractions.append(self.total["cost_usd"] / self.cost_budget_usd)
+        return max(fractions) if fractions else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        def rounded(entry):
+            return {**entry, "cost_usd": round(entry["cost_usd"], 4)}
+
+        fraction = self.fraction_used()
+        return {
+            "steps": {step: rounded(entry) for step, entry in self.steps.items()},
+            "total": rounded(self.total),
+            "cost_usd": round(self.total["cost_usd"], 4),
+            "unpriced_models": sorted(self.unpriced_models),
+            "budget": {
+                "tokens": self.token_budget or None,
+                "cost_usd": self.cost_budget_usd or None,
+                "fraction_used": round(fraction, 3) if fraction is not None else None,
+                "downgraded": self.downgraded,
+                "skipped_steps": list(self.skipped_steps),
+            },
+        }
+
+
+def summarize_usage(usages) -> Dict[str, Any]:
+    """Totals and per-analysis averages across several analyses' ledger dicts."""
+    usages = [usage for usage in usages if usage]
+    total = _empty_totals()
+    steps: Dict[str, Dict[str, Any]] = {}
+    for usage in usages:
+        for key in total:
+            total[key] += usage["total"][key]
+        for step, entry in usage["steps"].items():
+            aggregate = steps.setdefault(step, _empty_totals())
+            for key in aggregate:
+                aggregate[key] += entry[key]
+    count = len(usages)
+    return {
+        "analyses": count,
+        "total_tokens": total["total_tokens"],
+        "cost_usd": round(total["cost_usd"], 4),
+        "avg_tokens_per_analysis": round(total["total_tokens"] / count) if count else 0,
+        "avg_cost_usd_per_analysis": round(total["cost_usd"] / count, 4) if count else 0.0,
+        "downgraded_analyses": sum(1 for usage in usages if usage["budget"]["downgraded"]),
+        "avg_tokens_per_step": {step: round(entry["total_tokens"] / count) for step, entry in steps.items()} if count else {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the token usage and cost of a saved MEARA analysis.")
+    parser.add_argument("state_file", help="Path to a *_state.json file")
+    args = parser.parse_args()
+    with open(args.state_file) as f:
+        usage = json.load(f).get("usage")
+    if not usage:
+        print("No usage recorded in this state file")
+        raise SystemExit(1)
+    for step, entry in usage["steps"].items():
+        print(f"{step:24} {entry['total_tokens']:>9} tokens  ${entry['cost_usd']:.4f}")
+    print(f"{'total':24} {usage['total']['total_tokens']:>9} tokens  ${usage['cost_usd']:.4f}")
+    if usage["budget"]["downgraded"]:
+        print(f"Downgraded; skipped steps: {', '.join(usage['budget']['skipped_steps']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()